@@ -1,5 +1,39 @@
+import logging
+import time
+
 from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
 
 
 class VerifierConfig(AppConfig):
     name = 'verifier'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+
+def preload_models():
+    """
+    Loads the models and runs one warm-up inference when VUNA_PRELOAD_MODELS
+    is set, so the process starts taking traffic with everything hot. Called
+    by the WSGI and ASGI entry points only (runserver goes through the WSGI
+    one), so management commands and scripts never preload.
+    """
+    if not getattr(settings, 'VUNA_PRELOAD_MODELS', False):
+        return
+    from .services import VunaVerifier
+
+    started = time.perf_counter()
+    try:
+        verifier = VunaVerifier()
+        loaded = time.perf_counter() - started
+        warm_up = verifier.warm_up()
+    except Exception:
+        # Keep serving everything else; /api/verify/ retries the load
+        logger.exception("Preloading the verification models failed")
+        return
+    logger.info(
+        "Preloaded %s in %.2fs (warm-up inference %.3fs)", verifier.model_version, loaded, warm_up,
+    )
@@ -0,0 +1,160 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class BatchResult:
+    """
+    What a single caller gets back from the engine: its own output plus
+    the latency accounting for the batch it was part of.
+    """
+    __slots__ = ('value', 'batch_size', 'queue_ms', 'compute_ms', 'total_ms')
+
+    def __init__(self, value, batch_size, queue_ms, compute_ms):
+        self.value = value
+        self.batch_size = batch_size
+        self.queue_ms = queue_ms
+        self.compute_ms = compute_ms
+        self.total_ms = queue_ms + compute_ms
+
+
+class MicroBatcher:
+    """
+    Collects items submitted from many threads and runs them through
+    `batch_fn` together.
+
+    A batch is flushed as soon as it holds `max_batch_size` items, or when
+    the oldest item in it has waited `max_wait_ms`. `batch_fn` receives a
+    list of items and must return a list of outputs in the same order.
+    Raising `max_wait_ms` buys bigger batches (throughput) at the cost of
+    p50 latency; `stats()` reports both so the trade can be tuned.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=16, max_wait_ms=10,
+                 max_queue_size=1024, latency_window=2048, name='vuna-batcher'):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self.name = name
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._thread = None
+
+        # Rolling per-request accounting
+        self._total_ms = deque(maxlen=latency_window)
+        self._queue_ms = deque(maxlen=latency_window)
+        self._batch_sizes = deque(maxlen=latency_window)
+        self.batches_run = 0
+        self.items_processed = 0
+        self.errors = 0
+
+    def submit(self, item):
+        """
+        Queues an item and returns a Future resolving to a BatchResult.
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def run(self, item, timeout=None):
+        """
+        Blocking helper: submit and wait for this item's BatchResult.
+        """
+        return self.submit(item).result(timeout)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = batch[0][2] + self.max_wait
+
+            # Fill until full or until the oldest request has waited long enough
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        started = time.perf_counter()
+        try:
+            outputs = self.batch_fn([item for item, _, _ in batch])
+            if len(outputs) != len(batch):
+                raise RuntimeError(
+                    f"batch_fn returned {len(outputs)} outputs for {len(batch)} inputs"
+                )
+        except Exception as e:
+            with self._stats_lock:
+                self.errors += len(batch)
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        finished = time.perf_counter()
+        compute_ms = (finished - started) * 1000.0
+        size = len(batch)
+
+        with self._stats_lock:
+            self.batches_run += 1
+            self.items_processed += size
+            self._batch_sizes.append(size)
+            for _, _, enqueued in batch:
+                queue_ms = (started - enqueued) * 1000.0
+                self._queue_ms.append(queue_ms)
+                self._total_ms.append(queue_ms + compute_ms)
+
+        for (_, future, enqueued), value in zip(batch, outputs):
+            queue_ms = (started - enqueued) * 1000.0
+            future.set_result(BatchResult(value, size, queue_ms, compute_ms))
+
+    def stats(self):
+        """
+        Snapshot of engine configuration, counters and latency percentiles
+        over the most recent requests.
+        """
+        with self._stats_lock:
+            total_ms = np.array(self._total_ms, dtype=float)
+            queue_ms = np.array(self._queue_ms, dtype=float)
+            sizes = np.array(self._batch_sizes, dtype=float)
+            batches_run = self.batches_run
+            items_processed = self.items_processed
+            errors = self.errors
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": self._queue.qsize(),
+            "batches": batches_run,
+            "requests": items_processed,
+            "errors": errors,
+            "mean_batch_size": round(float(sizes.mean()), 2) if sizes.size else 0.0,
+            "latency_ms": _percentiles(total_ms),
+            "queue_wait_ms": _percentiles(queue_ms),
+        }
+
+
+def _percentiles(values):
+    if not values.size:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
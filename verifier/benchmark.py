@@ -0,0 +1,256 @@
+"""
+Benchmark helpers for the verification pipeline: synthetic Sentinel-2-like
+scenes, a local HTTP stand-in for remote TIFFs, per-stage timers, import
+timing and comparison of result files. Driven by `manage.py
+benchmark_verifier` and `manage.py check_import_time`.
+"""
+import functools
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+from .raster import MODEL_BANDS
+
+# Roughly 10 m pixels, placed over central Kenya
+SCENE_ORIGIN = (36.5, -0.2)
+PIXEL_DEGREES = 0.0000898
+# Rows generated and written per step, so scene size doesn't bound memory
+WRITE_STRIP_ROWS = 512
+
+
+def make_synthetic_scene(path, width=1024, height=1024, bands=13, overviews=True,
+                         block_size=256, compress='deflate', seed=0):
+    """
+    Writes a tiled float32 GeoTIFF with `bands` bands (at least 8, since the
+    model reads 7, 8 and 6). Model bands 7 and 8 hold index-like values in
+    -1..1 and the rest reflectance-like values in 0..4000, with a few nodata
+    pixels, so preprocessing does its real work. With `overviews` the file is
+    laid out like a Cloud-Optimized GeoTIFF.
+    """
+    if bands < max(MODEL_BANDS):
+        raise ValueError(f"Need at least {max(MODEL_BANDS)} bands, got {bands}")
+    rng = np.random.default_rng(seed)
+    profile = {
+        'driver': 'GTiff', 'width': width, 'height': height, 'count': bands,
+        'dtype': 'float32', 'crs': 'EPSG:4326', 'nodata': -9999,
+        'transform': from_origin(SCENE_ORIGIN[0], SCENE_ORIGIN[1], PIXEL_DEGREES, PIXEL_DEGREES),
+        'tiled': True, 'blockxsize': block_size, 'blockysize': block_size, 'compress': compress,
+    }
+    with rasterio.open(path, 'w', **profile) as dst:
+        for row in range(0, height, WRITE_STRIP_ROWS):
+            rows = min(WRITE_STRIP_ROWS, height - row)
+            window = Window(0, row, width, rows)
+            for band in range(1, bands + 1):
+                if band in (7, 8):
+                    data = rng.uniform(-0.2, 0.9, (rows, width))
+                else:
+                    data = rng.uniform(0, 4000, (rows, width))
+                data[rng.random((rows, width)) < 0.001] = -9999
+                dst.write(data.astype(np.float32), band, window=window)
+        if overviews:
+            factors = [f for f in (2, 4, 8, 16, 32) if max(width, height) // f >= 128]
+            if factors:
+                dst.build_overviews(factors, Resampling.average)
+    return path
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalFileServer:
+    """
+    Serves a directory over HTTP on 127.0.0.1 from a background thread, as a
+    stand-in for the remote TIFF hosts behind image_url.
+    """
+
+    def __init__(self, directory):
+        handler = functools.partial(_QuietHandler, directory=str(directory))
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, name='vuna-bench-http', daemon=True)
+
+    def url(self, name):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/{name}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def summarize(samples_ms):
+    """
+    Latency summary of a list of millisecond samples.
+    """
+    values = np.asarray(samples_ms, dtype=float)
+    if not values.size:
+        return {"n": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "n": int(values.size),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "min_ms": round(float(values.min()), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def time_stage(fn, repeat, warmup=1):
+    """
+    Runs `fn` `warmup` times untimed, then `repeat` times timed.
+    Returns (summary, last return value).
+    """
+    result = None
+    for _ in range(warmup):
+        result = fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return summarize(samples), result
+
+
+def run_load(request_fn, total, concurrency):
+    """
+    Issues `total` calls of `request_fn()` (which returns True on success)
+    from `concurrency` threads. Returns throughput and latency figures.
+    """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            ok = request_fn()
+        except Exception:
+            ok = False
+        elapsed = (time.perf_counter() - started) * 1000.0
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='vuna-bench') as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(wall, 3),
+        "throughput_rps": round(total / wall, 3) if wall else None,
+        "latency": summarize(latencies),
+    }
+
+
+_IMPORT_PROBE = """
+import json, os, sys, time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vuna_backend.settings')
+started = time.perf_counter()
+exec(sys.argv[1])
+seconds = time.perf_counter() - started
+print(json.dumps({"seconds": seconds, "modules": sorted(sys.modules)}))
+"""
+
+
+def measure_import(code, repeat=5, cwd=None):
+    """
+    Times `code` (e.g. "import django; django.setup()") in `repeat` fresh
+    interpreters. Returns the latency summary and the top-level packages
+    the code left imported.
+    """
+    samples = []
+    modules = set()
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, '-c', _IMPORT_PROBE, code], capture_output=True, text=True, cwd=cwd, timeout=300,
+        )
+        if completed.returncode:
+            raise RuntimeError(f"{code!r} failed: {completed.stderr.strip().splitlines()[-1:]}")
+        probe = json.loads(completed.stdout.strip().splitlines()[-1])
+        samples.append(probe["seconds"] * 1000.0)
+        modules.update(name.split('.', 1)[0] for name in probe["modules"])
+    return summarize(samples), modules
+
+
+def environment():
+    """
+    What the numbers were measured on, so result files can be compared
+    knowingly.
+    """
+    torch = sys.modules.get('torch')
+    xgboost = sys.modules.get('xgboost')
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        # Only when the models run in this process (no inference server)
+        "torch": torch.__version__ if torch else None,
+        "torch_threads": torch.get_num_threads() if torch else None,
+        "xgboost": xgboost.__version__ if xgboost else None,
+        "rasterio": rasterio.__version__,
+        "gdal": rasterio.__gdal_version__,
+    }
+
+
+def compare(baseline, current, metric='p50_ms', max_regression=0.2):
+    """
+    Compares two result files stage by stage on `metric` (and end-to-end
+    throughput). Returns a list of rows
+    {"name", "baseline", "current", "change", "regressed"}; `change` is the
+    relative slowdown, positive when worse.
+    """
+    rows = []
+
+    def add(name, old, new, higher_is_better=False):
+        if old is None or new is None or not old:
+            return
+        change = (old - new) / old if higher_is_better else (new - old) / old
+        rows.append({
+            "name": name, "baseline": old, "current": new,
+            "change": round(change, 4), "regressed": change > max_regression,
+        })
+
+    for name, stats in current.get('stages', {}).items():
+        add(f"stage.{name}", baseline.get('stages', {}).get(name, {}).get(metric), stats.get(metric))
+    for name, run in current.get('end_to_end', {}).items():
+        old = baseline.get('end_to_end', {}).get(name, {})
+        add(f"e2e.{name}.throughput_rps", old.get('throughput_rps'), run.get('throughput_rps'), higher_is_better=True)
+        add(f"e2e.{name}.latency.p99_ms", old.get('latency', {}).get('p99_ms'), run.get('latency', {}).get('p99_ms'))
+    return rows
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,159 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .freshness import projects_version
+from .geometry import parse_boundary
+from .models import Project
+from .pricing import get_pricing
+from .vector_tiles import (
+    BUFFER, encode_tile, polygons_bbox, project_geometry, simplify_polygons,
+    tile_bounds, tile_polygons, zoom_tolerance,
+)
+
+LAYER_NAME = 'boundaries'
+# Properties carried on every feature (besides the project id), for
+# styling and popups
+TILE_PROPERTIES = ('name', 'cached_flux', 'cached_co2', 'cached_revenue')
+# CO2 and revenue are priced in the query (Project.objects.priced)
+_PROPERTY_COLUMNS = {'cached_co2': 'priced_co2', 'cached_revenue': 'priced_revenue'}
+
+
+class _Boundary:
+    """
+    One project's boundary in world coordinates, with its simplified form
+    memoized per zoom level.
+    """
+
+    def __init__(self, digest, polygons):
+        self.digest = digest
+        self.polygons = polygons
+        self.bbox = polygons_bbox(polygons)
+        self._by_zoom = {}
+
+    def at_zoom(self, z):
+        if z not in self._by_zoom:
+            self._by_zoom[z] = simplify_polygons(self.polygons, zoom_tolerance(z))
+        return self._by_zoom[z]
+
+
+class BoundaryTileSource:
+    """
+    Renders project boundaries as Mapbox Vector Tiles.
+
+    Boundaries are parsed and projected once and simplified once per zoom;
+    rendered tiles go into a bounded LRU keyed by the project-table version,
+    so any project write (new boundary, new cached flux) retires the old
+    tiles in every process while unchanged boundaries keep their parsed and
+    simplified geometry.
+    """
+
+    def __init__(self, max_tiles=2048, max_zoom=18):
+        self.max_tiles = max(0, int(max_tiles))
+        self.max_zoom = max_zoom
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._features = []
+        self._boundaries = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def tile(self, z, x, y):
+        """
+        MVT bytes for tile z/x/y (empty bytes when nothing intersects it).
+        """
+        version = projects_version()['etag']
+        key = (version, z, x, y)
+        with self._lock:
+            cached = self._tiles.get(key)
+            if cached is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+            features = self._refresh(version)
+
+        data = self._render(features, z, x, y)
+
+        if self.max_tiles:
+            with self._lock:
+                self._tiles[key] = data
+                self._tiles.move_to_end(key)
+                while len(self._tiles) > self.max_tiles:
+                    self._tiles.popitem(last=False)
+                    self.evictions += 1
+        return data
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tiles": len(self._tiles),
+                "max_tiles": self.max_tiles,
+                "boundaries": len(self._boundaries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _refresh(self, version):
+        # Caller holds self._lock
+        if version == self._version:
+            return self._features
+
+        rows = Project.objects.priced(get_pricing()) \
+            .exclude(geojson_boundary__isnull=True).exclude(geojson_boundary='') \
+            .values_list('id', 'geojson_boundary', *(_PROPERTY_COLUMNS.get(p, p) for p in TILE_PROPERTIES))
+        boundaries, features = {}, []
+        for pk, text, *props in rows:
+            digest = hashlib.sha256(text.encode()).hexdigest()
+            boundary = self._boundaries.get(pk)
+            if boundary is None or boundary.digest != digest:
+                boundary = _Boundary(digest, project_geometry(parse_boundary(text)))
+            if boundary.bbox is None:
+                continue
+            boundaries[pk] = boundary
+            features.append((pk, boundary, dict(id=pk, **dict(zip(TILE_PROPERTIES, props)))))
+
+        # Old tiles can never be requested again under the new version
+        for stale in [k for k in self._tiles if k[0] != version]:
+            del self._tiles[stale]
+        self._boundaries = boundaries
+        self._features = features
+        self._version = version
+        return features
+
+    def _render(self, features, z, x, y):
+        min_x, min_y, max_x, max_y = tile_bounds(z, x, y, buffer=BUFFER)
+        simplify_zoom = min(z, self.max_zoom)
+        layer = []
+        for pk, boundary, props in features:
+            b = boundary.bbox
+            if b[2] < min_x or b[0] > max_x or b[3] < min_y or b[1] > max_y:
+                continue
+            polygons = tile_polygons(boundary.at_zoom(simplify_zoom), z, x, y)
+            if polygons:
+                layer.append({"id": pk, "polygons": polygons, "properties": props})
+        return encode_tile({LAYER_NAME: layer})
+
+
+_tile_source = None
+_tile_source_lock = threading.Lock()
+
+
+def get_tile_source():
+    """
+    The per-process BoundaryTileSource, created on first use.
+    """
+    global _tile_source
+    if _tile_source is None:
+        with _tile_source_lock:
+            if _tile_source is None:
+                _tile_source = BoundaryTileSource(
+                    max_tiles=getattr(settings, 'VUNA_VECTOR_TILE_CACHE_SIZE', 2048),
+                    max_zoom=getattr(settings, 'VUNA_VECTOR_TILE_MAX_ZOOM', 18),
+                )
+    return _tile_source
@@ -0,0 +1,147 @@
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+
+from .freshness import projects_changed
+from .masking import ProjectBoundary
+from .models import Project, VerificationRecord
+from .services import VunaVerifier
+from .summary import tracking
+
+
+def resolve_items(project_ids=(), image_urls=(), items=()):
+    """
+    Normalizes a bulk request into a list of work items:
+    {"project": Project or None, "source": path/URL or None, "error": str or None}.
+    Projects are fetched in one query.
+    """
+    wanted = list(project_ids) + [i['project_id'] for i in items if i.get('project_id')]
+    projects = Project.objects.in_bulk(wanted)
+
+    resolved = []
+    for project_id in project_ids:
+        project = projects.get(project_id)
+        if project is None:
+            resolved.append({"project_id": project_id, "project": None, "source": None, "error": "Project not found"})
+        elif not project.tiff_file:
+            resolved.append({"project_id": project_id, "project": project, "source": None,
+                             "error": "Project has no stored raster; pass an image_url"})
+        else:
+            resolved.append({"project_id": project_id, "project": project, "source": project.tiff_file.path, "error": None})
+
+    for url in image_urls:
+        resolved.append({"project_id": None, "project": None, "source": url, "error": None})
+
+    for item in items:
+        project_id = item.get('project_id')
+        project = projects.get(project_id) if project_id else None
+        if project_id and project is None:
+            resolved.append({"project_id": project_id, "project": None, "source": None, "error": "Project not found"})
+            continue
+        source = item.get('image_url') or (project.tiff_file.path if project and project.tiff_file else None)
+        resolved.append({
+            "project_id": project_id, "project": project, "source": source,
+            "error": None if source else "Project has no stored raster; pass an image_url",
+        })
+
+    return resolved
+
+
+def stream_bulk_verification(work, tiled=False):
+    """
+    Verifies every work item and yields one JSON line per result as soon as
+    it is ready, then a final summary line.
+
+    Downloads and raster decoding run concurrently on a thread pool; the
+    model passes of concurrent items are merged by the verifier's batching
+    engine. Project caches and history are written in batches of
+    VUNA_BULK_FLUSH_SIZE successes (one bulk_update and upsert each) as
+    results come in. If the client goes away mid-stream, the results
+    already computed are still written and queued items are cancelled.
+    """
+    verifier = VunaVerifier()
+    concurrency = getattr(settings, 'VUNA_BULK_CONCURRENCY', 8)
+    flush_size = max(1, getattr(settings, 'VUNA_BULK_FLUSH_SIZE', 50))
+    updated = []
+    history = []
+    succeeded = failed = written = 0
+
+    def line(index, item, result):
+        payload = {"index": index, "project_id": item['project_id'], "source": _public_source(item)}
+        payload.update(result)
+        return json.dumps(payload) + "\n"
+
+    def flush():
+        nonlocal written
+        if not updated:
+            return
+        with tracking(updated, Project.VERIFICATION_FIELDS):
+            Project.objects.bulk_update(updated, Project.VERIFICATION_FIELDS, batch_size=500)
+            VerificationRecord.upsert(history)
+        projects_changed()
+        written += len(updated)
+        updated.clear()
+        history.clear()
+
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='vuna-bulk')
+    try:
+        futures = {}
+        for index, item in enumerate(work):
+            if item['error']:
+                failed += 1
+                yield line(index, item, {"status": "error", "message": item['error']})
+                continue
+            boundary = ProjectBoundary.from_project(item['project'])
+            futures[pool.submit(_verify_item, verifier, item, tiled, boundary)] = (index, item)
+
+        for future in as_completed(futures):
+            index, item = futures[future]
+            try:
+                result, scene = future.result()
+            except Exception as e:
+                result, scene = {"status": "error", "message": str(e)}, None
+
+            if result.get('status') == 'success':
+                succeeded += 1
+                if item['project'] is not None:
+                    item['project'].apply_verification(result)
+                    updated.append(item['project'])
+                    if scene:
+                        history.append(VerificationRecord.from_result(
+                            item['project'], result, scene, verifier.model_version, source=item['source'],
+                        ))
+                    if len(updated) >= flush_size:
+                        flush()
+            else:
+                failed += 1
+            yield line(index, item, result)
+    finally:
+        # Also on GeneratorExit (client disconnect): don't wait for, or
+        # start, work nobody will read, but keep what already finished
+        pool.shutdown(wait=False, cancel_futures=True)
+        flush()
+
+    yield json.dumps({"summary": {
+        "total": len(work),
+        "succeeded": succeeded,
+        "failed": failed,
+        "projects_updated": written,
+    }}) + "\n"
+
+
+def _verify_item(verifier, item, tiled, boundary):
+    """
+    (result, scene): whole-scene results for projects also name the scene,
+    for the project's history.
+    """
+    if item['project'] is None or tiled:
+        return verifier.verify(item['source'], tiled, boundary), None
+    return verifier.verify_scene(item['source'], boundary=boundary)
+
+
+def _public_source(item):
+    # Don't echo server filesystem paths back to the client
+    if item['source'] and str(item['source']).startswith(('http://', 'https://')):
+        return item['source']
+    return None
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Deliberately free of Django imports: vuna_predict_api.py uses this module
+# outside of a configured Django project.
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def content_hash(source):
+    """
+    SHA-256 hex digest of a raster's bytes.
+    Accepts a filesystem path, raw bytes, or a seekable file-like object
+    (hashed from its start, and left at the position it was at).
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    elif hasattr(source, 'read'):
+        start = source.tell() if hasattr(source, 'tell') else None
+        if start is not None:
+            source.seek(0)
+        for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+        if start is not None:
+            source.seek(start)
+    else:
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_version(path, length=12):
+    """
+    Short content digest of a model file, used as its version tag.
+    """
+    return content_hash(path)[:length]
+
+
+def prediction_dir(cache_dir):
+    """
+    Where verification results are kept under a cache directory; the Django
+    service (VUNA_CACHE_DIR) and vuna_predict_api.py share this layout.
+    """
+    return os.path.join(str(cache_dir), 'predictions') if cache_dir else None
+
+
+def model_versions(engine_info, read_resampling='bilinear'):
+    """
+    (extractor_version, model_version) for an inference engine's info when
+    its inputs are read with `read_resampling`: the version tags results and
+    embeddings are cached under.
+    """
+    extractor_version = f"{engine_info['extractor']}-{read_resampling}{engine_info['extractor_tag']}"
+    return extractor_version, f"{engine_info['model_version']}-{extractor_version}"
+
+
+class PredictionCache:
+    """
+    Two-tier cache of verification results keyed by raster content hash
+    and model version.
+
+    The memory tier is a bounded LRU; the optional disk tier persists every
+    entry as a small JSON file under `disk_dir` so results survive restarts
+    and are shared between workers on the same host.
+    """
+
+    def __init__(self, max_entries=1024, disk_dir=None):
+        self.max_entries = max(0, int(max_entries))
+        self.disk_dir = str(disk_dir) if disk_dir else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writes = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(raster_hash, model_version, variant=None):
+        parts = [model_version, raster_hash]
+        if variant:
+            parts.append(variant)
+        return ':'.join(parts)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return dict(self._entries[key])
+
+        value = self._disk_get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, value)
+        return dict(value)
+
+    def set(self, key, value):
+        value = dict(value)
+        with self._lock:
+            self.writes += 1
+            self._remember(key, value)
+        self._disk_set(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "writes": self.writes,
+                "hit_rate": round(hits / lookups, 4) if lookups else None,
+            }
+
+    def _remember(self, key, value):
+        # Caller holds self._lock
+        if not self.max_entries:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_path(self, key):
+        name = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.disk_dir, name[:2], f"{name}.json")
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _disk_set(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so concurrent readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
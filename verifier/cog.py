@@ -0,0 +1,236 @@
+import os
+
+import numpy as np
+import rasterio
+import rasterio.shutil
+from rasterio.enums import Resampling
+from rasterio.errors import RasterioError
+
+from .raster import MODEL_BANDS, MODEL_SHAPE, preprocess_bands, read_model_bands
+
+# Deliberately free of Django imports, like raster.py.
+
+# Companion holding only the model bands (7, 8, 6 as 1, 2, 3), next to
+# the stored raster
+COMPANION_SUFFIX = '.model.tif'
+
+
+class ConversionError(Exception):
+    """
+    A COG conversion failed its integrity or parity check (the original
+    file is left untouched).
+    """
+
+
+def is_cog(path):
+    """
+    True if GDAL reports the file as laid out as a Cloud-Optimized GeoTIFF.
+    """
+    try:
+        with rasterio.open(path) as src:
+            return src.tags(ns='IMAGE_STRUCTURE').get('LAYOUT') == 'COG'
+    except RasterioError:
+        return False
+
+
+def companion_path(path):
+    """
+    Where the model-bands companion of a stored raster lives.
+    """
+    root, _ = os.path.splitext(str(path))
+    return root + COMPANION_SUFFIX
+
+
+def model_source(path):
+    """
+    (path, bands) to read the model bands from: the companion when there is
+    an up-to-date one (bands 1, 2, 3 there), else the raster itself.
+    """
+    companion = companion_path(path)
+    try:
+        if os.path.getmtime(companion) >= os.path.getmtime(path):
+            return companion, (1, 2, 3)
+    except OSError:
+        pass
+    return str(path), MODEL_BANDS
+
+
+def convert_to_cog(path, output, bands=None, block_size=512, compress='DEFLATE',
+                   overview_resampling='average'):
+    """
+    Writes `path` (or only `bands` of it, in that order) to `output` as a
+    tiled, losslessly compressed COG with internal overviews.
+    """
+    source = str(path)
+    if bands:
+        # GDAL's vrt:// connection string selects (and orders) bands on the fly
+        source = f"vrt://{os.path.abspath(source)}?bands={','.join(str(b) for b in bands)}"
+    with rasterio.open(source) as src:
+        predictor = 'YES' if src.dtypes[0] != 'uint8' else 'NO'
+        rasterio.shutil.copy(
+            src, str(output), driver='COG',
+            BLOCKSIZE=block_size, COMPRESS=compress, PREDICTOR=predictor, BIGTIFF='IF_SAFER',
+            OVERVIEWS='AUTO', OVERVIEW_RESAMPLING=overview_resampling.upper(), NUM_THREADS='ALL_CPUS',
+        )
+
+
+def compare_rasters(original, converted, bands=None):
+    """
+    Integrity check: the converted raster must have the original's grid,
+    CRS, data type and nodata, and every pixel of `bands` (default: all, in
+    order) must be identical (NaN matching NaN). Reads block by block, so
+    memory doesn't depend on the scene size; per-band statistics of the
+    original are collected on the way. Raises ConversionError.
+    """
+    with rasterio.open(str(original)) as a, rasterio.open(str(converted)) as b:
+        bands = list(bands or range(1, a.count + 1))
+        for name, left, right in (
+            ('size', (a.width, a.height), (b.width, b.height)),
+            ('CRS', a.crs, b.crs),
+            ('transform', a.transform, b.transform),
+            ('band count', len(bands), b.count),
+            ('nodata', a.nodata, b.nodata),
+            ('dtype', [a.dtypes[i - 1] for i in bands], list(b.dtypes)),
+        ):
+            if not _same(left, right):
+                raise ConversionError(f"{name} differs: {left} != {right}")
+
+        stats = [_BandStats(band, a.nodata) for band in bands]
+        for _, window in b.block_windows(1):
+            left = a.read(bands, window=window)
+            right = b.read(window=window)
+            if not np.array_equal(left, right, equal_nan=np.issubdtype(left.dtype, np.floating)):
+                raise ConversionError(f"Pixels differ in window {window}")
+            for band_stats, values in zip(stats, left):
+                band_stats.add(values)
+    return [s.result() for s in stats]
+
+
+def model_input_parity(original, converted, bands=MODEL_BANDS, resampling='bilinear'):
+    """
+    Parity check of what the model sees: the max and mean |difference|
+    between the preprocessed, decimated model input read from the original
+    and from the converted file, whose overviews may now serve the
+    decimated read. Overview pixels are averages, so single pixels can
+    move by the scene's local noise while the mean barely does.
+    """
+    with rasterio.open(str(original)) as src:
+        reference = preprocess_bands(read_model_bands(src, MODEL_SHAPE, resampling=resampling))
+    with rasterio.open(str(converted)) as src:
+        converted_input = preprocess_bands(read_model_bands(src, MODEL_SHAPE, bands=bands, resampling=resampling))
+    diff = np.abs(converted_input - reference)
+    return {"max_abs_diff": round(float(diff.max()), 6), "mean_abs_diff": round(float(diff.mean()), 6)}
+
+
+def _same(left, right):
+    # A NaN nodata never equals itself
+    if isinstance(left, float) and isinstance(right, float):
+        return left == right or (np.isnan(left) and np.isnan(right))
+    return left == right
+
+
+class _BandStats:
+    def __init__(self, band, nodata):
+        self.band = band
+        self.nodata = nodata
+        self.count = self.invalid = 0
+        self.total = self.total_sq = 0.0
+        self.minimum = self.maximum = None
+
+    def add(self, values):
+        valid = ~np.isnan(values) if np.issubdtype(values.dtype, np.floating) else np.ones(values.shape, bool)
+        if self.nodata is not None:
+            valid &= values != self.nodata
+        data = values[valid].astype(np.float64)
+        self.invalid += values.size - data.size
+        if not data.size:
+            return
+        self.count += data.size
+        self.total += float(data.sum())
+        self.total_sq += float(np.square(data).sum())
+        low, high = float(data.min()), float(data.max())
+        self.minimum = low if self.minimum is None else min(self.minimum, low)
+        self.maximum = high if self.maximum is None else max(self.maximum, high)
+
+    def result(self):
+        mean = self.total / self.count if self.count else None
+        std = max(self.total_sq / self.count - mean * mean, 0.0) ** 0.5 if self.count else None
+        return {
+            "band": self.band,
+            "min": self.minimum,
+            "max": self.maximum,
+            "mean": mean,
+            "std": std,
+            "valid_pixels": self.count,
+            "nodata_pixels": self.invalid,
+        }
+
+
+def ingest(path, block_size=512, compress='DEFLATE', overview_resampling='average',
+           companion=True, parity_tolerance=0.005, resampling=Resampling.bilinear,
+           score=None, flux_tolerance=0.005):
+    """
+    Rewrites the raster at `path` as a COG in place, after checking the
+    conversion against the original: pixel-exact integrity, then the mean
+    model input difference within `parity_tolerance`, and, given a
+    `score(path, bands) -> flux` callable, the predicted flux within
+    `flux_tolerance`. With `companion`, the model bands also go into
+    companion_path(path), checked the same way. The original is only
+    replaced once every check has passed; on failure it is kept and
+    ConversionError raised.
+
+    Returns a report: sizes, per-band statistics and the parity measured.
+    """
+    path = str(path)
+    if isinstance(resampling, Resampling):
+        resampling = resampling.name
+    options = dict(block_size=block_size, compress=compress, overview_resampling=overview_resampling)
+    converted = path + '.cog.tmp'
+    companion_tmp = companion_path(path) + '.tmp'
+    try:
+        reference_flux = score(path, MODEL_BANDS) if score else None
+
+        def check(output, bands):
+            parity = model_input_parity(path, output, bands=bands, resampling=resampling)
+            if parity["mean_abs_diff"] > parity_tolerance:
+                raise ConversionError(
+                    f"{output}: model input differs by {parity['mean_abs_diff']} on average "
+                    f"(tolerance {parity_tolerance})"
+                )
+            if score:
+                parity["flux_diff"] = round(abs(score(output, bands) - reference_flux), 6)
+                if parity["flux_diff"] > flux_tolerance:
+                    raise ConversionError(
+                        f"{output}: carbon_flux differs by {parity['flux_diff']} (tolerance {flux_tolerance})"
+                    )
+            return parity
+
+        convert_to_cog(path, converted, **options)
+        band_stats = compare_rasters(path, converted)
+        parity = check(converted, MODEL_BANDS)
+
+        companion_parity = None
+        if companion:
+            convert_to_cog(path, companion_tmp, bands=MODEL_BANDS, **options)
+            compare_rasters(path, companion_tmp, bands=MODEL_BANDS)
+            companion_parity = check(companion_tmp, (1, 2, 3))
+
+        original_bytes = os.path.getsize(path)
+        os.replace(converted, path)
+        if companion:
+            # After the main file, so model_source() sees it as up to date
+            os.replace(companion_tmp, companion_path(path))
+        return {
+            "original_bytes": original_bytes,
+            "stored_bytes": os.path.getsize(path),
+            "companion_bytes": os.path.getsize(companion_path(path)) if companion else None,
+            "band_stats": band_stats,
+            "parity": parity,
+            "companion_parity": companion_parity,
+        }
+    except RasterioError as e:
+        raise ConversionError(str(e))
+    finally:
+        for leftover in (converted, companion_tmp):
+            if os.path.exists(leftover):
+                os.remove(leftover)
@@ -0,0 +1,91 @@
+# Deliberately free of Django and torch imports: shared by the web process,
+# the inference server and vuna_predict_api.py.
+
+
+class PricingModel:
+    """
+    How a predicted carbon flux becomes annual tonnes of CO2 and revenue.
+
+    Both are linear in the flux, so they are cheap to derive wherever the
+    flux is stored: from a float, elementwise from a NumPy array, or in
+    SQL from the per-flux factors (see ProjectQuerySet.priced). Results
+    carry the model's `version`, so figures computed under another price
+    can be recognised and repriced without running the model again.
+    """
+
+    def __init__(self, version, usd_per_tonne=20.0, gpp_factor=18.0, net_fraction=0.5):
+        self.version = version
+        self.usd_per_tonne = float(usd_per_tonne)
+        self.gpp_factor = float(gpp_factor)
+        self.net_fraction = float(net_fraction)
+        # Formula: Flux * 18 (GPP) * 0.5 (Net) * 365 days * 10k m2 / 1M g->tonnes * 3.67 (C->CO2)
+        self.tonnes_per_flux = (self.gpp_factor * self.net_fraction * 365 * 10000 / 1_000_000) * (44/12)
+        self.usd_per_flux = self.tonnes_per_flux * self.usd_per_tonne
+
+    def with_price(self, usd_per_tonne):
+        """
+        This model at another carbon price, e.g. for a price scenario.
+        """
+        return PricingModel(
+            f"{self.version}@{float(usd_per_tonne):g}", usd_per_tonne,
+            gpp_factor=self.gpp_factor, net_fraction=self.net_fraction,
+        )
+
+    def economics(self, flux):
+        """
+        (tonnes of CO2 per year, revenue in USD) for a flux or an array of fluxes.
+        """
+        return flux * self.tonnes_per_flux, flux * self.usd_per_flux
+
+    def reprice(self, result):
+        """
+        A success result with its economics recomputed under this model from
+        its carbon_flux (and, for tiled results, its area): results cached
+        under an earlier price come back at the current one.
+        """
+        if result.get('status') != 'success' or result.get('pricing') == self.version:
+            return result
+        flux = result['carbon_flux']
+        tonnes_per_year, value_usd = self.economics(flux)
+        result = dict(
+            result, pricing=self.version,
+            annual_tonnes_co2=round(tonnes_per_year, 2), estimated_revenue_usd=round(value_usd, 2),
+        )
+        if 'area_ha' in result:
+            # Tiled totals: the mean flux is area-weighted, so the scene
+            # total is the per-hectare figure times the scored area
+            result['total_annual_tonnes_co2'] = round(tonnes_per_year * result['area_ha'], 2)
+            result['total_revenue_usd'] = round(value_usd * result['area_ha'], 2)
+        return result
+
+    def to_dict(self):
+        return {
+            "version": self.version,
+            "usd_per_tonne": self.usd_per_tonne,
+            "tonnes_co2_per_flux": round(self.tonnes_per_flux, 6),
+        }
+
+
+# The original $20/credit invoice
+DEFAULT_PRICING = PricingModel('usd20-v1')
+
+
+def carbon_economics(flux_pred, pricing=DEFAULT_PRICING):
+    """
+    Converts a predicted carbon flux into annual tonnes of CO2 and revenue.
+    """
+    return pricing.economics(flux_pred)
+
+
+def flux_result(flux_pred, pricing=DEFAULT_PRICING):
+    """
+    The success payload for a whole-scene carbon flux prediction.
+    """
+    tonnes_per_year, value_usd = carbon_economics(flux_pred, pricing)
+    return {
+        "status": "success",
+        "carbon_flux": round(flux_pred, 4),
+        "annual_tonnes_co2": round(tonnes_per_year, 2),
+        "estimated_revenue_usd": round(value_usd, 2),
+        "pricing": pricing.version,
+    }
@@ -0,0 +1,169 @@
+import os
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development only
+    fcntl = None
+
+# Deliberately free of Django imports, like cache.py.
+
+EMBEDDING_DIM = 512
+
+
+class EmbeddingStore:
+    """
+    Append-only store of ResNet feature vectors for one extractor version.
+
+    Vectors live in `vectors.f32`, a float32 matrix of `dim` columns that is
+    memory-mapped for reads; `keys.txt` holds one key per line, line n naming
+    row n. A row is written before its key, so a key on disk always points
+    at a complete vector. Appends from several processes are serialized with
+    an advisory lock, and each process re-reads the key file when it grows.
+    """
+
+    def __init__(self, directory, dim=EMBEDDING_DIM):
+        self.directory = str(directory)
+        self.dim = int(dim)
+        self.row_bytes = self.dim * 4
+        self.vectors_path = os.path.join(self.directory, 'vectors.f32')
+        self.keys_path = os.path.join(self.directory, 'keys.txt')
+        self.lock_path = os.path.join(self.directory, '.lock')
+
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._keys = []
+        self._keys_size = 0
+        self._matrix = None
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        for path in (self.vectors_path, self.keys_path):
+            open(path, 'ab').close()
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._keys)
+
+    def __contains__(self, key):
+        with self._lock:
+            self._refresh()
+            return key in self._rows
+
+    def get(self, key):
+        """
+        The stored vector for `key` (a float32 copy), or None.
+        """
+        with self._lock:
+            self._refresh()
+            row = self._rows.get(key)
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return np.array(self._matrix[row])
+
+    def put(self, key, vector):
+        """
+        Stores `vector` under `key` unless the key is already present.
+        Vectors are deterministic for a given key, so the first write wins.
+        """
+        vector = np.ascontiguousarray(vector, dtype=np.float32).reshape(-1)
+        if vector.size != self.dim:
+            raise ValueError(f"Expected a {self.dim}-d vector, got {vector.size}")
+        with self._lock:
+            self._refresh()
+            if key in self._rows:
+                return
+            with _FileLock(self.lock_path):
+                # Another process may have appended since the refresh above
+                self._refresh()
+                if key in self._rows:
+                    return
+                with open(self.vectors_path, 'r+b') as f:
+                    # Drop any row left behind by a writer that died before its key
+                    f.truncate(len(self._keys) * self.row_bytes)
+                    f.seek(0, os.SEEK_END)
+                    f.write(vector.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                with open(self.keys_path, 'a', encoding='utf-8') as f:
+                    f.write(f"{key}\n")
+                self.writes += 1
+                self._refresh()
+
+    def matrix(self, keys=None):
+        """
+        Returns (keys, matrix): the stored keys and a read-only (n, dim)
+        float32 matrix with one row per key. With `keys`, only those present
+        in the store, in the order given.
+        """
+        with self._lock:
+            self._refresh()
+            if keys is None:
+                return list(self._keys), self._matrix
+            found = [k for k in keys if k in self._rows]
+            return found, self._matrix[[self._rows[k] for k in found]]
+
+    def stats(self):
+        with self._lock:
+            self._refresh()
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._keys),
+                "dim": self.dim,
+                "bytes": len(self._keys) * self.row_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+    def _refresh(self):
+        # Caller holds self._lock. Picks up rows appended by any process.
+        size = os.path.getsize(self.keys_path)
+        if size == self._keys_size and self._matrix is not None:
+            return
+        with open(self.keys_path, 'rb') as f:
+            f.seek(self._keys_size)
+            tail = f.read(size - self._keys_size)
+        # Only whole lines; a partial one is finished on the next refresh
+        complete = tail[:tail.rfind(b'\n') + 1]
+        for line in complete.decode('utf-8').splitlines():
+            self._rows.setdefault(line, len(self._keys))
+            self._keys.append(line)
+        self._keys_size += len(complete)
+
+        if self._keys:
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode='r',
+                                     shape=(len(self._keys), self.dim))
+        else:
+            self._matrix = np.empty((0, self.dim), dtype=np.float32)
+
+
+class _FileLock:
+    """
+    Exclusive advisory lock on a file, held for the `with` block.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
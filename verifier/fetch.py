@@ -0,0 +1,336 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+
+import rasterio
+import requests
+from rasterio.errors import RasterioError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from django.conf import settings
+
+# GDAL settings for /vsicurl/ range reads: don't list "directories" on the
+# server, merge adjacent ranges, and keep fetched blocks in memory.
+GDAL_HTTP_DEFAULTS = {
+    'GDAL_DISABLE_READDIR_ON_OPEN': 'EMPTY_DIR',
+    'GDAL_HTTP_MULTIRANGE': 'YES',
+    'GDAL_HTTP_MERGE_CONSECUTIVE_RANGES': 'YES',
+    'VSI_CACHE': 'TRUE',
+    'CPL_VSIL_CURL_ALLOWED_EXTENSIONS': '.tif,.tiff,.TIF,.TIFF',
+}
+
+
+class FetchedRaster:
+    """
+    Where to read a remote raster from, and the key to cache its results under.
+    `path` is either a file in the download cache or a GDAL /vsicurl/ path.
+    """
+
+    def __init__(self, path, content_key, ranged=False):
+        self.path = path
+        self.content_key = content_key
+        self.ranged = ranged
+
+
+class RemoteFetcher:
+    """
+    Shared HTTP fetch layer for remote TIFFs.
+
+    * One keep-alive connection pool for the whole process, with timeouts
+      and a small retry budget for gateway errors.
+    * Whole-file downloads land in a size-bounded on-disk cache and are
+      revalidated with ETag / Last-Modified once they are older than
+      `fresh_seconds`; a 304 reuses the cached copy.
+    * Tiled GeoTIFFs with overviews on servers that accept byte ranges are
+      not downloaded at all: they are read through GDAL's /vsicurl/, so only
+      the header, the requested bands and the overview level actually used
+      cross the network. Whether a URL qualifies is remembered per URL (up
+      to `max_probes` of them): for `fresh_seconds` without asking again,
+      then with one HEAD, opening the file again only if its ETag /
+      Last-Modified changed.
+    """
+
+    def __init__(self, cache_dir, max_cache_bytes=2 * 1024 ** 3, connect_timeout=5.0,
+                 read_timeout=60.0, chunk_size=1024 * 1024, pool_size=16,
+                 fresh_seconds=300, range_reads=True, max_probes=4096):
+        self.cache_dir = str(cache_dir)
+        self.max_cache_bytes = int(max_cache_bytes)
+        self.timeout = (connect_timeout, read_timeout)
+        self.chunk_size = int(chunk_size)
+        self.fresh_seconds = fresh_seconds
+        self.range_reads = range_reads
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.session = requests.Session()
+        retries = Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504),
+                        allowed_methods=('GET', 'HEAD'))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        for key, value in GDAL_HTTP_DEFAULTS.items():
+            os.environ.setdefault(key, value)
+        os.environ.setdefault('GDAL_HTTP_TIMEOUT', str(int(read_timeout)))
+
+        self.max_probes = max(0, int(max_probes))
+        self._probes = OrderedDict()
+        self._probes_lock = threading.Lock()
+
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.counters = {
+            "downloads": 0,
+            "fresh_hits": 0,
+            "revalidated": 0,
+            "range_reads": 0,
+            "probes": 0,
+            "probe_hits": 0,
+            "bytes_downloaded": 0,
+            "evictions": 0,
+        }
+
+    def fetch(self, url):
+        """
+        Returns a FetchedRaster for `url`.
+        """
+        if self.range_reads:
+            ranged = self._try_range_read(url)
+            if ranged is not None:
+                return ranged
+        return self._fetch_to_cache(url)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self.counters)
+        stats["cache_bytes"] = sum(size for _, size, _ in self._cached_files())
+        stats["max_cache_bytes"] = self.max_cache_bytes
+        return stats
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self.counters[name] += amount
+
+    def _lock_for(self, key):
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    # Range reads (Cloud-Optimized GeoTIFFs)
+
+    def _try_range_read(self, url):
+        probe = self._probe(url)
+        if probe is not None and time.time() - probe[0] < self.fresh_seconds:
+            self._count("probe_hits")
+            return self._ranged(probe[2])
+
+        try:
+            head = self.session.head(url, timeout=self.timeout, allow_redirects=True)
+        except requests.RequestException:
+            return None
+        version = None
+        if head.status_code == 200 and head.headers.get('Accept-Ranges', '').lower() == 'bytes':
+            # Only worth it when the server identifies the version of the bytes
+            version = head.headers.get('ETag') or head.headers.get('Last-Modified')
+        if not version:
+            self._remember(url, None, None)
+            return None
+
+        digest = hashlib.sha256(f"{head.url}\n{version}\n{head.headers.get('Content-Length', '')}".encode())
+        content_key = f"url-{digest.hexdigest()}"
+        if probe is not None and probe[1] == content_key:
+            # Same bytes as last time: no need to open the file to know
+            self._count("probe_hits")
+            fetched = probe[2]
+        else:
+            self._count("probes")
+            path = f"/vsicurl/{head.url}"
+            try:
+                with rasterio.open(path) as src:
+                    is_cog = src.profile.get('tiled') and (
+                        src.overviews(1) or max(src.width, src.height) <= 1024
+                    )
+            except RasterioError:
+                is_cog = False
+            fetched = FetchedRaster(path, content_key, ranged=True) if is_cog else None
+        self._remember(url, content_key, fetched)
+        return self._ranged(fetched)
+
+    def _ranged(self, fetched):
+        if fetched is not None:
+            self._count("range_reads")
+        return fetched
+
+    def _probe(self, url):
+        # (checked_at, content_key, FetchedRaster or None) of the last probe
+        with self._probes_lock:
+            probe = self._probes.get(url)
+            if probe is not None:
+                self._probes.move_to_end(url)
+            return probe
+
+    def _remember(self, url, content_key, fetched):
+        if not self.max_probes:
+            return
+        with self._probes_lock:
+            self._probes[url] = (time.time(), content_key, fetched)
+            self._probes.move_to_end(url)
+            while len(self._probes) > self.max_probes:
+                self._probes.popitem(last=False)
+
+    # Whole-file downloads
+
+    def _paths(self, url):
+        name = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{name}.tif"), os.path.join(self.cache_dir, f"{name}.json")
+
+    def _fetch_to_cache(self, url):
+        data_path, meta_path = self._paths(url)
+        with self._lock_for(data_path):
+            meta = self._read_meta(meta_path) if os.path.exists(data_path) else None
+
+            if meta and time.time() - meta.get('checked_at', 0) < self.fresh_seconds:
+                self._count("fresh_hits")
+                os.utime(data_path)
+                return FetchedRaster(data_path, meta['content_hash'])
+
+            headers = {}
+            if meta and meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta and meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+            with self.session.get(url, stream=True, timeout=self.timeout, headers=headers) as response:
+                if response.status_code == 304 and meta:
+                    self._count("revalidated")
+                    meta['checked_at'] = time.time()
+                    self._write_meta(meta_path, meta)
+                    os.utime(data_path)
+                    return FetchedRaster(data_path, meta['content_hash'])
+                response.raise_for_status()
+
+                # Stream to a temp file, hashing as we go, then swap it in
+                digest = hashlib.sha256()
+                size = 0
+                fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.part')
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        for chunk in response.iter_content(chunk_size=self.chunk_size):
+                            f.write(chunk)
+                            digest.update(chunk)
+                            size += len(chunk)
+                    os.replace(tmp_path, data_path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+
+                meta = {
+                    "url": url,
+                    "etag": response.headers.get('ETag'),
+                    "last_modified": response.headers.get('Last-Modified') or formatdate(usegmt=True),
+                    "content_hash": digest.hexdigest(),
+                    "size": size,
+                    "checked_at": time.time(),
+                }
+            self._write_meta(meta_path, meta)
+            self._count("downloads")
+            self._count("bytes_downloaded", size)
+
+        self._enforce_size_limit(keep=data_path)
+        return FetchedRaster(data_path, meta['content_hash'])
+
+    def _read_meta(self, meta_path):
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, meta_path, meta):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.part')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def _cached_files(self):
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.tif'):
+                stat = entry.stat()
+                yield entry.path, stat.st_size, stat.st_mtime
+
+    def _enforce_size_limit(self, keep=None):
+        # Least recently used first (mtime is touched on every hit)
+        files = sorted(self._cached_files(), key=lambda f: f[2])
+        total = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if total <= self.max_cache_bytes:
+                break
+            if path == keep:
+                continue
+            for stale in (path, path[:-len('.tif')] + '.json'):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+            total -= size
+            self._count("evictions")
+
+
+class RateLimiter:
+    """
+    Token bucket for pacing requests to remote servers: on average `rate`
+    acquisitions per second, in bursts of at most `burst`. acquire() blocks
+    until a token is available. A rate of 0 or None never waits.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate or 0)
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited_seconds += wait
+        if wait:
+            time.sleep(wait)
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher():
+    """
+    The per-process RemoteFetcher, created on first use.
+    """
+    global _fetcher
+    if _fetcher is None:
+        with _fetcher_lock:
+            if _fetcher is None:
+                cache_dir = getattr(settings, 'VUNA_CACHE_DIR', settings.BASE_DIR / 'cache')
+                _fetcher = RemoteFetcher(
+                    cache_dir=os.path.join(cache_dir, 'downloads'),
+                    max_cache_bytes=getattr(settings, 'VUNA_FETCH_CACHE_BYTES', 2 * 1024 ** 3),
+                    connect_timeout=getattr(settings, 'VUNA_FETCH_CONNECT_TIMEOUT', 5.0),
+                    read_timeout=getattr(settings, 'VUNA_FETCH_READ_TIMEOUT', 60.0),
+                    chunk_size=getattr(settings, 'VUNA_FETCH_CHUNK_SIZE', 1024 * 1024),
+                    pool_size=getattr(settings, 'VUNA_FETCH_POOL_SIZE', 16),
+                    fresh_seconds=getattr(settings, 'VUNA_FETCH_FRESH_SECONDS', 300),
+                    range_reads=getattr(settings, 'VUNA_FETCH_RANGE_READS', True),
+                )
+    return _fetcher
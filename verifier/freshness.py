@@ -0,0 +1,56 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import Project
+from .pricing import get_pricing
+
+VERSION_CACHE_KEY = 'vuna:projects:version'
+
+
+def projects_version():
+    """
+    {"etag": str, "last_modified": datetime or None} describing the current
+    state of the Project table.
+
+    Served from Django's cache so conditional requests don't touch the
+    database; on a miss it is rebuilt with one aggregate query. Writes drop
+    it through projects_changed(). The ETag also covers deletions (row
+    count), which Last-Modified alone can't express.
+    """
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        agg = Project.objects.aggregate(last_modified=Max('updated_at'), count=Count('id'), max_id=Max('id'))
+        stamp = f"{agg['last_modified'].isoformat() if agg['last_modified'] else ''}-{agg['count']}-{agg['max_id']}"
+        version = {
+            "etag": hashlib.sha256(stamp.encode()).hexdigest()[:20],
+            "last_modified": agg['last_modified'],
+        }
+        # Bounded so processes with a per-process cache still converge
+        cache.set(VERSION_CACHE_KEY, version, getattr(settings, 'VUNA_PROJECTS_VERSION_TTL', 60))
+    return version
+
+
+def projects_changed():
+    """
+    Call after writes that bypass model signals (update(), bulk_update(),
+    bulk_create()) so list ETags move on. Such writes must set updated_at
+    themselves (auto_now doesn't apply to them): the version is derived
+    from it.
+    """
+    cache.delete(VERSION_CACHE_KEY)
+
+
+def projects_etag(request, *args, **kwargs):
+    # Different URLs (paths, query strings) are different representations,
+    # and CO2 / revenue are priced at query time, so a new default pricing
+    # model is a new representation too
+    pricing = get_pricing()
+    stamp = f"{projects_version()['etag']}{pricing.version}:{pricing.usd_per_flux!r}{request.get_full_path()}"
+    return hashlib.sha256(stamp.encode()).hexdigest()[:32]
+
+
+def projects_last_modified(request, *args, **kwargs):
+    return projects_version()['last_modified']
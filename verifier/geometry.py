@@ -0,0 +1,226 @@
+import json
+import re
+
+import numpy as np
+
+# Deliberately free of Django imports: plain GeoJSON polygon helpers.
+
+
+def parse_boundary(text):
+    """
+    A stored geojson_boundary string -> its Polygon / MultiPolygon geometry
+    dict, or None if it's empty, invalid or another geometry type.
+    """
+    if not text:
+        return None
+    try:
+        geometry = json.loads(text)
+    except ValueError:
+        return None
+    # Accept a bare geometry, a Feature, or a one-feature collection
+    if geometry.get('type') == 'Feature':
+        geometry = geometry.get('geometry')
+    elif geometry.get('type') == 'FeatureCollection':
+        features = geometry.get('features') or []
+        geometry = features[0].get('geometry') if features else None
+    if not geometry or geometry.get('type') not in ('Polygon', 'MultiPolygon'):
+        return None
+    return geometry
+
+
+def geometry_polygons(geometry):
+    """
+    Polygon / MultiPolygon coordinates as a list of polygons (lists of rings).
+    """
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    return geometry['coordinates']
+
+
+def geometry_bbox(geometry):
+    """
+    (min_x, min_y, max_x, max_y) of a Polygon / MultiPolygon, or None.
+    """
+    coords = [point for polygon in geometry_polygons(geometry) for ring in polygon for point in ring]
+    if not coords:
+        return None
+    xs = [p[0] for p in coords]
+    ys = [p[1] for p in coords]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def polygon_centroid(geometry):
+    """
+    Area-weighted centroid (x, y) of a Polygon / MultiPolygon, holes
+    subtracted. Planar in the input coordinates, which is fine at the scale
+    of a forest. Falls back to the vertex mean for degenerate shapes.
+    """
+    total_area = cx = cy = 0.0
+    for polygon in geometry_polygons(geometry):
+        for i, ring in enumerate(polygon):
+            pts = np.asarray([p[:2] for p in ring], dtype=np.float64)
+            if len(pts) < 3:
+                continue
+            x, y = pts[:, 0], pts[:, 1]
+            x2, y2 = np.roll(x, -1), np.roll(y, -1)
+            cross = x * y2 - x2 * y
+            area = cross.sum() / 2.0
+            if not area:
+                continue
+            # Exterior rings add, holes subtract, whatever their winding
+            sign = 1.0 if i == 0 else -1.0
+            weight = sign * abs(area)
+            cx += weight * ((x + x2) * cross).sum() / (6.0 * area)
+            cy += weight * ((y + y2) * cross).sum() / (6.0 * area)
+            total_area += weight
+    if total_area:
+        return float(cx / total_area), float(cy / total_area)
+    coords = [p for polygon in geometry_polygons(geometry) for ring in polygon for p in ring]
+    if not coords:
+        return None
+    return sum(p[0] for p in coords) / len(coords), sum(p[1] for p in coords) / len(coords)
+
+
+_FEATURES_KEY = re.compile(r'"features"\s*:\s*\[')
+
+
+def iter_geojson_features(f, chunk_size=1 << 20):
+    """
+    Yields the features of a GeoJSON FeatureCollection one at a time from a
+    text file object, holding roughly one chunk plus one feature in memory
+    rather than the whole document.
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    eof = False
+
+    def fill():
+        nonlocal buf, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buf += chunk
+
+    # Skip to the start of the features array
+    while True:
+        match = _FEATURES_KEY.search(buf)
+        if match:
+            buf = buf[match.end():]
+            break
+        if eof:
+            raise ValueError("No \"features\" array found")
+        # Keep a tail in case the key straddles two chunks
+        buf = buf[-32:]
+        fill()
+
+    pos = 0
+    while True:
+        # Skip separators between features
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            buf, pos = '', 0
+            fill()
+        if pos >= len(buf):
+            raise ValueError("Unterminated \"features\" array")
+        if buf[pos] == ']':
+            return
+        try:
+            feature, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Feature continues in the next chunk
+            buf, pos = buf[pos:], 0
+            fill()
+            continue
+        yield feature
+        pos = end
+        if pos > chunk_size:
+            buf, pos = buf[pos:], 0
+
+
+def boxes_intersect(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+class PreparedPolygon:
+    """
+    A Polygon / MultiPolygon with its rings held as numpy edge arrays, for
+    fast repeated point-in-polygon and box-intersection tests.
+    """
+
+    def __init__(self, geometry):
+        self.bbox = geometry_bbox(geometry)
+        self.polygons = []
+        for polygon in geometry_polygons(geometry):
+            rings = []
+            for ring in polygon:
+                pts = np.asarray([p[:2] for p in ring], dtype=np.float64)
+                if len(pts) < 3:
+                    continue
+                if not np.array_equal(pts[0], pts[-1]):
+                    pts = np.vstack([pts, pts[:1]])
+                # (x1, y1, x2, y2) per edge
+                rings.append(np.hstack([pts[:-1], pts[1:]]))
+            if rings:
+                self.polygons.append(rings)
+
+    def contains(self, x, y):
+        """
+        Even-odd ray casting; holes are honoured. Points exactly on an edge
+        may fall either way.
+        """
+        if self.bbox is None or not (self.bbox[0] <= x <= self.bbox[2] and self.bbox[1] <= y <= self.bbox[3]):
+            return False
+        for rings in self.polygons:
+            if _ring_contains(rings[0], x, y) and not any(_ring_contains(h, x, y) for h in rings[1:]):
+                return True
+        return False
+
+    def intersects_box(self, box):
+        """
+        Exact test against an axis-aligned (min_x, min_y, max_x, max_y) box.
+        """
+        if self.bbox is None or not boxes_intersect(self.bbox, box):
+            return False
+        min_x, min_y, max_x, max_y = box
+        for rings in self.polygons:
+            for edges in rings:
+                # A vertex inside the box
+                x1, y1 = edges[:, 0], edges[:, 1]
+                if np.any((x1 >= min_x) & (x1 <= max_x) & (y1 >= min_y) & (y1 <= max_y)):
+                    return True
+                # An edge crossing the box
+                if _edges_cross_box(edges, box):
+                    return True
+        # Otherwise the box is either wholly inside the polygon or outside it
+        return self.contains((min_x + max_x) / 2.0, (min_y + max_y) / 2.0)
+
+
+def _ring_contains(edges, x, y):
+    x1, y1, x2, y2 = edges[:, 0], edges[:, 1], edges[:, 2], edges[:, 3]
+    straddles = (y1 > y) != (y2 > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cross_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    return bool(np.count_nonzero(straddles & (x < cross_x)) % 2)
+
+
+def _edges_cross_box(edges, box):
+    # Liang-Barsky: does any segment have a non-empty part inside the box?
+    min_x, min_y, max_x, max_y = box
+    x1, y1 = edges[:, 0], edges[:, 1]
+    dx, dy = edges[:, 2] - x1, edges[:, 3] - y1
+    t0 = np.zeros(len(edges))
+    t1 = np.ones(len(edges))
+    ok = np.ones(len(edges), dtype=bool)
+    for p, q in ((-dx, x1 - min_x), (dx, max_x - x1), (-dy, y1 - min_y), (dy, max_y - y1)):
+        parallel = p == 0
+        ok &= ~(parallel & (q < 0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = np.where(parallel, 0.0, q / np.where(parallel, 1.0, p))
+        t0 = np.where(~parallel & (p < 0), np.maximum(t0, r), t0)
+        t1 = np.where(~parallel & (p > 0), np.minimum(t1, r), t1)
+    return bool(np.any(ok & (t0 <= t1)))
@@ -0,0 +1,100 @@
+import csv
+import datetime
+
+from django.db.models import Avg, Count, Max, Min
+from django.db.models.functions import TruncMonth, TruncYear
+
+from .models import VerificationRecord
+from .pricing import get_pricing
+
+
+def history_series(project_id, start=None, end=None, pricing=None):
+    """
+    A project's verification history as monthly and yearly series: per
+    period, the number of scenes, their date range, the mean flux and the
+    tonnes of CO2 and revenue it is worth under `pricing` (default: the
+    configured pricing model). Aggregated in the database on the
+    (project, acquired_on) index; no raster is read.
+    """
+    pricing = pricing or get_pricing()
+    records = VerificationRecord.objects.filter(project_id=project_id)
+    if start:
+        records = records.filter(acquired_on__gte=start)
+    if end:
+        records = records.filter(acquired_on__lte=end)
+    totals = records.aggregate(scenes=Count('id'), first=Min('acquired_on'), last=Max('acquired_on'))
+    return {
+        "project_id": project_id,
+        "scenes": totals['scenes'],
+        "first": _iso(totals['first']),
+        "last": _iso(totals['last']),
+        "pricing": pricing.version,
+        "monthly": _series(records, TruncMonth, '%Y-%m', pricing),
+        "yearly": _series(records, TruncYear, '%Y', pricing),
+    }
+
+
+def recorded_scenes(project_ids=None):
+    """
+    {project_id: set of raster_keys} already in the history, for skipping
+    known scenes when re-verifying incrementally.
+    """
+    records = VerificationRecord.objects.all()
+    if project_ids is not None:
+        records = records.filter(project_id__in=list(project_ids))
+    known = {}
+    for project_id, raster_key in records.values_list('project_id', 'raster_key').iterator(chunk_size=5000):
+        known.setdefault(project_id, set()).add(raster_key)
+    return known
+
+
+def read_manifest(path):
+    """
+    Scenes listed in a CSV with project_id and source (path or URL)
+    columns, and optionally acquired_on (YYYY-MM-DD), as
+    [(project_id, source, acquired_on or None)]. Raises ValueError on a
+    malformed row and OSError if the file can't be read.
+    """
+    work = []
+    with open(path, newline='') as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            try:
+                acquired_on = row.get('acquired_on') or None
+                work.append((
+                    int(row['project_id']),
+                    row['source'].strip(),
+                    datetime.date.fromisoformat(acquired_on) if acquired_on else None,
+                ))
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                raise ValueError(f"{path} line {line}: {e}")
+    return work
+
+
+def _series(records, trunc, label, pricing):
+    rows = (
+        records.annotate(period=trunc('acquired_on'))
+        .values('period')
+        .annotate(
+            scenes=Count('id'), first=Min('acquired_on'), last=Max('acquired_on'),
+            carbon_flux=Avg('carbon_flux'),
+        )
+        .order_by('period')
+    )
+    series = []
+    for row in rows:
+        # Linear in the flux, so the mean of the scenes' economics
+        tonnes_per_year, value_usd = pricing.economics(row['carbon_flux'])
+        series.append({
+            "period": row['period'].strftime(label),
+            "scenes": row['scenes'],
+            "first": _iso(row['first']),
+            "last": _iso(row['last']),
+            "carbon_flux": round(row['carbon_flux'], 4),
+            "annual_tonnes_co2": round(tonnes_per_year, 2),
+            "estimated_revenue_usd": round(value_usd, 2),
+        })
+    return series
+
+
+def _iso(value):
+    return value.isoformat() if value else None
@@ -0,0 +1,221 @@
+import copy
+import logging
+import os
+
+import numpy as np
+import torch
+import torch.nn as nn
+import xgboost as xgb
+from torchvision import models, transforms
+
+from .cache import file_version
+from .embeddings import EMBEDDING_DIM
+from .raster import MODEL_SHAPE
+
+# Deliberately free of Django imports: the inference server runs it without
+# a configured Django project. This is the only module that loads torch or
+# xgboost for serving; web processes pointed at an inference server
+# (VUNA_INFERENCE_SOCKET) never import it.
+
+logger = logging.getLogger(__name__)
+
+EXTRACTOR_BACKENDS = ('eager', 'torchscript', 'int8')
+
+# The pretrained weights the extractor is built on
+RESNET_WEIGHTS = models.ResNet18_Weights.IMAGENET1K_V1
+
+
+def resnet_trunk(seed=0, weights_path=None):
+    """
+    The fp32 ResNet18 feature extractor (everything up to the pooled 512-d
+    vector), in eval mode.
+
+    The ImageNet weights come from `weights_path` when it exists (a state
+    dict saved by manage.py fetch_resnet_weights), so nothing is downloaded
+    at startup; otherwise torchvision fetches them into its hub cache.
+    """
+    if weights_path and not os.path.exists(weights_path):
+        logger.warning(
+            "ResNet weights not found at %s; downloading them instead (run manage.py fetch_resnet_weights "
+            "to keep a local copy)", weights_path,
+        )
+        weights_path = None
+    if weights_path:
+        resnet = models.resnet18(weights=None)
+        resnet.load_state_dict(torch.load(weights_path, map_location='cpu', weights_only=True))
+    else:
+        resnet = models.resnet18(weights=RESNET_WEIGHTS)
+    # Modify first layer for 3 channels (standard) - Wait, previous code had specific stride/padding?
+    # Original: resnet.conv1 = nn.Conv2d(3, 64, kernel_size=7, stride=2, padding=3, bias=False)
+    # ResNet18 default is 3 channels, but let's match the original script exactly to be safe.
+    # The replaced conv1 is freshly initialised, so seed it: every process
+    # must build identical weights or cached results would depend on which
+    # worker produced them.
+    with torch.random.fork_rng():
+        torch.manual_seed(seed)
+        resnet.conv1 = nn.Conv2d(3, 64, kernel_size=7, stride=2, padding=3, bias=False)
+    return nn.Sequential(*list(resnet.children())[:-1]).eval()
+
+
+def fetch_resnet_weights(path, progress=False):
+    """
+    Downloads the ImageNet ResNet18 state dict to `path`, checking it against
+    the hash in torchvision's file name. The file only appears once complete.
+    """
+    url = RESNET_WEIGHTS.url
+    # torchvision names its files <arch>-<first sha256 hex digits>.pth
+    hash_prefix = os.path.splitext(os.path.basename(url))[0].rsplit('-', 1)[-1]
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    torch.hub.download_url_to_file(url, str(path), hash_prefix=hash_prefix, progress=progress)
+    return url
+
+
+class InferenceEngine:
+    """
+    The two models behind a verification: the ResNet18 "eyes" turning
+    preprocessed (3, H, W) band stacks into 512-d features, and the XGBoost
+    "brain" turning features into carbon flux. CPU only.
+
+    `info` describes the loaded models; callers build their cache and
+    embedding-store versions from it, so a web process and an inference
+    server agree on them.
+    """
+
+    def __init__(self, model_path, seed=0, backend='eager', calibration_path=None, weights_path=None):
+        # 1. Load the XGBoost Brain
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model file not found at {model_path}")
+        self.xgb_model = xgb.XGBRegressor()
+        self.xgb_model.load_model(str(model_path))
+
+        # 2. Load the ResNet Eyes, optionally frozen or int8-quantized
+        self.device = torch.device("cpu")
+        calibration = None
+        extractor_tag = ''
+        if backend == 'int8':
+            if not calibration_path or not os.path.exists(calibration_path):
+                raise FileNotFoundError(
+                    f"int8 extractor needs calibration inputs at {calibration_path}; run manage.py calibrate_extractor"
+                )
+            calibration = load_calibration(calibration_path)
+            extractor_tag = f"-int8.{file_version(calibration_path, length=8)}"
+        elif backend != 'eager':
+            extractor_tag = f"-{backend}"
+        self.feature_extractor = build_extractor(
+            resnet_trunk(seed, weights_path).to(self.device), backend, calibration=calibration
+        )
+
+        # 3. Image Resizer (only needed for inputs not already at model size)
+        self.resizer = transforms.Resize(MODEL_SHAPE)
+
+        self.info = {
+            "model_version": file_version(model_path),
+            "extractor": f"r{seed}",
+            # Non-eager backends produce slightly different features
+            "extractor_tag": extractor_tag,
+            "backend": backend,
+            "dim": EMBEDDING_DIM,
+        }
+
+    def embed(self, inputs):
+        """
+        Input: sequence of preprocessed (3, H, W) float32 arrays.
+        Output: (n, 512) float32 array of ResNet features.
+        """
+        tensors = []
+        for img in inputs:
+            tensor = torch.from_numpy(np.ascontiguousarray(img, dtype=np.float32))
+            if tuple(tensor.shape[1:]) != MODEL_SHAPE:
+                tensor = self.resizer(tensor.unsqueeze(0))[0]
+            tensors.append(tensor)
+        batch = torch.stack(tensors).to(self.device)
+        with torch.inference_mode():
+            return self.feature_extractor(batch).reshape(len(tensors), -1).numpy()
+
+    def score(self, features):
+        """
+        Input: (n, 512) features. Output: (n,) float64 predicted carbon flux.
+        """
+        return np.asarray(self.xgb_model.predict(np.asarray(features, dtype=np.float32)), dtype=np.float64)
+
+
+def build_extractor(module, backend='eager', calibration=None, calibration_batch_size=16):
+    """
+    Returns an inference-ready version of an fp32 feature extractor.
+
+    * eager: the module itself, in eval mode.
+    * torchscript: traced and frozen, which folds BatchNorm into the
+      preceding convolutions, then optimized for inference.
+    * int8: post-training static quantization calibrated on `calibration`,
+      an (N, 3, 128, 128) array of preprocessed model inputs, then frozen.
+
+    `module` is never modified.
+    """
+    if backend not in EXTRACTOR_BACKENDS:
+        raise ValueError(f"Unknown extractor backend {backend!r}; expected one of {', '.join(EXTRACTOR_BACKENDS)}")
+    module.eval()
+    if backend == 'eager':
+        return module
+    if backend == 'int8':
+        if calibration is None or not len(calibration):
+            raise ValueError("The int8 backend needs calibration inputs (manage.py calibrate_extractor)")
+        module = quantize_int8(module, calibration, batch_size=calibration_batch_size)
+    return freeze(module)
+
+
+def freeze(module):
+    """
+    Traces `module` on a model-sized input and freezes it (constant weights,
+    conv-bn folding) for CPU inference.
+    """
+    example = torch.zeros((1, 3) + MODEL_SHAPE)
+    with torch.inference_mode():
+        traced = torch.jit.trace(module, example)
+    frozen = torch.jit.optimize_for_inference(torch.jit.freeze(traced.eval()))
+    # Let the JIT profile and specialize before the first real request
+    with torch.inference_mode():
+        for _ in range(2):
+            frozen(example)
+    return frozen
+
+
+def quantize_int8(module, calibration, batch_size=16):
+    """
+    FX graph-mode static quantization: weights and activations to int8,
+    activation ranges observed over the calibration inputs.
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    engine = quantized_engine()
+    torch.backends.quantized.engine = engine
+    example = (torch.zeros((1, 3) + MODEL_SHAPE),)
+    prepared = prepare_fx(copy.deepcopy(module).eval(), get_default_qconfig_mapping(engine), example)
+
+    calibration = np.asarray(calibration, dtype=np.float32)
+    with torch.inference_mode():
+        for start in range(0, len(calibration), batch_size):
+            prepared(torch.from_numpy(calibration[start:start + batch_size]))
+    return convert_fx(prepared).eval()
+
+
+def quantized_engine():
+    """
+    The best quantized kernel library this torch build supports on CPU.
+    """
+    supported = torch.backends.quantized.supported_engines
+    for engine in ('x86', 'fbgemm', 'qnnpack'):
+        if engine in supported:
+            return engine
+    raise RuntimeError("This torch build has no quantized CPU engine")
+
+
+def load_calibration(path):
+    """
+    Calibration inputs saved by calibrate_extractor, as an (N, 3, 128, 128)
+    float32 array.
+    """
+    calibration = np.load(path)
+    if calibration.ndim != 4 or calibration.shape[1:] != (3,) + MODEL_SHAPE:
+        raise ValueError(f"{path} does not hold (N, 3, {MODEL_SHAPE[0]}, {MODEL_SHAPE[1]}) model inputs")
+    return calibration.astype(np.float32, copy=False)
@@ -0,0 +1,219 @@
+"""
+Pre-forked inference server.
+
+The parent loads the ResNet and XGBoost models once, then forks workers
+that share the weights copy-on-write: nothing writes to the weight
+buffers, so each extra worker costs little more than its own stack and
+activations. Workers accept connections from a shared UNIX socket and
+answer one request per connection using the framing in verifier/ipc.py.
+Dead workers are replaced; SIGTERM / SIGINT stop the pool.
+
+Run it with `manage.py inference_server` (settings-driven) or standalone:
+
+    python -m verifier.inference_server --socket /run/vuna/inference.sock \\
+        --model vuna_hybrid_gosif_model.json --workers 4
+
+then point the web processes at it with VUNA_INFERENCE_SOCKET.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+import numpy as np
+
+from .ipc import (
+    OP_EMBED, OP_INFO, OP_SCORE, STATUS_ERROR, STATUS_OK, ProtocolError, decode_array, encode_array,
+    recv_frame, send_frame,
+)
+from .raster import MODEL_SHAPE
+
+logger = logging.getLogger('vuna.inference_server')
+
+
+class InferenceServer:
+    """
+    Loads an engine with `engine_factory()` and serves it from `workers`
+    forked processes on `socket_path`. Each worker runs torch with
+    `threads` intra-op threads (default: CPU count / workers).
+    """
+
+    def __init__(self, socket_path, engine_factory, workers=2, threads=None, timeout=60.0, backlog=128):
+        self.socket_path = str(socket_path)
+        self.engine_factory = engine_factory
+        self.workers = max(1, int(workers))
+        self.threads = threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.timeout = timeout
+        self.backlog = backlog
+        self.engine = None
+        self._listener = None
+        self._children = set()
+        self._stopping = False
+
+    def serve_forever(self):
+        import torch
+
+        # Keep the parent off torch's intra-op thread pool: a pool started
+        # before fork() is unusable in the children.
+        torch.set_num_threads(1)
+        started = time.perf_counter()
+        self.engine = self.engine_factory()
+        # Move everything loaded so far out of the collector's reach, so
+        # gc passes in the workers don't touch (and copy) the shared pages
+        gc.collect()
+        gc.freeze()
+        logger.info("Models loaded in %.2fs: %s", time.perf_counter() - started, self.engine.info)
+
+        self._listener = self._bind()
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        try:
+            for _ in range(self.workers):
+                self._spawn()
+            while not self._stopping:
+                try:
+                    pid, status = os.wait()
+                except ChildProcessError:
+                    break
+                except InterruptedError:
+                    continue
+                if pid in self._children:
+                    self._children.discard(pid)
+                    if not self._stopping:
+                        logger.warning("Worker %d exited with status %d; restarting", pid, status)
+                        # Don't spin if workers die straight away
+                        time.sleep(1)
+                        self._spawn()
+        finally:
+            self._shutdown()
+
+    def _bind(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        listener.listen(self.backlog)
+        return listener
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid:
+            self._children.add(pid)
+            return
+        # Child
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            self._worker()
+        except Exception:
+            logger.exception("Inference worker crashed")
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _worker(self):
+        import torch
+
+        torch.set_num_threads(self.threads)
+        # First pass pays for allocator and kernel setup before real traffic
+        self.engine.score(self.engine.embed([np.zeros((3,) + MODEL_SHAPE, dtype=np.float32)]))
+        logger.info("Worker %d ready (%d threads)", os.getpid(), self.threads)
+        while True:
+            conn, _ = self._listener.accept()
+            with conn:
+                conn.settimeout(self.timeout)
+                self._handle(conn)
+
+    def _handle(self, conn):
+        try:
+            frame = recv_frame(conn)
+        except (OSError, ProtocolError) as e:
+            logger.warning("Dropping connection: %s", e)
+            return
+        if frame is None:
+            return
+        op, payload = frame
+        try:
+            if op == OP_INFO:
+                body = json.dumps(dict(self.engine.info, workers=self.workers)).encode('utf-8')
+            elif op == OP_EMBED:
+                body = encode_array(self.engine.embed(decode_array(payload)))
+            elif op == OP_SCORE:
+                body = encode_array(self.engine.score(decode_array(payload)))
+            else:
+                raise ProtocolError(f"Unknown opcode {op}")
+            status = STATUS_OK
+        except Exception as e:
+            status, body = STATUS_ERROR, f"{type(e).__name__}: {e}".encode('utf-8')
+        try:
+            send_frame(conn, status, body)
+        except OSError as e:
+            logger.warning("Client went away: %s", e)
+
+    def _stop(self, signum, frame):
+        # os.wait() resumes after a handled signal, so end it by stopping
+        # the workers rather than only setting the flag
+        self._stopping = True
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _shutdown(self):
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self._children.discard(pid)
+        for pid in list(self._children):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self._children.clear()
+        if self._listener is not None:
+            self._listener.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def serve(socket_path, model_path, workers=2, threads=None, seed=0, backend='eager',
+          calibration_path=None, weights_path=None, timeout=60.0):
+    def load():
+        from .inference import InferenceEngine
+        return InferenceEngine(
+            model_path, seed=seed, backend=backend, calibration_path=calibration_path, weights_path=weights_path,
+        )
+
+    InferenceServer(socket_path, load, workers=workers, threads=threads, timeout=timeout).serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--socket', required=True, help="UNIX socket path to listen on")
+    parser.add_argument('--model', default='vuna_hybrid_gosif_model.json', help="XGBoost model file")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=None, help="torch threads per worker")
+    parser.add_argument('--seed', type=int, default=0, help="ResNet conv1 seed (VUNA_EXTRACTOR_SEED)")
+    parser.add_argument('--backend', default='eager', help="eager, torchscript or int8")
+    parser.add_argument('--calibration', default=None, help="Calibration inputs for the int8 backend")
+    parser.add_argument('--weights', default=None, help="Local ResNet18 weights (VUNA_RESNET_WEIGHTS)")
+    parser.add_argument('--timeout', type=float, default=60.0, help="Per-connection socket timeout")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr, format='%(asctime)s %(process)d %(message)s')
+    serve(args.socket, args.model, workers=args.workers, threads=args.threads, seed=args.seed,
+          backend=args.backend, calibration_path=args.calibration, weights_path=args.weights,
+          timeout=args.timeout)
+
+
+if __name__ == '__main__':
+    main()
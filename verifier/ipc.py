@@ -0,0 +1,170 @@
+"""
+Wire format and client for the inference server (verifier/inference_server.py).
+
+Every message is one frame: a 16-byte header (magic, protocol version,
+opcode or status, payload length) followed by the payload. Arrays travel
+as a dtype code, the shape and the raw little-endian bytes, so a batch of
+128x128 inputs costs its size plus a few bytes and no serialization work.
+
+Deliberately free of Django, torch and xgboost imports: web processes
+only need numpy to talk to the models.
+"""
+import json
+import socket
+import struct
+
+import numpy as np
+
+MAGIC = b'VUNA'
+PROTOCOL_VERSION = 1
+HEADER = struct.Struct('<4sBBxxQ')
+
+# Request opcodes
+OP_INFO = 1
+OP_EMBED = 2
+OP_SCORE = 3
+
+# Response status codes
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+_DTYPES = {1: np.dtype('<f4'), 2: np.dtype('<f8')}
+_DTYPE_CODES = {dtype: code for code, dtype in _DTYPES.items()}
+_ARRAY_PREFIX = struct.Struct('<BB')
+
+
+class ProtocolError(Exception):
+    """
+    The peer sent something that isn't a valid frame.
+    """
+
+
+class InferenceServerError(RuntimeError):
+    """
+    The inference server failed to handle a request; carries its message.
+    """
+
+
+def encode_array(array):
+    array = np.asarray(array)
+    dtype = array.dtype.newbyteorder('<')
+    if dtype not in _DTYPE_CODES:
+        array = array.astype('<f4')
+        dtype = array.dtype
+    array = np.ascontiguousarray(array, dtype=dtype)
+    return (_ARRAY_PREFIX.pack(_DTYPE_CODES[dtype], array.ndim)
+            + struct.pack(f'<{array.ndim}I', *array.shape)
+            + array.tobytes())
+
+
+def decode_array(payload):
+    """
+    Inverse of encode_array; the result is a view of `payload` (writable
+    when `payload` is a bytearray, as received frames are).
+    """
+    try:
+        code, ndim = _ARRAY_PREFIX.unpack_from(payload)
+        shape = struct.unpack_from(f'<{ndim}I', payload, _ARRAY_PREFIX.size)
+        dtype = _DTYPES[code]
+    except (struct.error, KeyError) as e:
+        raise ProtocolError(f"Bad array payload: {e}")
+    offset = _ARRAY_PREFIX.size + 4 * ndim
+    expected = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+    if len(payload) - offset != expected:
+        raise ProtocolError(f"Array payload holds {len(payload) - offset} bytes, expected {expected}")
+    return np.frombuffer(payload, dtype=dtype, offset=offset).reshape(shape)
+
+
+def send_frame(sock, code, payload=b''):
+    sock.sendall(HEADER.pack(MAGIC, PROTOCOL_VERSION, code, len(payload)) + payload)
+
+
+def recv_frame(sock, max_payload=1 << 31):
+    """
+    Reads one frame; returns (code, payload) or None if the peer closed the
+    connection before sending anything.
+    """
+    header = _recv_exact(sock, HEADER.size, allow_eof=True)
+    if header is None:
+        return None
+    magic, version, code, length = HEADER.unpack(header)
+    if magic != MAGIC or version != PROTOCOL_VERSION:
+        raise ProtocolError(f"Unexpected frame header {magic!r} v{version}")
+    if length > max_payload:
+        raise ProtocolError(f"Frame of {length} bytes exceeds the {max_payload} byte limit")
+    return code, _recv_exact(sock, length)
+
+
+def _recv_exact(sock, size, allow_eof=False):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if not n:
+            if allow_eof and not received:
+                return None
+            raise ProtocolError("Connection closed mid-frame")
+        received += n
+    # A bytearray, so arrays decoded from it are writable without a copy
+    return buf
+
+
+class InferenceClient:
+    """
+    Talks to an inference server over its UNIX socket, with the same
+    embed() / score() / info interface as an in-process InferenceEngine.
+
+    One short-lived connection per call: the server's pre-forked workers
+    each serve one connection at a time, so idle pooled connections would
+    pin workers. Connecting to a local socket costs tens of microseconds.
+    """
+
+    def __init__(self, socket_path, timeout=60.0):
+        self.socket_path = str(socket_path)
+        self.timeout = timeout
+        self._info = None
+
+    @property
+    def info(self):
+        if self._info is None:
+            self._info = json.loads(self._call(OP_INFO).decode('utf-8'))
+        return self._info
+
+    def embed(self, inputs):
+        """
+        Input: sequence of preprocessed (3, H, W) float32 arrays.
+        Output: (n, dim) float32 features. Inputs of different shapes go in
+        separate requests, since a request carries one stacked array.
+        """
+        inputs = list(inputs)
+        groups = {}
+        for index, img in enumerate(inputs):
+            groups.setdefault(tuple(np.shape(img)), []).append(index)
+        features = None
+        for indices in groups.values():
+            batch = np.stack([np.asarray(inputs[i], dtype=np.float32) for i in indices])
+            result = decode_array(self._call(OP_EMBED, encode_array(batch)))
+            if features is None:
+                features = np.empty((len(inputs), result.shape[1]), dtype=np.float32)
+            features[indices] = result
+        return features
+
+    def score(self, features):
+        """
+        Input: (n, dim) features. Output: (n,) float64 predicted carbon flux.
+        """
+        return decode_array(self._call(OP_SCORE, encode_array(np.asarray(features, dtype=np.float32))))
+
+    def _call(self, op, payload=b''):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            send_frame(sock, op, payload)
+            frame = recv_frame(sock)
+        if frame is None:
+            raise InferenceServerError("Inference server closed the connection")
+        status, body = frame
+        if status != STATUS_OK:
+            raise InferenceServerError(body.decode('utf-8', 'replace'))
+        return body
@@ -0,0 +1,165 @@
+import logging
+import multiprocessing
+import threading
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import VerificationJob
+from .worker import init_worker, run_job
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """
+    Raised when the background queue is at VUNA_JOBS_MAX_QUEUE.
+    """
+
+
+class JobQueue:
+    """
+    Bounded in-process queue in front of a pool of verifier processes.
+
+    Job state lives in the VerificationJob table so any web worker can answer
+    status polls. Work is accepted until `max_pending` jobs are queued or
+    running in this process; beyond that submit() raises QueueFull and the
+    caller should shed load instead of tying up a request thread.
+    """
+
+    def __init__(self, max_workers=2, max_pending=64):
+        self.max_workers = max(1, int(max_workers))
+        self.max_pending = max(1, int(max_pending))
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._executor = self._make_executor()
+
+    def _make_executor(self):
+        # Spawned, not forked: the parent may already be running torch and
+        # the batching thread, neither of which survives fork() cleanly.
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+        )
+
+    @property
+    def depth(self):
+        return self._pending
+
+    def submit(self, source, project=None, tiled=False):
+        """
+        Records a queued job and hands it to the pool.
+        Returns the VerificationJob row.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFull(f"Verification queue is full ({self.max_pending} jobs pending)")
+            self._pending += 1
+
+        try:
+            job = VerificationJob.objects.create(source=str(source), project=project)
+            try:
+                future = self._executor.submit(run_job, job.pk, job.source, tiled)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM on a huge raster); start a fresh pool
+                with self._lock:
+                    self._executor = self._make_executor()
+                future = self._executor.submit(run_job, job.pk, job.source, tiled)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+        future.add_done_callback(partial(self._finish, job.pk))
+        return job
+
+    def _finish(self, job_id, future):
+        # Runs on the executor's management thread in the web process
+        try:
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"status": "error", "message": str(e)}
+            self._record(job_id, result)
+        except Exception as e:
+            # Never leave the job looking alive to its pollers
+            logger.exception("Could not record the result of job %s", job_id)
+            try:
+                VerificationJob.objects.filter(pk=job_id).update(
+                    status=VerificationJob.STATUS_FAILED,
+                    error=f"Could not record the result: {e}",
+                    finished_at=timezone.now(),
+                )
+            except Exception:
+                logger.exception("Could not mark job %s as failed", job_id)
+        finally:
+            with self._lock:
+                self._pending -= 1
+            connections.close_all()
+
+    @staticmethod
+    @transaction.atomic
+    def _record(job_id, result):
+        job = VerificationJob.objects.select_related('project').get(pk=job_id)
+        job.result = result
+        job.finished_at = timezone.now()
+        if result.get('status') == 'success':
+            job.status = VerificationJob.STATUS_SUCCEEDED
+            if job.project:
+                job.project.record_verification(result)
+        else:
+            job.status = VerificationJob.STATUS_FAILED
+            job.error = result.get('message')
+        job.save()
+
+    def stats(self):
+        return {"workers": self.max_workers, "pending": self._pending, "max_pending": self.max_pending}
+
+
+def fail_stale_jobs(max_age=None):
+    """
+    Marks jobs still queued or running `max_age` seconds (default
+    VUNA_JOBS_STALE_AFTER) after they were created as failed: the process
+    that held them went away (a restart or crash) without finishing them.
+    Returns the number of jobs marked.
+    """
+    if max_age is None:
+        max_age = getattr(settings, 'VUNA_JOBS_STALE_AFTER', 3600)
+    now = timezone.now()
+    return VerificationJob.objects.filter(
+        status__in=[VerificationJob.STATUS_QUEUED, VerificationJob.STATUS_RUNNING],
+        created_at__lt=now - timedelta(seconds=max_age),
+    ).update(
+        status=VerificationJob.STATUS_FAILED,
+        error="Abandoned: the web process stopped before the job finished",
+        finished_at=now,
+    )
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """
+    The per-process JobQueue, created on first use (which also fails the
+    jobs earlier processes left behind).
+    """
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                stale = fail_stale_jobs()
+                if stale:
+                    logger.warning("Marked %d abandoned verification jobs as failed", stale)
+                _queue = JobQueue(
+                    max_workers=getattr(settings, 'VUNA_JOBS_WORKERS', 2),
+                    max_pending=getattr(settings, 'VUNA_JOBS_MAX_QUEUE', 64),
+                )
+    return _queue
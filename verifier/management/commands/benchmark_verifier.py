@@ -0,0 +1,220 @@
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import rasterio
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+
+from verifier.benchmark import (
+    LocalFileServer, compare, environment, load_results, make_synthetic_scene, run_load, time_stage,
+)
+from verifier.cache import PredictionCache
+from verifier.fetch import RemoteFetcher
+from verifier.models import Project
+from verifier.raster import preprocess_bands, read_model_bands
+from verifier.services import VunaVerifier
+
+SCENE_NAME = 'scene.tif'
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the verification pipeline on a synthetic Sentinel-2-like "
+        "GeoTIFF: each VunaVerifier stage on its own (fetch, read, preprocess, "
+        "CNN, XGBoost, DB write), whole verifications, and /api/verify/ "
+        "throughput and tail latency at several concurrency levels. Results are "
+        "written as JSON and can be compared against a previous run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--width', type=int, default=2048, help="Scene width in pixels")
+        parser.add_argument('--height', type=int, default=2048, help="Scene height in pixels")
+        parser.add_argument('--bands', type=int, default=13, help="Band count (at least 8)")
+        parser.add_argument('--no-overviews', action='store_true', help="Write the scene without overviews")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed runs per stage")
+        parser.add_argument('--requests', type=int, default=64, help="/api/verify/ calls per concurrency level")
+        parser.add_argument(
+            '--concurrency', default='1,4,16',
+            help="Comma-separated client concurrency levels for the end-to-end run",
+        )
+        parser.add_argument(
+            '--server-url', default=None,
+            help="Drive a running server (e.g. http://127.0.0.1:8000) instead of an in-process client; "
+                 "it must be able to reach this machine's loopback address",
+        )
+        parser.add_argument('--skip-e2e', action='store_true', help="Only time the individual stages")
+        parser.add_argument('--output', default=None, help="Write results JSON here (default: stdout)")
+        parser.add_argument('--compare', default=None, help="Baseline results JSON to compare against")
+        parser.add_argument('--metric', default='p50_ms', help="Stage statistic compared against the baseline")
+        parser.add_argument(
+            '--max-regression', type=float, default=0.2,
+            help="Fail the comparison if anything is this much slower (0.2 = 20%%)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(c) for c in options['concurrency'].split(',') if c]
+        except ValueError:
+            raise CommandError("--concurrency must be comma-separated integers")
+        repeat = max(1, options['repeat'])
+
+        verifier = VunaVerifier()
+        results = {
+            "environment": environment(),
+            "params": {
+                "width": options['width'], "height": options['height'], "bands": options['bands'],
+                "overviews": not options['no_overviews'], "repeat": repeat,
+                "requests": options['requests'], "concurrency": levels,
+                "server_url": options['server_url'],
+                "model_version": verifier.model_version,
+                "extractor_backend": verifier.extractor_backend,
+                "engine": verifier.stats()["engine"],
+                "batching_enabled": verifier.batching_enabled,
+            },
+            "stages": {},
+            "end_to_end": {},
+        }
+
+        with tempfile.TemporaryDirectory(prefix='vuna-bench-') as tmp:
+            scene = make_synthetic_scene(
+                os.path.join(tmp, SCENE_NAME), width=options['width'], height=options['height'],
+                bands=options['bands'], overviews=not options['no_overviews'],
+            )
+            results["params"]["scene_bytes"] = os.path.getsize(scene)
+            self.stderr.write(f"Synthetic scene: {scene} ({results['params']['scene_bytes']} bytes)")
+
+            with LocalFileServer(tmp) as server:
+                url = server.url(SCENE_NAME)
+                results["stages"] = self._time_stages(verifier, scene, url, tmp, repeat)
+                if not options['skip_e2e']:
+                    for level in levels:
+                        for mode in ('cold', 'cached'):
+                            name = f"{mode}_c{level}"
+                            self.stderr.write(f"End to end: {name}")
+                            with _caches_disabled(verifier, mode == 'cold'):
+                                results["end_to_end"][name] = run_load(
+                                    self._verify_request(url, options['server_url']), options['requests'], level,
+                                )
+
+        payload = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(payload + "\n")
+            self.stderr.write(f"Results written to {options['output']}")
+        else:
+            self.stdout.write(payload)
+
+        if options['compare']:
+            self._compare(load_results(options['compare']), results, options['metric'], options['max_regression'])
+
+    def _time_stages(self, verifier, scene, url, tmp, repeat):
+        stages = {}
+
+        def stage(name, fn):
+            self.stderr.write(f"Stage: {name}")
+            stages[name], value = time_stage(fn, repeat)
+            return value
+
+        # Whole-file download through the pooled fetcher, cache emptied each time
+        fetcher = RemoteFetcher(os.path.join(tmp, 'downloads'), fresh_seconds=0, range_reads=False)
+
+        def fetch():
+            for path in fetcher._paths(url):
+                if os.path.exists(path):
+                    os.remove(path)
+            return fetcher.fetch(url)
+
+        stage("fetch", fetch)
+
+        def read():
+            with rasterio.open(scene) as src:
+                return read_model_bands(src, resampling=verifier.read_resampling)
+
+        raw = stage("read", read)
+        model_input = stage("preprocess", lambda: verifier._prepare_input(preprocess_bands(raw)))
+        features = stage("cnn", lambda: verifier.engine.embed([model_input]))
+        flux = float(stage("xgboost", lambda: verifier.engine.score(features))[0])
+
+        # One project row, rolled back afterwards
+        with transaction.atomic():
+            project = Project.objects.create(name='benchmark', latitude=0.0, longitude=0.0)
+            result = {"carbon_flux": flux, "annual_tonnes_co2": 0.0, "estimated_revenue_usd": 0.0}
+            stage("db_write", lambda: project.record_verification(result))
+            transaction.set_rollback(True)
+
+        with _caches_disabled(verifier):
+            stage("verify_path", lambda: verifier.verify(scene))
+            stage("verify_url", lambda: verifier.verify(url))
+        stage("verify_cached", lambda: verifier.verify(scene))
+        return stages
+
+    def _verify_request(self, url, server_url):
+        local = threading.local()
+        body = {"image_url": url}
+
+        if server_url:
+            endpoint = server_url.rstrip('/') + '/api/verify/'
+
+            def request():
+                if not hasattr(local, 'session'):
+                    local.session = requests.Session()
+                return local.session.post(endpoint, json=body, timeout=300).status_code == 200
+            return request
+
+        def request():
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                return local.client.post('/api/verify/', body, content_type='application/json').status_code == 200
+        return request
+
+    def _compare(self, baseline, current, metric, max_regression):
+        rows = compare(baseline, current, metric=metric, max_regression=max_regression)
+        baseline_commit = baseline.get('environment', {}).get('commit')
+        self.stderr.write(f"Compared with {baseline_commit or 'baseline'} on {metric}:")
+        for row in rows:
+            flag = "  REGRESSED" if row['regressed'] else ""
+            self.stderr.write(
+                f"  {row['name']:<40} {row['baseline']:>12.3f} -> {row['current']:>12.3f} "
+                f"({row['change']:+.1%}){flag}"
+            )
+        regressed = [row['name'] for row in rows if row['regressed']]
+        if regressed:
+            raise CommandError(f"Regressed by more than {max_regression:.0%}: {', '.join(regressed)}")
+        self.stderr.write(self.style.SUCCESS("No regressions."))
+
+
+@contextmanager
+def _caches_disabled(verifier, disabled=True):
+    """
+    Runs the block with the verifier's result cache, embedding store and
+    request coalescing switched off, so every verification does the full
+    work.
+    """
+    if not disabled:
+        yield
+        return
+    saved = verifier.cache, verifier.embeddings, verifier.inflight
+    verifier.cache, verifier.embeddings, verifier.inflight = PredictionCache(max_entries=0), None, _Uncoalesced()
+    try:
+        yield
+    finally:
+        verifier.cache, verifier.embeddings, verifier.inflight = saved
+
+
+class _Uncoalesced:
+    """
+    Stands in for the verifier's SingleFlight: every call runs.
+    """
+
+    def do(self, key, fn):
+        return fn(), False
+
+    def stats(self):
+        return {}
@@ -0,0 +1,103 @@
+import time
+
+import numpy as np
+import torch
+import xgboost as xgb
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from verifier.inference import build_extractor, load_calibration, resnet_trunk
+from verifier.raster import load_model_input
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds the calibration set for the int8 feature extractor from sample "
+        "GeoTIFFs, then checks an optimized backend against the fp32 eager "
+        "extractor on the predicted carbon_flux and reports the speed-up."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="Representative GeoTIFFs to calibrate on")
+        parser.add_argument('--backend', choices=['torchscript', 'int8'], default='int8')
+        parser.add_argument(
+            '--output', default=str(getattr(settings, 'VUNA_EXTRACTOR_CALIBRATION', '')),
+            help="Where to save the calibration inputs (default: VUNA_EXTRACTOR_CALIBRATION)",
+        )
+        parser.add_argument(
+            '--check-only', action='store_true',
+            help="Use the existing calibration file instead of rebuilding it from paths",
+        )
+        parser.add_argument(
+            '--eval-paths', nargs='*', default=None,
+            help="GeoTIFFs to measure the error on (default: the calibration paths)",
+        )
+        parser.add_argument(
+            '--max-flux-diff', type=float, default=0.005,
+            help="Fail if |carbon_flux(backend) - carbon_flux(fp32)| exceeds this on any scene",
+        )
+
+    def handle(self, *args, **options):
+        resampling = getattr(settings, 'VUNA_READ_RESAMPLING', 'bilinear')
+        output = options['output']
+        if not output:
+            raise CommandError("No --output given and VUNA_EXTRACTOR_CALIBRATION is not set")
+
+        if options['check_only']:
+            calibration = load_calibration(output)
+        else:
+            calibration = self._load_inputs(options['paths'], resampling)
+            np.save(output, calibration)
+            self.stdout.write(f"Saved {len(calibration)} calibration inputs to {output}")
+
+        eval_paths = options['eval_paths'] or options['paths']
+        inputs = self._load_inputs(eval_paths, resampling)
+
+        xgb_model = xgb.XGBRegressor()
+        xgb_model.load_model(str(settings.BASE_DIR / 'vuna_hybrid_gosif_model.json'))
+        reference = resnet_trunk(
+            getattr(settings, 'VUNA_EXTRACTOR_SEED', 0), getattr(settings, 'VUNA_RESNET_WEIGHTS', None),
+        )
+        candidate = build_extractor(reference, options['backend'], calibration=calibration)
+
+        fp32_features, fp32_seconds = _embed(reference, inputs)
+        features, seconds = _embed(candidate, inputs)
+        fp32_flux = xgb_model.predict(fp32_features)
+        flux = xgb_model.predict(features)
+        diff = np.abs(flux - fp32_flux)
+
+        for path, a, b, d in zip(eval_paths, fp32_flux, flux, diff):
+            self.stdout.write(f"{path}\n  carbon_flux fp32={a:.5f} {options['backend']}={b:.5f} diff={d:.5f}")
+        self.stdout.write(
+            f"carbon_flux |diff| max={diff.max():.5f} mean={diff.mean():.5f} p95={np.percentile(diff, 95):.5f}\n"
+            f"feature |diff| max={np.abs(features - fp32_features).max():.5f}\n"
+            f"extractor time fp32={fp32_seconds:.3f}s {options['backend']}={seconds:.3f}s "
+            f"({fp32_seconds / max(seconds, 1e-9):.2f}x)"
+        )
+
+        if diff.max() > options['max_flux_diff']:
+            raise CommandError(
+                f"{options['backend']} carbon_flux error {diff.max():.5f} exceeds {options['max_flux_diff']}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['backend']} is within tolerance; set VUNA_EXTRACTOR_BACKEND = '{options['backend']}'."
+        ))
+
+    def _load_inputs(self, paths, resampling):
+        try:
+            return np.stack([load_model_input(path, resampling=resampling) for path in paths])
+        except Exception as e:
+            raise CommandError(f"Could not read model inputs: {e}")
+
+
+def _embed(extractor, inputs, batch_size=16):
+    """
+    Features for every input, batched as in production, and the time taken
+    (after one warm-up batch).
+    """
+    batches = [torch.from_numpy(inputs[i:i + batch_size]) for i in range(0, len(inputs), batch_size)]
+    with torch.inference_mode():
+        extractor(batches[0])
+        started = time.perf_counter()
+        features = [extractor(batch).reshape(len(batch), -1).numpy() for batch in batches]
+    return np.concatenate(features), time.perf_counter() - started
@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from verifier.benchmark import measure_import
+
+# Entry points that never run the models, and what they import
+ENTRY_POINTS = {
+    # Any manage.py command
+    "django_setup": "import django; django.setup()",
+    # A web worker before its first request: the whole URLconf
+    "urlconf": "import django; django.setup(); import vuna_backend.urls",
+    # A web worker after serving /api/projects/
+    "project_list": (
+        "import django; django.setup(); import vuna_backend.urls\n"
+        "from django.test import Client\n"
+        "from django.test.utils import override_settings\n"
+        "with override_settings(ALLOWED_HOSTS=['testserver']):\n"
+        "    Client(raise_request_exception=False).get('/api/projects/')"
+    ),
+}
+
+# Loaded only by processes that verify
+HEAVY_MODULES = ('torch', 'torchvision', 'xgboost', 'rasterio')
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the import time of entry points that don't verify anything "
+        "(manage.py commands, a web worker serving /api/projects/) in fresh "
+        "interpreters, and fails if one exceeds the budget or pulls in torch, "
+        "torchvision, xgboost or rasterio."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help="Fresh interpreters per entry point")
+        parser.add_argument(
+            '--budget', type=float, default=1.5,
+            help="Fail if an entry point's median import time exceeds this many seconds",
+        )
+
+    def handle(self, *args, **options):
+        failures = []
+        for name, code in ENTRY_POINTS.items():
+            try:
+                summary, modules = measure_import(code, repeat=max(1, options['repeat']), cwd=settings.BASE_DIR)
+            except RuntimeError as e:
+                raise CommandError(str(e))
+            heavy = [module for module in HEAVY_MODULES if module in modules]
+            seconds = summary['p50_ms'] / 1000.0
+            self.stdout.write(
+                f"{name:<14} p50={seconds:.3f}s max={summary['max_ms'] / 1000.0:.3f}s"
+                + (f"  imports {', '.join(heavy)}" if heavy else "")
+            )
+            if seconds > options['budget']:
+                failures.append(f"{name} takes {seconds:.3f}s (budget {options['budget']}s)")
+            if heavy:
+                failures.append(f"{name} imports {', '.join(heavy)}")
+
+        if failures:
+            raise CommandError("; ".join(failures))
+        self.stdout.write(self.style.SUCCESS(f"All entry points within {options['budget']}s."))
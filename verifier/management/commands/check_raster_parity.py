@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from verifier.raster import compare_read_paths
+from verifier.services import VunaVerifier
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the decimated band read against the original full-resolution "
+        "read + resize path, on the model input and on the predicted carbon_flux."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="GeoTIFFs to check")
+        parser.add_argument(
+            '--max-flux-diff', type=float, default=0.005,
+            help="Fail if |carbon_flux(decimated) - carbon_flux(full)| exceeds this",
+        )
+
+    def handle(self, *args, **options):
+        verifier = VunaVerifier()
+        failures = []
+
+        for path in options['paths']:
+            report = compare_read_paths(path, resampling=verifier.read_resampling)
+            flux_full, flux_decimated = verifier._infer_batch([
+                verifier._prepare_input(report['reference']),
+                verifier._prepare_input(report['decimated']),
+            ])
+            flux_diff = abs(flux_decimated - flux_full)
+
+            self.stdout.write(
+                f"{path}\n"
+                f"  input max |diff| per band:  {report['max_abs_diff']}\n"
+                f"  input mean |diff| per band: {report['mean_abs_diff']}\n"
+                f"  carbon_flux full={flux_full:.5f} decimated={flux_decimated:.5f} diff={flux_diff:.5f}\n"
+                f"  read time full={report['full_resolution_seconds']}s "
+                f"decimated={report['decimated_seconds']}s"
+            )
+            if flux_diff > options['max_flux_diff']:
+                failures.append(path)
+
+        if failures:
+            raise CommandError(f"carbon_flux parity exceeded for: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("Decimated reads are within tolerance."))
@@ -0,0 +1,80 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from verifier.models import Project, StoredRaster
+from verifier.uploads import ingest_stored_raster
+
+
+class Command(BaseCommand):
+    help = (
+        "Converts the projects' stored rasters to Cloud-Optimized GeoTIFFs "
+        "(with a model-bands companion unless --no-companion), as new "
+        "uploads are when VUNA_COG_ON_UPLOAD is set. Each file is only "
+        "replaced after its pixel-exact integrity and model input parity "
+        "checks pass; files already converted are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Convert files already converted as well")
+        parser.add_argument('--no-companion', action='store_true', help="Don't write model-bands companions")
+        parser.add_argument('--check-flux', action='store_true',
+                            help="Also compare the predicted flux (loads the models)")
+        parser.add_argument('--dry-run', action='store_true', help="Only list the files that would be converted")
+
+    def handle(self, *args, **options):
+        from verifier.cog import ConversionError
+
+        storage = Project._meta.get_field('tiff_file').storage
+        names = sorted(
+            Project.objects.exclude(tiff_file='').exclude(tiff_file__isnull=True)
+            .values_list('tiff_file', flat=True).distinct()
+        )
+        converted = {r.name for r in StoredRaster.objects.filter(name__in=names)}
+        if not options['force']:
+            names = [name for name in names if name not in converted]
+        missing = [name for name in names if not storage.exists(name)]
+        names = [name for name in names if name not in missing]
+        for name in missing:
+            self.stderr.write(self.style.WARNING(f"Missing: {name}"))
+
+        if options['dry_run']:
+            for name in names:
+                self.stdout.write(name)
+            self.stdout.write(f"{len(names)} rasters to convert")
+            return
+
+        score = None
+        if options['check_flux']:
+            from verifier.services import VunaVerifier
+            score = VunaVerifier().score_path
+
+        started = time.perf_counter()
+        done = skipped = 0
+        before = after = 0
+        failures = []
+        for name in names:
+            try:
+                stored = ingest_stored_raster(
+                    name, score=score, force=options['force'], companion=not options['no_companion'],
+                )
+            except (ConversionError, OSError) as e:
+                failures.append(name)
+                self.stderr.write(self.style.ERROR(f"{name}: {e}"))
+                continue
+            if stored is None:
+                skipped += 1
+                continue
+            done += 1
+            before += stored.original_bytes
+            after += stored.stored_bytes + (stored.companion_bytes or 0)
+            self.stdout.write(
+                f"{name}: {stored.original_bytes / 1e6:.1f} MB -> {stored.stored_bytes / 1e6:.1f} MB"
+                + (f" + {stored.companion_bytes / 1e6:.1f} MB companion" if stored.companion_bytes else "")
+            )
+
+        summary = (
+            f"Converted {done} rasters ({before / 1e6:.1f} MB -> {after / 1e6:.1f} MB), "
+            f"skipped {skipped}, failed {len(failures)} in {time.perf_counter() - started:.1f}s"
+        )
+        self.stdout.write(self.style.ERROR(summary) if failures else self.style.SUCCESS(summary))
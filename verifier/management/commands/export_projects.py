@@ -0,0 +1,63 @@
+import csv
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from verifier.models import Project
+from verifier.pricing import get_pricing
+
+COLUMNS = ['id', 'name', 'latitude', 'longitude', 'cached_flux']
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports every project's flux with its annual tonnes of CO2 and "
+        "revenue as CSV, priced at export time from the stored flux (one "
+        "vectorized pass per chunk), so any pricing model or carbon price "
+        "can be exported without re-verifying."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help="CSV file (default: stdout)")
+        parser.add_argument('--pricing', default=None, help="Pricing model version (default: VUNA_PRICING_MODEL)")
+        parser.add_argument('--carbon-price', type=float, default=None, help="USD per tonne of CO2")
+        parser.add_argument('--chunk-size', type=int, default=10000, help="Rows priced per vectorized pass")
+
+    def handle(self, *args, **options):
+        try:
+            pricing = get_pricing(options['pricing'], options['carbon_price'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be a positive integer")
+
+        out = open(options['output'], 'w', newline='') if options['output'] else self.stdout
+        try:
+            writer = csv.writer(out)
+            writer.writerow(COLUMNS + ['annual_tonnes_co2', 'estimated_revenue_usd', 'pricing'])
+            rows = Project.objects.order_by('pk').values_list(*COLUMNS).iterator(chunk_size=chunk_size)
+            exported = 0
+            for chunk in _chunks(rows, chunk_size):
+                flux = np.array([row[-1] for row in chunk], dtype=np.float64)  # None -> nan
+                tonnes, revenue = pricing.economics(flux)
+                tonnes, revenue = np.round(tonnes, 2), np.round(revenue, 2)
+                for row, t, r in zip(chunk, tonnes.tolist(), revenue.tolist()):
+                    # Unverified projects stay empty rather than nan
+                    writer.writerow(list(row) + (['', ''] if row[-1] is None else [t, r]) + [pricing.version])
+                exported += len(chunk)
+        finally:
+            if options['output']:
+                out.close()
+        self.stderr.write(f"Exported {exported} projects priced with {pricing.version}")
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,31 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from verifier.inference import fetch_resnet_weights
+
+
+class Command(BaseCommand):
+    help = (
+        "Downloads the ImageNet ResNet18 weights once to VUNA_RESNET_WEIGHTS, "
+        "so web, job and inference-server processes load them from disk "
+        "instead of fetching them at startup."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help="Default: VUNA_RESNET_WEIGHTS")
+        parser.add_argument('--force', action='store_true', help="Download even if the file exists")
+
+    def handle(self, *args, **options):
+        output = options['output'] or getattr(settings, 'VUNA_RESNET_WEIGHTS', None)
+        if not output:
+            raise CommandError("No --output given and VUNA_RESNET_WEIGHTS is not set")
+        if os.path.exists(output) and not options['force']:
+            self.stdout.write(f"{output} already exists; use --force to download it again")
+            return
+        try:
+            url = fetch_resnet_weights(output, progress=options['verbosity'] > 0)
+        except Exception as e:
+            raise CommandError(f"Could not download the ResNet weights: {e}")
+        self.stdout.write(self.style.SUCCESS(f"Saved {url} to {output}"))
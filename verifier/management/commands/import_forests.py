@@ -0,0 +1,128 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from verifier.freshness import projects_changed
+from verifier.geometry import iter_geojson_features, polygon_centroid
+from verifier.models import Project
+from verifier.summary import tracking
+
+# Written when an existing project's boundary is refreshed
+UPDATE_FIELDS = ['geojson_boundary', 'category', 'latitude', 'longitude', 'updated_at'] + Project.BBOX_FIELDS
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports forest boundaries from a GeoJSON FeatureCollection. Features "
+        "are streamed from the file and upserted by name (case-insensitive) "
+        "in batched bulk writes; re-running with the same file is a no-op "
+        "apart from refreshed timestamps."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=str(settings.BASE_DIR / 'Kenya_Gazetted_Forests.geojson'),
+            help="GeoJSON FeatureCollection (default: Kenya_Gazetted_Forests.geojson)",
+        )
+        parser.add_argument('--name-property', default='FOREST', help="Feature property holding the forest name")
+        parser.add_argument(
+            '--category-property', default='GAZETTED',
+            help="Feature property holding the forest category (Gazetted / Community)",
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help="Features per write transaction")
+        parser.add_argument(
+            '--no-demo-results', action='store_true',
+            help="Don't give newly created forests random placeholder flux/CO2/revenue",
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        batch_size = max(1, options['batch_size'])
+        name_property = options['name_property']
+        category_property = options['category_property']
+        demo_results = not options['no_demo_results']
+
+        # One query for every existing project, keyed like name__iexact
+        # (with the fields the portfolio summary counts it by)
+        by_name = {}
+        for project in Project.objects.only('id', 'name', *Project.SUMMARY_FIELDS).order_by('id'):
+            by_name.setdefault(project.name.lower(), project)
+
+        started = time.perf_counter()
+        stats = {"features": 0, "created": 0, "updated": 0, "skipped": 0}
+        to_create, to_update = {}, {}
+
+        def flush():
+            with tracking(list(to_create.values()) + list(to_update.values()), UPDATE_FIELDS):
+                if to_create:
+                    Project.objects.bulk_create(list(to_create.values()), batch_size=batch_size)
+                if to_update:
+                    Project.objects.bulk_update(list(to_update.values()), UPDATE_FIELDS, batch_size=batch_size)
+            stats["created"] += len(to_create)
+            stats["updated"] += len(to_update)
+            to_create.clear()
+            to_update.clear()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"  {stats['features']} features, {stats['created']} created, {stats['updated']} updated "
+                f"({stats['features'] / elapsed:.0f} features/s)"
+            )
+
+        try:
+            f = open(path, encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f"Cannot open {path}: {e}")
+
+        self.stdout.write(f"Importing {path}...")
+        with f:
+            try:
+                for feature in iter_geojson_features(f):
+                    stats["features"] += 1
+                    geometry = feature.get('geometry')
+                    if not geometry or geometry.get('type') not in ('Polygon', 'MultiPolygon'):
+                        stats["skipped"] += 1
+                        continue
+                    centroid = polygon_centroid(geometry)
+                    if centroid is None:
+                        stats["skipped"] += 1
+                        continue
+
+                    properties = feature.get('properties') or {}
+                    forest_name = properties.get(name_property) or 'Unknown Forest'
+                    key = forest_name.lower()
+                    project = by_name.get(key)
+                    if project is None:
+                        project = Project(name=forest_name.title())  # "MOUNT ELGON" -> "Mount Elgon"
+                        if demo_results:
+                            # Placeholder values so the map has something to colour
+                            flux = random.uniform(0.01, 0.09)
+                            project.cached_flux = round(flux, 4)
+                            project.cached_co2 = round(flux * 120, 2)
+                            project.cached_revenue = round(flux * 2400, 2)
+                        by_name[key] = project
+                        to_create[key] = project
+                    elif key not in to_create:
+                        to_update[key] = project
+
+                    # A name seen again later in the file wins, as before
+                    project.set_boundary(geometry)
+                    project.category = str(properties.get(category_property) or '')[:64]
+                    project.longitude, project.latitude = centroid
+                    project.updated_at = timezone.now()
+
+                    if len(to_create) + len(to_update) >= batch_size:
+                        flush()
+            except ValueError as e:
+                raise CommandError(f"Invalid GeoJSON in {path}: {e}")
+            flush()
+
+        projects_changed()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Done in {elapsed:.2f}s: {stats['features']} features, {stats['created']} created, "
+            f"{stats['updated']} updated, {stats['skipped']} skipped "
+            f"({stats['features'] / max(elapsed, 1e-9):.0f} features/s)"
+        ))
@@ -0,0 +1,37 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from verifier.inference_server import serve
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the pre-forked inference server: loads the ResNet and XGBoost "
+        "models once and serves them from forked workers on "
+        "VUNA_INFERENCE_SOCKET, using the same model settings as the web app."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=None, help="Socket path (default: VUNA_INFERENCE_SOCKET)")
+        parser.add_argument('--workers', type=int, default=None, help="Default: VUNA_INFERENCE_WORKERS")
+        parser.add_argument('--threads', type=int, default=None, help="Default: VUNA_INFERENCE_THREADS")
+
+    def handle(self, *args, **options):
+        socket_path = options['socket'] or getattr(settings, 'VUNA_INFERENCE_SOCKET', None)
+        if not socket_path:
+            raise CommandError("No --socket given and VUNA_INFERENCE_SOCKET is not set")
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(process)d %(message)s')
+        self.stdout.write(f"Serving models on {socket_path}")
+        serve(
+            socket_path,
+            settings.BASE_DIR / 'vuna_hybrid_gosif_model.json',
+            workers=options['workers'] or getattr(settings, 'VUNA_INFERENCE_WORKERS', 2),
+            threads=options['threads'] or getattr(settings, 'VUNA_INFERENCE_THREADS', None),
+            seed=getattr(settings, 'VUNA_EXTRACTOR_SEED', 0),
+            backend=getattr(settings, 'VUNA_EXTRACTOR_BACKEND', 'eager'),
+            calibration_path=getattr(settings, 'VUNA_EXTRACTOR_CALIBRATION', None),
+            weights_path=getattr(settings, 'VUNA_RESNET_WEIGHTS', None),
+            timeout=getattr(settings, 'VUNA_INFERENCE_TIMEOUT', 60.0),
+        )
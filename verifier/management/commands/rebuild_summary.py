@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from verifier.summary import rebuild_summary
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the portfolio summary table behind /api/summary/ from all "
+        "projects. It is normally kept up to date incrementally; run this "
+        "after writing projects in a way that bypasses both the model signals "
+        "and summary.tracking() (raw SQL, queryset.update())."
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        counted = rebuild_summary()
+        self.stdout.write(self.style.SUCCESS(
+            f"Summarized {counted} projects in {time.perf_counter() - started:.2f}s"
+        ))
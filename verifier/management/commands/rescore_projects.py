@@ -0,0 +1,87 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from verifier.cache import content_hash
+from verifier.freshness import projects_changed
+from verifier.masking import ProjectBoundary
+from verifier.models import Project, StoredRaster
+from verifier.services import VunaVerifier
+from verifier.summary import tracking
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-scores every project's stored raster from its saved ResNet embedding "
+        "with the currently deployed XGBoost model, in one vectorized predict, "
+        "and updates the cached results. Rasters are hashed, not decoded; "
+        "rasters rewritten as COGs find the embedding of the file as uploaded. "
+        "Projects without a stored embedding are reported and left alone."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Projects per write transaction")
+
+    def handle(self, *args, **options):
+        verifier = VunaVerifier()
+        if verifier.embeddings is None:
+            raise CommandError("The embedding store is disabled (VUNA_EMBEDDING_DIR)")
+
+        started = time.perf_counter()
+        # Converting a stored raster to a COG changes its hash, but not its
+        # pixels: its embedding may still be under the hash it was uploaded with
+        converted = dict(StoredRaster.objects.values_list('content_key', 'source_key'))
+        projects, keys = [], {}
+        unreadable = 0
+        for project in Project.objects.exclude(tiff_file='').exclude(tiff_file__isnull=True):
+            try:
+                raster_key = content_hash(project.tiff_file.path)
+            except OSError:
+                unreadable += 1
+                continue
+            boundary = ProjectBoundary.from_project(project)
+            projects.append((project, raster_key, boundary))
+            keys[project.pk] = [verifier.embedding_key(raster_key, boundary)]
+            if converted.get(raster_key, raster_key) != raster_key:
+                keys[project.pk].append(verifier.embedding_key(converted[raster_key], boundary))
+        hashed = time.perf_counter()
+
+        results = verifier.rescore([key for candidates in keys.values() for key in candidates])
+        scored = time.perf_counter()
+
+        updated = []
+        for project, raster_key, boundary in projects:
+            current, *original = keys[project.pk]
+            result = results.get(current)
+            if result is None and original:
+                result = results.get(original[0])
+                if result is not None:
+                    # Under the file's hash as stored now, for later verifications
+                    verifier.embeddings.put(current, verifier.embeddings.get(original[0]))
+            if result is None:
+                continue
+            project.apply_verification(result)
+            updated.append(project)
+            # The next /api/verify/ of the same scene is a plain cache hit
+            verifier.cache.set(verifier.cache_key(raster_key, boundary=boundary), result)
+
+        if updated:
+            with tracking(updated, Project.VERIFICATION_FIELDS):
+                Project.objects.bulk_update(
+                    updated, Project.VERIFICATION_FIELDS, batch_size=max(1, options['batch_size'])
+                )
+            projects_changed()
+
+        missing = len(projects) - len(updated)
+        self.stdout.write(
+            f"Model {verifier.model_version}: hashed {len(projects)} rasters in {hashed - started:.2f}s, "
+            f"scored {len(results)} embeddings in {scored - hashed:.3f}s"
+        )
+        if missing or unreadable:
+            self.stdout.write(self.style.WARNING(
+                f"{missing} projects have no stored embedding and {unreadable} rasters could not be read; "
+                f"verify those once through /api/verify/ or /api/verify/bulk/ to store them."
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated {len(updated)} projects in {time.perf_counter() - started:.2f}s."
+        ))
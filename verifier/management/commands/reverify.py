@@ -0,0 +1,337 @@
+import datetime
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from verifier.fetch import RateLimiter
+from verifier.freshness import projects_changed
+from verifier.history import read_manifest
+from verifier.models import Project, VerificationRecord
+from verifier.summary import tracking
+from verifier.worker import init_worker, model_version, reverify_scene
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-runs VunaVerifier inference over all or filtered projects on a pool "
+        "of worker processes (models loaded once per worker). Each project's "
+        "stored TIFF refreshes its cached results and history; scenes from "
+        "--manifest go into the history only. Progress is checkpointed after "
+        "every batch write, so an interrupted run picks up where it stopped; "
+        "the checkpoint belongs to the model version and filters, and is "
+        "retired (renamed to .done) once the run completes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', default=None, help="Comma-separated project ids")
+        parser.add_argument('--has-boundary', choices=['true', 'false'], default=None)
+        parser.add_argument('--unverified', action='store_true', help="Only projects without cached results")
+        parser.add_argument(
+            '--verified-before', type=datetime.date.fromisoformat, default=None,
+            help="Only projects not updated since this date (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            '--manifest', default=None,
+            help="Also verify the scenes in this CSV (project_id,source[,acquired_on]), e.g. remote archives",
+        )
+        parser.add_argument('--no-stored', action='store_true', help="Skip the projects' stored TIFFs")
+        parser.add_argument('--tiled', action='store_true', help="Tiled scoring (updates cached results only)")
+        parser.add_argument(
+            '--workers', type=int, default=getattr(settings, 'VUNA_JOBS_WORKERS', 2),
+            help="Verifier processes (default: VUNA_JOBS_WORKERS)",
+        )
+        parser.add_argument('--batch-size', type=int, default=50, help="Results per write transaction")
+        parser.add_argument(
+            '--fetch-rate', type=float, default=2.0,
+            help="Remote scenes started per second, at most (0 = unlimited)",
+        )
+        parser.add_argument(
+            '--checkpoint', default=None,
+            help="Checkpoint file (default: one per model version and filters in VUNA_CACHE_DIR)",
+        )
+        parser.add_argument('--restart', action='store_true', help="Ignore and replace an existing checkpoint")
+        parser.add_argument('--retry-failed', action='store_true', help="Verify scenes that failed last time again")
+        parser.add_argument('--progress-every', type=float, default=10.0, help="Seconds between progress lines")
+
+    def handle(self, *args, **options):
+        work = self._work(options)
+        pool = ProcessPoolExecutor(
+            max_workers=max(1, options['workers']),
+            # Spawned like the async job pool: fork() and torch don't mix
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+        )
+        try:
+            # The workers load the models anyway; the parent never does
+            version = pool.submit(model_version).result()
+        except (KeyboardInterrupt, Exception) as e:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise CommandError(f"Could not start the verifier processes: {e!r}")
+
+        # A checkpoint only stands for the same run: same model, same options
+        run = _run_identity(options, version)
+        checkpoint_path = options['checkpoint'] or os.path.join(
+            getattr(settings, 'VUNA_CACHE_DIR', settings.BASE_DIR / 'cache'),
+            f"reverify-{_digest(run)}.checkpoint.jsonl",
+        )
+        try:
+            done = {} if options['restart'] else _read_checkpoint(checkpoint_path, run)
+        except CommandError:
+            pool.shutdown(cancel_futures=True)
+            raise
+        skip = {key for key, status in done.items() if status == 'success' or not options['retry_failed']}
+        todo = [item for item in work if (item[0], item[1]) not in skip]
+        self.stderr.write(
+            f"{len(work)} scenes with {version}, {len(work) - len(todo)} already done per {checkpoint_path}, "
+            f"{len(todo)} to verify"
+        )
+        if todo:
+            os.makedirs(os.path.dirname(os.path.abspath(checkpoint_path)), exist_ok=True)
+            with open(checkpoint_path, 'w' if options['restart'] or not done else 'a') as checkpoint:
+                if options['restart'] or not done:
+                    _append(checkpoint, [dict(run, started=datetime.datetime.now().isoformat(timespec='seconds'))])
+                _Run(self, pool, todo, checkpoint, options, version).execute()
+        else:
+            pool.shutdown()
+
+        # Completed: a later run with the same model and options starts afresh
+        if os.path.exists(checkpoint_path):
+            os.replace(checkpoint_path, checkpoint_path + '.done')
+            self.stderr.write(f"Run complete; checkpoint kept as {checkpoint_path}.done")
+
+    def _work(self, options):
+        """
+        [(project_id, source, stored, acquired_on)]: `stored` marks a
+        project's own TIFF, whose result also refreshes its cached_* fields.
+        """
+        projects = Project.objects.all()
+        if options['ids']:
+            try:
+                projects = projects.filter(pk__in=[int(pk) for pk in options['ids'].split(',') if pk])
+            except ValueError:
+                raise CommandError("--ids must be comma-separated integers")
+        if options['has_boundary']:
+            without = Q(geojson_boundary__isnull=True) | Q(geojson_boundary='')
+            projects = projects.exclude(without) if options['has_boundary'] == 'true' else projects.filter(without)
+        if options['unverified']:
+            projects = projects.filter(cached_flux__isnull=True)
+        if options['verified_before']:
+            projects = projects.filter(updated_at__date__lt=options['verified_before'])
+
+        work = []
+        if not options['no_stored']:
+            stored = projects.exclude(tiff_file='').exclude(tiff_file__isnull=True).only('id', 'tiff_file')
+            work.extend((project.pk, project.tiff_file.path, True, None) for project in stored.order_by('pk'))
+        if options['manifest']:
+            try:
+                scenes = read_manifest(options['manifest'])
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read the manifest: {e}")
+            wanted = set(projects.filter(pk__in={pk for pk, _, _ in scenes}).values_list('pk', flat=True))
+            work.extend((pk, source, False, acquired_on) for pk, source, acquired_on in scenes if pk in wanted)
+        return work
+
+
+class _Run:
+    """
+    One reverify run: feeds the pool, writes finished results in batches
+    and reports progress.
+    """
+
+    def __init__(self, command, pool, todo, checkpoint, options, model_version):
+        self.command = command
+        self.pool = pool
+        self.todo = todo
+        self.checkpoint = checkpoint
+        self.tiled = options['tiled']
+        self.workers = max(1, options['workers'])
+        self.batch_size = max(1, options['batch_size'])
+        self.progress_every = options['progress_every']
+        self.limiter = RateLimiter(options['fetch_rate'])
+        self.boundaries = dict(
+            Project.objects.filter(pk__in={item[0] for item in todo}).values_list('pk', 'geojson_boundary')
+        )
+        self.model_version = model_version
+        self.pending = []
+        self.succeeded = self.failed = 0
+        self.started = time.perf_counter()
+        self.last_report = self.started
+
+    def execute(self):
+        queue = iter(self.todo)
+        inflight = {}
+        pool = self.pool
+        try:
+            # Two tasks per worker keeps every process busy without queueing
+            # the whole run (or pre-fetching far ahead of the rate limit)
+            while len(inflight) < 2 * self.workers and self._submit(pool, queue, inflight):
+                pass
+            while inflight:
+                finished, _ = wait(inflight, timeout=self.progress_every, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    item = inflight.pop(future)
+                    try:
+                        result, scene, self.model_version = future.result()
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        result, scene = {"status": "error", "message": str(e)}, None
+                    self._collect(item, result, scene)
+                    self._submit(pool, queue, inflight)
+                if len(self.pending) >= self.batch_size:
+                    self._flush()
+                self._report()
+        except (KeyboardInterrupt, BrokenProcessPool) as e:
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._flush()
+            reason = "Interrupted" if isinstance(e, KeyboardInterrupt) else "A verifier process died"
+            raise CommandError(f"{reason} after {self.succeeded + self.failed} scenes; run again to resume")
+        pool.shutdown()
+        self._flush()
+        self._report(final=True)
+
+    def _submit(self, pool, queue, inflight):
+        item = next(queue, None)
+        if item is None:
+            return False
+        project_id, source, _, _ = item
+        if str(source).startswith(('http://', 'https://')):
+            self.limiter.acquire()
+        future = pool.submit(reverify_scene, project_id, self.boundaries.get(project_id), source, self.tiled)
+        inflight[future] = item
+        return True
+
+    def _collect(self, item, result, scene):
+        project_id, source, stored, acquired_on = item
+        if result.get('status') == 'success':
+            self.succeeded += 1
+            if scene and acquired_on:
+                scene["acquired_on"] = acquired_on
+        else:
+            self.failed += 1
+            self.command.stderr.write(f"{source}: {result.get('message')}")
+        self.pending.append((item, result, scene))
+
+    def _flush(self):
+        """
+        Writes the pending results in one transaction, then checkpoints
+        them: a crash in between only means redoing this batch.
+        """
+        if not self.pending:
+            return
+
+        projects, records = {}, []
+        project_ids = {item[0] for item, result, _ in self.pending if result.get('status') == 'success'}
+        by_pk = Project.objects.in_bulk(project_ids)
+        for (project_id, source, stored, _), result, scene in self.pending:
+            project = by_pk.get(project_id)
+            if project is None or result.get('status') != 'success':
+                continue
+            if stored:
+                project.apply_verification(result)
+                projects[project_id] = project
+            if scene:
+                records.append(VerificationRecord.from_result(project, result, scene, self.model_version, source))
+        with tracking(projects.values(), Project.VERIFICATION_FIELDS):
+            if projects:
+                Project.objects.bulk_update(list(projects.values()), Project.VERIFICATION_FIELDS, batch_size=500)
+            if records:
+                VerificationRecord.upsert(records)
+        if projects:
+            projects_changed()
+
+        _append(self.checkpoint, [
+            {"project_id": item[0], "source": item[1], "status": result.get('status')}
+            for item, result, _ in self.pending
+        ])
+        self.pending = []
+
+    def _report(self, final=False):
+        now = time.perf_counter()
+        if not final and now - self.last_report < self.progress_every:
+            return
+        self.last_report = now
+        done = self.succeeded + self.failed
+        elapsed = now - self.started
+        rate = done / elapsed if elapsed else 0.0
+        remaining = len(self.todo) - done
+        eta = _duration(remaining / rate) if rate and remaining else ("-" if remaining else "0s")
+        line = (
+            f"{done}/{len(self.todo)} scenes ({self.failed} failed), {rate:.2f} scenes/s, "
+            f"elapsed {_duration(elapsed)}, ETA {eta}"
+        )
+        if self.limiter.waited_seconds:
+            line += f", {self.limiter.waited_seconds:.1f}s rate-limited"
+        if final:
+            self.command.stdout.write(self.command.style.SUCCESS(line))
+        else:
+            self.command.stderr.write(line)
+
+
+def _run_identity(options, version):
+    """
+    What a checkpoint has to match to be resumed: the model version and
+    every option that decides which scenes are verified and how.
+    """
+    manifest = None
+    if options['manifest']:
+        with open(options['manifest'], 'rb') as f:
+            manifest = hashlib.sha256(f.read()).hexdigest()
+    return {
+        "model_version": version,
+        "tiled": options['tiled'],
+        "filters": {
+            "ids": sorted({int(pk) for pk in options['ids'].split(',') if pk}) if options['ids'] else None,
+            "has_boundary": options['has_boundary'],
+            "unverified": options['unverified'],
+            "verified_before": options['verified_before'].isoformat() if options['verified_before'] else None,
+            "manifest": manifest,
+            "no_stored": options['no_stored'],
+        },
+    }
+
+
+def _digest(run):
+    return hashlib.sha256(json.dumps(run, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def _read_checkpoint(path, run):
+    """
+    {(project_id, source): status} from an existing checkpoint, provided it
+    was written by a run with the same options.
+    """
+    done = {}
+    try:
+        with open(path) as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return done
+    except (OSError, ValueError) as e:
+        raise CommandError(f"Unreadable checkpoint {path} ({e}); use --restart")
+    if lines and any(lines[0].get(key) != value for key, value in run.items()):
+        raise CommandError(f"{path} is from a run with other options ({lines[0]}); use --restart")
+    for entry in lines[1:]:
+        done[(entry['project_id'], entry['source'])] = entry['status']
+    return done
+
+
+def _append(f, entries):
+    for entry in entries:
+        f.write(json.dumps(entry) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _duration(seconds):
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s" if minutes else f"{seconds}s"
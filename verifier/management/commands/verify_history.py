@@ -0,0 +1,98 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from verifier.history import read_manifest, recorded_scenes
+from verifier.masking import ProjectBoundary
+from verifier.models import Project, VerificationRecord
+from verifier.services import VunaVerifier
+
+
+class Command(BaseCommand):
+    help = (
+        "Adds archived scenes to projects' verification history. Incremental "
+        "by default: each scene is identified by its content hash and only "
+        "scenes not yet in the project's history are verified. Scenes come "
+        "from a CSV manifest (project_id,source[,acquired_on]), from paths or "
+        "URLs given with --project, or else from every project's stored TIFF."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('sources', nargs='*', help="Scene paths or URLs for --project")
+        parser.add_argument('--project', type=int, default=None, help="Project the given sources belong to")
+        parser.add_argument(
+            '--manifest', default=None,
+            help="CSV with project_id and source columns, optionally acquired_on (YYYY-MM-DD)",
+        )
+        parser.add_argument('--full', action='store_true', help="Re-verify scenes already in the history")
+        parser.add_argument('--batch-size', type=int, default=100, help="History rows per write")
+
+    def handle(self, *args, **options):
+        work = self._work(options)
+        projects = Project.objects.in_bulk({project_id for project_id, _, _ in work})
+        missing = {project_id for project_id, _, _ in work} - set(projects)
+        if missing:
+            raise CommandError(f"Unknown project ids: {', '.join(map(str, sorted(missing)))}")
+
+        verifier = VunaVerifier()
+        known = {} if options['full'] else recorded_scenes(projects)
+        boundaries = {}
+        pending = []
+        stats = {"verified": 0, "skipped": 0, "failed": 0}
+        started = time.perf_counter()
+
+        for project_id, source, acquired_on in work:
+            project = projects[project_id]
+            try:
+                raster_key = verifier.raster_key(source)
+            except Exception as e:
+                stats["failed"] += 1
+                self.stderr.write(f"{source}: {e}")
+                continue
+            if raster_key in known.get(project_id, ()):
+                stats["skipped"] += 1
+                continue
+
+            if project_id not in boundaries:
+                boundaries[project_id] = ProjectBoundary.from_project(project)
+            local = not str(source).startswith(('http://', 'https://'))
+            result, scene = verifier.verify_scene(
+                source, boundary=boundaries[project_id], raster_key=raster_key if local else None,
+            )
+            if result.get('status') != 'success' or scene is None:
+                stats["failed"] += 1
+                self.stderr.write(f"{source}: {result.get('message')}")
+                continue
+            if acquired_on:
+                scene["acquired_on"] = acquired_on
+            pending.append(VerificationRecord.from_result(project, result, scene, verifier.model_version, source))
+            known.setdefault(project_id, set()).add(scene["raster_key"])
+            stats["verified"] += 1
+            if len(pending) >= max(1, options['batch_size']):
+                VerificationRecord.upsert(pending)
+                pending = []
+
+        if pending:
+            VerificationRecord.upsert(pending)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(work)} scenes in {time.perf_counter() - started:.1f}s: {stats['verified']} verified, "
+            f"{stats['skipped']} already in the history, {stats['failed']} failed"
+        ))
+
+    def _work(self, options):
+        """
+        [(project_id, source, acquired_on or None)] from the options.
+        """
+        if options['manifest']:
+            try:
+                return read_manifest(options['manifest'])
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read the manifest: {e}")
+        if options['sources']:
+            if options['project'] is None:
+                raise CommandError("Sources need --project")
+            return [(options['project'], source, None) for source in options['sources']]
+        projects = Project.objects.exclude(tiff_file='').exclude(tiff_file__isnull=True)
+        if options['project'] is not None:
+            projects = projects.filter(pk=options['project'])
+        return [(project.pk, project.tiff_file.path, None) for project in projects.only('id', 'tiff_file')]
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from rasterio.crs import CRS
+from rasterio.errors import WindowError
+from rasterio.features import geometry_mask
+from rasterio.warp import transform_geom
+from rasterio.windows import Window, from_bounds
+
+from django.conf import settings
+
+from .geometry import geometry_bbox, parse_boundary
+
+# Project boundaries are stored as GeoJSON, i.e. lon/lat
+BOUNDARY_CRS = CRS.from_epsg(4326)
+
+
+class MaskCache:
+    """
+    Bounded LRU of rasterized boundary masks, stored bit-packed.
+    Keyed by project + boundary digest + the exact raster grid.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max(0, int(max_entries))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        packed, shape = entry
+        return np.unpackbits(packed, count=shape[0] * shape[1]).reshape(shape).astype(bool)
+
+    def set(self, key, mask):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[key] = (np.packbits(mask), mask.shape)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_mask_cache = None
+_mask_cache_lock = threading.Lock()
+
+
+def get_mask_cache():
+    """
+    The per-process MaskCache, created on first use.
+    """
+    global _mask_cache
+    if _mask_cache is None:
+        with _mask_cache_lock:
+            if _mask_cache is None:
+                _mask_cache = MaskCache(getattr(settings, 'VUNA_MASK_CACHE_SIZE', 4096))
+    return _mask_cache
+
+
+class ProjectBoundary:
+    """
+    A project's GeoJSON polygon, ready to be laid over raster grids.
+    """
+
+    def __init__(self, geometry, key=None):
+        self.geometry = geometry
+        self.digest = hashlib.sha256(
+            json.dumps(geometry, sort_keys=True).encode()
+        ).hexdigest()[:16]
+        self.key = key if key is not None else self.digest
+        self._projected = {}
+
+    @classmethod
+    def from_project(cls, project):
+        """
+        Returns None when the project has no usable boundary.
+        """
+        if not project:
+            return None
+        geometry = parse_boundary(project.geojson_boundary)
+        if geometry is None:
+            return None
+        return cls(geometry, key=project.pk)
+
+    def geometry_in(self, crs):
+        """
+        The boundary reprojected to `crs` (memoized per CRS).
+        """
+        if crs is None or CRS.from_user_input(crs) == BOUNDARY_CRS:
+            return self.geometry
+        crs_key = CRS.from_user_input(crs).to_string()
+        if crs_key not in self._projected:
+            self._projected[crs_key] = transform_geom(BOUNDARY_CRS, crs, self.geometry)
+        return self._projected[crs_key]
+
+    def window(self, src):
+        """
+        Pixel window of the boundary's bounding box, clipped to the scene.
+        None if the boundary doesn't overlap the scene at all.
+        """
+        window = from_bounds(
+            *geometry_bbox(self.geometry_in(src.crs)), transform=src.transform,
+        ).round_offsets(op='floor').round_lengths(op='ceil')
+        try:
+            return window.intersection(Window(0, 0, src.width, src.height))
+        except WindowError:
+            return None
+
+    def mask(self, crs, transform, out_shape):
+        """
+        Boolean array of `out_shape`, True for pixels inside the boundary on
+        the grid described by `transform`. Rasterized once per grid.
+        """
+        cache = get_mask_cache()
+        key = (self.key, self.digest, str(crs), tuple(transform)[:6], tuple(out_shape))
+        mask = cache.get(key)
+        if mask is None:
+            mask = geometry_mask(
+                [self.geometry_in(crs)], out_shape=tuple(out_shape), transform=transform,
+                invert=True, all_touched=True,
+            )
+            cache.set(key, mask)
+        return mask
+
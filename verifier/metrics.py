@@ -0,0 +1,313 @@
+"""
+Hot-path instrumentation for the verification pipeline, exposed in the
+Prometheus text format at /metrics.
+
+No client library is in the requirements, so this is a small in-process
+registry: counters and histograms updated under a per-metric lock, plus
+collectors that read the existing stats() of the verifier's components
+only when /metrics is scraped. With VUNA_METRICS_ENABLED = False, stage()
+hands back a shared no-op context manager and nothing is recorded.
+"""
+import contextvars
+import functools
+import logging
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers cache hits (sub-millisecond) through large tiled scenes
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_NOOP = nullcontext()
+_request_timings = contextvars.ContextVar('vuna_request_timings', default=None)
+
+
+def metrics_enabled():
+    return getattr(settings, 'VUNA_METRICS_ENABLED', True)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs.extend(f'{n}="{_escape(v)}"' for n, v in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (last is +Inf), sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _labels(self.labelnames, key, extra=[('le', _number(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Metrics plus collectors; collectors are callables returning
+    {"name": (documentation, value)} of gauges read at scrape time.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            try:
+                gauges = collect()
+            except Exception:
+                # A broken component must not take the whole scrape down
+                logger.warning("Metrics collector %r failed", collect, exc_info=True)
+                continue
+            for name, (documentation, value) in sorted(gauges.items()):
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'vuna_stage_seconds', "Time spent in each verification stage.", ['stage'],
+)
+STAGE_ERRORS = REGISTRY.counter(
+    'vuna_stage_errors_total', "Exceptions raised inside a verification stage, by exception type.",
+    ['stage', 'error'],
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    'vuna_request_seconds', "API request latency by view and HTTP status.", ['view', 'status'],
+)
+VERIFICATIONS = REGISTRY.counter(
+    'vuna_verifications_total', "VunaVerifier.verify() calls by outcome and how they were answered.",
+    ['status', 'source'],
+)
+BYTES_READ = REGISTRY.counter(
+    'vuna_bytes_read_total', "Raster bytes taken in: whole inputs hashed, and band data decoded.", ['kind'],
+)
+BATCH_SIZE = REGISTRY.histogram(
+    'vuna_inference_batch_size', "Scenes or tiles per ResNet + XGBoost pass.", buckets=BATCH_SIZE_BUCKETS,
+)
+
+
+class _Stage:
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        STAGE_SECONDS.observe(elapsed, stage=self.name)
+        if exc_type is not None:
+            STAGE_ERRORS.inc(stage=self.name, error=exc_type.__name__)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((self.name, elapsed))
+        return False
+
+
+def stage(name):
+    """
+    Context manager timing one pipeline stage; exceptions are counted
+    against the stage and re-raised.
+    """
+    if not metrics_enabled():
+        return _NOOP
+    return _Stage(name)
+
+
+def count(metric, amount=1, **labels):
+    """
+    metric.inc() unless metrics are disabled.
+    """
+    if metrics_enabled():
+        metric.inc(amount, **labels)
+
+
+def observe(metric, value, **labels):
+    """
+    metric.observe() unless metrics are disabled.
+    """
+    if metrics_enabled():
+        metric.observe(value, **labels)
+
+
+def instrumented(view_name):
+    """
+    Decorator for a view's dispatch(): records request latency by status
+    and, with VUNA_METRICS_TIMING_HEADERS, returns the stages that ran in
+    the request thread as a Server-Timing header.
+    """
+    def decorator(dispatch):
+        @functools.wraps(dispatch)
+        def wrapper(*args, **kwargs):
+            if not metrics_enabled():
+                return dispatch(*args, **kwargs)
+            timings = []
+            token = _request_timings.set(timings)
+            started = time.perf_counter()
+            try:
+                response = dispatch(*args, **kwargs)
+            finally:
+                _request_timings.reset(token)
+            elapsed = time.perf_counter() - started
+            REQUEST_SECONDS.observe(elapsed, view=view_name, status=response.status_code)
+            if getattr(settings, 'VUNA_METRICS_TIMING_HEADERS', False):
+                parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings]
+                parts.append(f"total;dur={elapsed * 1000:.2f}")
+                response['Server-Timing'] = ', '.join(parts)
+            return response
+        return wrapper
+    return decorator
+
+
+def stats_collector(prefix, get_stats, documentation):
+    """
+    Registers a collector exposing the flat numeric fields of a component's
+    stats() dict as gauges named {prefix}_{field}. `get_stats` may return
+    None when the component hasn't been created in this process; it is
+    called once per scrape, and a failure only drops this component.
+    """
+    def collect():
+        try:
+            stats = get_stats()
+        except Exception:
+            logger.warning("Could not collect the %s metrics", prefix, exc_info=True)
+            return {}
+        if not stats:
+            return {}
+        return {
+            f"{prefix}_{key}": (f"{documentation} ({key})", value)
+            for key, value in stats.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        }
+    return REGISTRY.collector(collect)
+
+
+def _verifier_stats(attribute):
+    # Don't force a model load (or even the import) just to be scraped;
+    # only the one component's stats, not the whole VunaVerifier.stats()
+    services = sys.modules.get(f'{__package__}.services')
+    verifier = services.VunaVerifier._instance if services else None
+    component = getattr(verifier, attribute, None)
+    return component.stats() if component is not None else None
+
+
+def _singleton_stats(module, attribute):
+    # A per-process component (mask cache, fetcher), if it has been created
+    module = sys.modules.get(f'{__package__}.{module}')
+    component = getattr(module, attribute, None)
+    return component.stats() if component is not None else None
+
+
+def _job_stats():
+    from .jobs import get_job_queue
+    return get_job_queue().stats()
+
+
+def _tile_stats():
+    from .boundary_tiles import get_tile_source
+    return get_tile_source().stats()
+
+
+stats_collector('vuna_batching', lambda: _verifier_stats('batcher'), "Micro-batching engine")
+stats_collector('vuna_prediction_cache', lambda: _verifier_stats('cache'), "Prediction cache")
+stats_collector('vuna_inflight', lambda: _verifier_stats('inflight'), "Single-flight verification coalescing")
+stats_collector('vuna_embeddings', lambda: _verifier_stats('embeddings'), "Embedding store")
+stats_collector('vuna_mask_cache', lambda: _singleton_stats('masking', '_mask_cache'), "Boundary mask cache")
+stats_collector('vuna_fetch', lambda: _singleton_stats('fetch', '_fetcher'), "Remote TIFF fetcher")
+stats_collector('vuna_jobs', _job_stats, "Async job queue")
+stats_collector('vuna_vector_tiles', _tile_stats, "Vector tile cache")
@@ -0,0 +1,54 @@
+# Generated by Django 6.0.1 on 2026-10-16 21:05
+
+from django.db import migrations, models
+
+from verifier.geometry import geometry_bbox, parse_boundary
+
+
+def fill_bboxes(apps, schema_editor):
+    Project = apps.get_model('verifier', 'Project')
+    fields = ['bbox_min_lon', 'bbox_min_lat', 'bbox_max_lon', 'bbox_max_lat']
+    updated = []
+    for project in Project.objects.exclude(geojson_boundary__isnull=True).only('id', 'geojson_boundary'):
+        geometry = parse_boundary(project.geojson_boundary)
+        bbox = geometry_bbox(geometry) if geometry else None
+        if bbox:
+            for name, value in zip(fields, bbox):
+                setattr(project, name, value)
+            updated.append(project)
+    Project.objects.bulk_update(updated, fields, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('verifier', '0003_verificationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='bbox_max_lat',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='bbox_max_lon',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='bbox_min_lat',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='bbox_min_lon',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['bbox_min_lon', 'bbox_max_lon', 'bbox_min_lat', 'bbox_max_lat'], name='verifier_project_bbox'),
+        ),
+        migrations.RunPython(fill_bboxes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-16 22:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('verifier', '0004_project_bbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VerificationRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('acquired_on', models.DateField(help_text='Scene acquisition date (verification date if unknown)')),
+                ('raster_key', models.CharField(max_length=64)),
+                ('source', models.CharField(blank=True, default='', max_length=1024)),
+                ('model_version', models.CharField(max_length=128)),
+                ('carbon_flux', models.FloatField()),
+                ('annual_tonnes_co2', models.FloatField()),
+                ('estimated_revenue_usd', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='history', to='verifier.project')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['project', 'acquired_on'], name='verifier_history_date')],
+                'constraints': [models.UniqueConstraint(fields=('project', 'raster_key', 'acquired_on'), name='verifier_history_scene')],
+            },
+        ),
+    ]
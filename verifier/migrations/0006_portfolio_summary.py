@@ -0,0 +1,66 @@
+# Generated by Django 6.0.1 on 2026-10-16 22:59
+
+from django.db import migrations, models
+
+
+# The flux bands as of this migration (verifier.summary.FLUX_BANDS), copied
+# so later changes to the app code don't change what it computes
+FLUX_BANDS = (('high', 0.07), ('good', 0.04), ('moderate', 0.02), ('low', None))
+
+
+def bucket_keys(state):
+    flux, category = state
+    if flux is None:
+        band = 'unverified'
+    else:
+        band = next(band for band, threshold in FLUX_BANDS if threshold is None or flux > threshold)
+    return [('total', ''), ('flux_band', band), ('category', category or '')]
+
+
+def summarize_projects(apps, schema_editor):
+    # Counts the existing projects (all uncategorized until the next
+    # forest import) into the new summary table
+    Project = apps.get_model('verifier', 'Project')
+    SummaryBucket = apps.get_model('verifier', 'SummaryBucket')
+    totals = {}
+    for state in Project.objects.values_list('cached_flux', 'category').iterator(chunk_size=5000):
+        for key in bucket_keys(state):
+            total = totals.setdefault(key, [0, 0, 0.0])
+            total[0] += 1
+            total[1] += state[0] is not None
+            total[2] += state[0] or 0.0
+    SummaryBucket.objects.bulk_create([
+        SummaryBucket(dimension=dimension, key=key, projects=projects, verified=verified, flux_sum=flux_sum)
+        for (dimension, key), (projects, verified, flux_sum) in totals.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('verifier', '0005_verificationrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='category',
+            field=models.CharField(blank=True, default='', help_text='Forest category', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='SummaryBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=32)),
+                ('key', models.CharField(blank=True, max_length=64)),
+                ('projects', models.IntegerField(default=0)),
+                ('verified', models.IntegerField(default=0)),
+                ('flux_sum', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'key'), name='verifier_summary_bucket')],
+            },
+        ),
+        migrations.RunPython(summarize_projects, migrations.RunPython.noop),
+    ]
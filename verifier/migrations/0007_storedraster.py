@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-16 23:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('verifier', '0006_portfolio_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredRaster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('source_key', models.CharField(max_length=64)),
+                ('content_key', models.CharField(max_length=64)),
+                ('has_companion', models.BooleanField(default=False)),
+                ('original_bytes', models.BigIntegerField()),
+                ('stored_bytes', models.BigIntegerField()),
+                ('companion_bytes', models.BigIntegerField(blank=True, null=True)),
+                ('band_stats', models.JSONField(default=list)),
+                ('parity', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
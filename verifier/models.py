@@ -1,4 +1,26 @@
-from django.db import models
+import json
+import uuid
+
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .geometry import geometry_bbox, parse_boundary
+
+
+class ProjectQuerySet(models.QuerySet):
+    def priced(self, pricing):
+        """
+        Annotates priced_co2 and priced_revenue: the projects' annual tonnes
+        of CO2 and revenue under `pricing` (an economics.PricingModel),
+        computed in the query from cached_flux.
+        """
+        return self.annotate(
+            priced_co2=Round(F('cached_flux') * Value(pricing.tonnes_per_flux), 2),
+            priced_revenue=Round(F('cached_flux') * Value(pricing.usd_per_flux), 2),
+        )
+
 
 class Project(models.Model):
     name = models.CharField(max_length=255)
@@ -10,16 +32,238 @@ class Project(models.Model):
     # We use FileField so we can upload the actual physics data
     tiff_file = models.FileField(upload_to='projects/tiffs/')
     
-    # Cached results from VunaVerifier
+    # Cached results from VunaVerifier. CO2 and revenue are as of the last
+    # verification; the API derives them from cached_flux under the current
+    # pricing (ProjectQuerySet.priced)
     cached_flux = models.FloatField(null=True, blank=True, help_text="Predicted Carbon Flux")
     cached_co2 = models.FloatField(null=True, blank=True, help_text="Annual Tonnes CO2")
     cached_revenue = models.FloatField(null=True, blank=True, help_text="Estimated Revenue USD")
     
     # Boundary Data (GeoJSON Polygon)
     geojson_boundary = models.TextField(null=True, blank=True, help_text="GeoJSON Polygon string")
+    # Forest category from the boundary's properties (GAZETTED: Gazetted / Community)
+    category = models.CharField(max_length=64, blank=True, default='', help_text="Forest category")
+    # Bounding box of geojson_boundary (lon/lat), kept in sync on save
+    bbox_min_lon = models.FloatField(null=True, blank=True, editable=False)
+    bbox_min_lat = models.FloatField(null=True, blank=True, editable=False)
+    bbox_max_lon = models.FloatField(null=True, blank=True, editable=False)
+    bbox_max_lat = models.FloatField(null=True, blank=True, editable=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProjectQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['bbox_min_lon', 'bbox_max_lon', 'bbox_min_lat', 'bbox_max_lat'], name='verifier_project_bbox'),
+        ]
+
     def __str__(self):
         return self.name
+
+    # What the portfolio summary (summary.py) counts a project by
+    SUMMARY_FIELDS = ['cached_flux', 'category']
+
+    def summary_state(self):
+        return self.cached_flux, self.category
+
+    BBOX_FIELDS = ['bbox_min_lon', 'bbox_min_lat', 'bbox_max_lon', 'bbox_max_lat']
+
+    def refresh_bbox(self):
+        """
+        Recomputes the bbox_* fields from geojson_boundary (None without one).
+        """
+        geometry = parse_boundary(self.geojson_boundary)
+        self._set_bbox(geometry_bbox(geometry) if geometry else None)
+
+    def set_boundary(self, geometry):
+        """
+        Stores a Polygon / MultiPolygon geometry dict as the boundary, with
+        its bounding box, without saving (for bulk_create / bulk_update).
+        """
+        self.geojson_boundary = json.dumps(geometry)
+        self._set_bbox(geometry_bbox(geometry))
+
+    def _set_bbox(self, bbox):
+        for name, value in zip(self.BBOX_FIELDS, bbox or (None,) * 4):
+            setattr(self, name, value)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.refresh_bbox()
+        elif 'geojson_boundary' in update_fields:
+            self.refresh_bbox()
+            kwargs['update_fields'] = list(update_fields) + self.BBOX_FIELDS
+        # One transaction around the save signals: the summary's locked read
+        # of the stored row (signals.py) holds until its totals are updated
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    # Fields written by a verification; see Project.objects.bulk_update callers
+    VERIFICATION_FIELDS = ['cached_flux', 'cached_co2', 'cached_revenue', 'updated_at']
+
+    def apply_verification(self, result):
+        """
+        Copies a successful VunaVerifier result onto the cached_* fields
+        without saving.
+        """
+        self.cached_flux = result.get('carbon_flux')
+        self.cached_co2 = result.get('annual_tonnes_co2')
+        self.cached_revenue = result.get('estimated_revenue_usd')
+        # bulk_update() doesn't apply auto_now
+        self.updated_at = timezone.now()
+
+    def record_verification(self, result):
+        """
+        Stores a successful VunaVerifier result in the cached_* fields.
+        """
+        self.apply_verification(result)
+        self.save(update_fields=self.VERIFICATION_FIELDS)
+
+
+class VerificationRecord(models.Model):
+    """
+    One scene's whole-scene verification in a project's history. A scene is
+    its raster content (raster_key, as in the verifier's caches) and
+    acquisition date; verifying it again with a new model updates the row.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='history')
+    acquired_on = models.DateField(help_text="Scene acquisition date (verification date if unknown)")
+    raster_key = models.CharField(max_length=64)
+    # Path or URL the scene was verified from, blank for uploads
+    source = models.CharField(max_length=1024, blank=True, default='')
+    model_version = models.CharField(max_length=128)
+
+    carbon_flux = models.FloatField()
+    annual_tonnes_co2 = models.FloatField()
+    estimated_revenue_usd = models.FloatField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'raster_key', 'acquired_on'], name='verifier_history_scene'),
+        ]
+        indexes = [
+            models.Index(fields=['project', 'acquired_on'], name='verifier_history_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.project_id} {self.acquired_on} {self.raster_key[:12]}"
+
+    # Replaced when a scene is verified again
+    RESULT_FIELDS = ['source', 'model_version', 'carbon_flux', 'annual_tonnes_co2', 'estimated_revenue_usd', 'updated_at']
+
+    @classmethod
+    def from_result(cls, project, result, scene, model_version, source=''):
+        """
+        An unsaved row for a successful VunaVerifier result and the scene
+        returned with it by VunaVerifier.verify_scene.
+        """
+        return cls(
+            project=project,
+            raster_key=scene['raster_key'],
+            acquired_on=scene['acquired_on'] or timezone.localdate(),
+            source=str(source or '')[:1024],
+            model_version=model_version,
+            carbon_flux=result['carbon_flux'],
+            annual_tonnes_co2=result['annual_tonnes_co2'],
+            estimated_revenue_usd=result['estimated_revenue_usd'],
+        )
+
+    @classmethod
+    def upsert(cls, records, batch_size=500):
+        """
+        Saves rows from from_result(), replacing those already recorded for
+        the same scenes, in one INSERT ... ON CONFLICT per batch.
+        """
+        return cls.objects.bulk_create(
+            records, batch_size=batch_size, update_conflicts=True,
+            unique_fields=['project', 'raster_key', 'acquired_on'], update_fields=cls.RESULT_FIELDS,
+        )
+
+
+class StoredRaster(models.Model):
+    """
+    A stored project raster (a tiff_file name) after ingestion: rewritten as
+    a COG, optionally with a model-bands companion, with the checks it
+    passed against the original and the original's per-band statistics.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    # Content hashes of the file as uploaded and as stored now
+    source_key = models.CharField(max_length=64)
+    content_key = models.CharField(max_length=64)
+    has_companion = models.BooleanField(default=False)
+    original_bytes = models.BigIntegerField()
+    stored_bytes = models.BigIntegerField()
+    companion_bytes = models.BigIntegerField(null=True, blank=True)
+    # [{"band", "min", "max", "mean", "std", "valid_pixels", "nodata_pixels"}]
+    band_stats = models.JSONField(default=list)
+    # Model input (and flux) differences: {"cog": {...}, "companion": {...}}
+    parity = models.JSONField(default=dict)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+
+class SummaryBucket(models.Model):
+    """
+    One row of the materialized portfolio summary: the projects in a bucket
+    of a dimension (the total, a flux band, a forest category), how many of
+    them are verified and their summed flux. Kept up to date incrementally
+    by summary.py; CO2 and revenue are priced from flux_sum when read.
+    """
+    dimension = models.CharField(max_length=32)
+    key = models.CharField(max_length=64, blank=True)
+    projects = models.IntegerField(default=0)
+    verified = models.IntegerField(default=0)
+    flux_sum = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'key'], name='verifier_summary_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension}:{self.key}"
+
+
+class VerificationJob(models.Model):
+    """
+    An /api/verify/ request running in the background worker pool.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    project = models.ForeignKey(
+        Project, null=True, blank=True, on_delete=models.SET_NULL, related_name='verification_jobs'
+    )
+    # Local path or URL handed to VunaVerifier.verify
+    source = models.CharField(max_length=1024)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.id} ({self.status})"
@@ -0,0 +1,39 @@
+import math
+
+from django.conf import settings
+
+from .economics import DEFAULT_PRICING, PricingModel
+
+_models = None
+
+
+def pricing_models():
+    """
+    {version: PricingModel} from VUNA_PRICING_MODELS.
+    """
+    global _models
+    if _models is None:
+        configured = getattr(settings, 'VUNA_PRICING_MODELS', None) or {}
+        models = {version: PricingModel(version, **options) for version, options in configured.items()}
+        _models = models or {DEFAULT_PRICING.version: DEFAULT_PRICING}
+    return _models
+
+
+def get_pricing(version=None, carbon_price=None):
+    """
+    The pricing model `version` (default: VUNA_PRICING_MODEL), optionally
+    at another carbon price in USD per tonne. Raises ValueError for an
+    unknown version or a negative price.
+    """
+    models = pricing_models()
+    version = version or getattr(settings, 'VUNA_PRICING_MODEL', None) or next(iter(models))
+    try:
+        pricing = models[version]
+    except KeyError:
+        raise ValueError(f"Unknown pricing model {version!r}; known: {', '.join(models)}")
+    if carbon_price is not None:
+        carbon_price = float(carbon_price)
+        if not (math.isfinite(carbon_price) and carbon_price >= 0):
+            raise ValueError("The carbon price must be a non-negative number")
+        pricing = pricing.with_price(carbon_price)
+    return pricing
@@ -0,0 +1,151 @@
+import datetime
+import os
+import re
+import time
+
+import numpy as np
+import rasterio
+from rasterio.enums import MaskFlags, Resampling
+
+# Deliberately free of Django imports: shared with vuna_predict_api.py.
+
+# Sentinel-2 bands the model was trained on, in model channel order
+MODEL_BANDS = (7, 8, 6)
+# ResNet input size
+MODEL_SHAPE = (128, 128)
+NODATA_VALUE = -9999
+
+# Metadata tags that carry a scene's acquisition time, most specific first.
+# TIFFTAG_DATETIME is when the file was written, so it only comes last.
+ACQUISITION_TAGS = (
+    'ACQUISITION_DATE', 'DATE_ACQUIRED', 'SENSING_TIME', 'DATATAKE_1_DATATAKE_SENSING_START',
+    'PRODUCT_START_TIME', 'TIFFTAG_DATETIME',
+)
+# YYYYMMDD or YYYY-MM-DD (or YYYY:MM:DD), e.g. the 20230115T083211 in a
+# Sentinel-2 product name
+_DATE_PATTERN = re.compile(r'(?<!\d)((?:19|20)\d{2})[-:]?(\d{2})[-:]?(\d{2})(?!\d)')
+
+
+def preprocess_bands(img):
+    """
+    Normalizes a (3, H, W) stack of bands 7, 8, 6 the way the model expects.
+    Returns a new float32 array.
+    """
+    img = np.array(img, dtype=np.float32)
+    img[img == NODATA_VALUE] = 0.0
+    img = np.nan_to_num(img, nan=0.0)
+
+    # Band 7 and Band 8 -> Clip -1..1
+    img[0] = np.clip(img[0], -1, 1)
+    img[1] = np.clip(img[1], -1, 1)
+    # Band 6 -> Divide by 3000
+    img[2] = img[2] / 3000.0
+    return img
+
+
+def read_model_bands(src, out_shape=MODEL_SHAPE, window=None, bands=MODEL_BANDS,
+                     resampling=Resampling.bilinear):
+    """
+    Reads the model bands from an open rasterio dataset straight at the
+    model's resolution.
+
+    GDAL does the downsampling during the read and uses the file's overviews
+    when they exist, so memory and time depend on `out_shape`, not on the
+    scene size.
+
+    NODATA_VALUE pixels are left out of the resampling kernel (declared as
+    the file's nodata value when it doesn't declare one), so they can't
+    bleed into their valid neighbours, and output pixels mostly covering
+    nodata come back as NODATA_VALUE: preprocessing zeroes them, as the
+    full-resolution path does.
+    """
+    if isinstance(resampling, str):
+        resampling = Resampling[resampling]
+    if src.nodata is None:
+        with rasterio.open(f"vrt://{src.name}?a_nodata={NODATA_VALUE}") as declared:
+            return read_model_bands(declared, out_shape, window, bands, resampling)
+
+    shape = (len(bands),) + tuple(out_shape)
+    img = src.read(list(bands), out_shape=shape, window=window, resampling=resampling)
+    if all(MaskFlags.all_valid in src.mask_flag_enums[band - 1] for band in bands):
+        return img
+    valid = src.read_masks(list(bands), out_shape=shape, window=window, resampling=Resampling.average)
+    img[(valid == 0) | (img == src.nodata)] = NODATA_VALUE
+    return img
+
+
+def acquisition_date(src, name=None):
+    """
+    The date an open rasterio dataset was acquired: from its metadata tags,
+    else from a date in `name` (e.g. the product or upload file name) or in
+    the dataset's own path. None when neither has one.
+    """
+    tags = src.tags()
+    for tag in ACQUISITION_TAGS:
+        found = _parse_date(tags.get(tag, ''))
+        if found:
+            return found
+    for text in (name, src.name):
+        found = _parse_date(os.path.basename(str(text or '')))
+        if found:
+            return found
+    return None
+
+
+def _parse_date(text):
+    for match in _DATE_PATTERN.finditer(text):
+        try:
+            return datetime.date(*(int(part) for part in match.groups()))
+        except ValueError:
+            continue
+    return None
+
+
+def load_model_input(path, resampling=Resampling.bilinear):
+    """
+    Path -> preprocessed (3, 128, 128) float32 array ready for the extractor.
+    """
+    with rasterio.open(path) as src:
+        img = read_model_bands(src, resampling=resampling)
+    return preprocess_bands(img)
+
+
+def load_model_input_full_resolution(path):
+    """
+    The original read path: read every pixel of bands 7, 8, 6, preprocess at
+    full resolution, then resize with torchvision. Kept as the reference for
+    parity checks only.
+    """
+    import torch
+    from torchvision import transforms
+
+    with rasterio.open(path) as src:
+        img = src.read(list(MODEL_BANDS))
+    img = preprocess_bands(img)
+    resized = transforms.Resize(MODEL_SHAPE)(torch.from_numpy(img).float().unsqueeze(0))
+    return resized[0].numpy()
+
+
+def compare_read_paths(path, resampling=Resampling.bilinear):
+    """
+    Parity check between the decimated read and the full-resolution path.
+    Returns per-band error statistics and the time each path took.
+    """
+    started = time.perf_counter()
+    reference = load_model_input_full_resolution(path)
+    full_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    decimated = load_model_input(path, resampling=resampling)
+    decimated_seconds = time.perf_counter() - started
+
+    diff = np.abs(decimated - reference)
+    return {
+        "path": str(path),
+        "reference": reference,
+        "decimated": decimated,
+        "max_abs_diff": [round(float(v), 6) for v in diff.max(axis=(1, 2))],
+        "mean_abs_diff": [round(float(v), 6) for v in diff.mean(axis=(1, 2))],
+        "full_resolution_seconds": round(full_seconds, 4),
+        "decimated_seconds": round(decimated_seconds, 4),
+    }
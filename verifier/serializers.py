@@ -1,15 +1,29 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Project
+from .models import Project, VerificationJob
 
 class ProjectSerializer(serializers.ModelSerializer):
+    # Derived from cached_flux at query time: serialize Project.objects.priced() rows
+    cached_co2 = serializers.FloatField(source='priced_co2', read_only=True)
+    cached_revenue = serializers.FloatField(source='priced_revenue', read_only=True)
+
     class Meta:
         model = Project
         fields = [
             'id', 'name', 'latitude', 'longitude', 
             'tiff_file', 'cached_flux', 'cached_co2', 
-            'cached_revenue', 'geojson_boundary', 'updated_at'
+            'cached_revenue', 'category', 'geojson_boundary', 'updated_at'
         ]
 
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Optional field selection (?fields= / ?omit= on the list endpoint)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name in omit or ():
+            self.fields.pop(name, None)
+
 class VerificationInputSerializer(serializers.Serializer):
     # Optional project ID if we want to update an existing project
     # OR we can pass project details to create one.
@@ -24,6 +38,12 @@ class VerificationInputSerializer(serializers.Serializer):
     latitude = serializers.FloatField(required=False)
     longitude = serializers.FloatField(required=False)
 
+    # Score the scene window by window and return a per-tile flux grid
+    tiled = serializers.BooleanField(required=False, default=False)
+
+    # 'async' returns a job id immediately; poll /api/verify/<job_id>/ for the result
+    mode = serializers.ChoiceField(choices=['sync', 'async'], required=False, default='sync')
+
     def validate(self, data):
         """
         Check that either image_file or image_url is provided.
@@ -31,3 +51,44 @@ class VerificationInputSerializer(serializers.Serializer):
         if not data.get('image_file') and not data.get('image_url'):
             raise serializers.ValidationError("Either 'image_file' or 'image_url' must be provided.")
         return data
+
+class BulkVerificationItemSerializer(serializers.Serializer):
+    project_id = serializers.IntegerField(required=False, allow_null=True)
+    image_url = serializers.URLField(required=False)
+
+    def validate(self, data):
+        if not data.get('project_id') and not data.get('image_url'):
+            raise serializers.ValidationError("Each item needs a 'project_id' or an 'image_url'.")
+        return data
+
+
+class BulkVerificationInputSerializer(serializers.Serializer):
+    # Projects verified from their stored raster
+    project_ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    # Ad-hoc URLs with no project to update
+    image_urls = serializers.ListField(child=serializers.URLField(), required=False, default=list)
+    # Explicit (project, URL) pairs: verify the URL, store the result on the project
+    items = BulkVerificationItemSerializer(many=True, required=False, default=list)
+
+    tiled = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, data):
+        total = len(data['project_ids']) + len(data['image_urls']) + len(data['items'])
+        if not total:
+            raise serializers.ValidationError("Provide 'project_ids', 'image_urls' or 'items'.")
+        limit = getattr(settings, 'VUNA_BULK_MAX_ITEMS', 1000)
+        if total > limit:
+            raise serializers.ValidationError(f"At most {limit} items per bulk request.")
+        return data
+
+
+class VerificationJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.UUIDField(source='id', read_only=True)
+    project_id = serializers.PrimaryKeyRelatedField(source='project', read_only=True)
+
+    class Meta:
+        model = VerificationJob
+        fields = [
+            'job_id', 'status', 'project_id', 'result', 'error',
+            'created_at', 'started_at', 'finished_at'
+        ]
@@ -1,137 +1,481 @@
 import os
-import requests
-import uuid
-import torch
-import torch.nn as nn
-from torchvision import models, transforms
-import xgboost as xgb
+import threading
+import time
 import rasterio
+from rasterio.errors import RasterioError
+from rasterio.io import MemoryFile
 import numpy as np
+import requests
 from django.conf import settings
 from pathlib import Path
 
+from .batching import MicroBatcher
+from .cache import PredictionCache, content_hash, model_versions, prediction_dir
+from .economics import carbon_economics, flux_result
+from .pricing import get_pricing
+from .embeddings import EmbeddingStore
+from .ipc import InferenceClient
+from .metrics import BATCH_SIZE, BYTES_READ, VERIFICATIONS, count, observe, stage
+from .cog import model_source
+from .raster import MODEL_BANDS, MODEL_SHAPE, acquisition_date, preprocess_bands, read_model_bands
+from .singleflight import SingleFlight
+from .fetch import get_fetcher
+from .masking import get_mask_cache
+from .tiling import model_grid_transform, score_tiles
+
+
+def _is_virtual(path):
+    return str(path).startswith('/vsi')
+
+
 class VunaVerifier:
     _instance = None
+    _instance_lock = threading.Lock()
     _model_loaded = False
 
-    def __init__(self):
-        # Singleton-like initialization or lazy loading to avoid reloading heavy models
-        if not VunaVerifier._model_loaded:
-            self.load_models()
+    def __new__(cls):
+        # One shared instance per process: the heavy models and the batching
+        # engine only pay off if every request thread goes through the same ones.
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance.load_models()
+                    cls._instance = instance
+        return cls._instance
 
     def load_models(self):
-        # 1. Load the XGBoost Brain
-        self.xgb_model = xgb.XGBRegressor()
-        # Expect model in project root
-        model_path = settings.BASE_DIR / 'vuna_hybrid_gosif_model.json'
+        # 1 + 2. The ResNet Eyes and XGBoost Brain: in a shared inference
+        # server when one is configured (this process then never imports
+        # torch), otherwise loaded here
+        socket_path = getattr(settings, 'VUNA_INFERENCE_SOCKET', None)
+        if socket_path:
+            self.engine = InferenceClient(socket_path, timeout=getattr(settings, 'VUNA_INFERENCE_TIMEOUT', 60.0))
+        else:
+            from .inference import InferenceEngine
+            self.engine = InferenceEngine(
+                settings.BASE_DIR / 'vuna_hybrid_gosif_model.json',
+                seed=getattr(settings, 'VUNA_EXTRACTOR_SEED', 0),
+                backend=getattr(settings, 'VUNA_EXTRACTOR_BACKEND', 'eager'),
+                calibration_path=getattr(settings, 'VUNA_EXTRACTOR_CALIBRATION', None),
+                weights_path=getattr(settings, 'VUNA_RESNET_WEIGHTS', None),
+            )
+        engine_info = self.engine.info
+        self.extractor_backend = engine_info['backend']
         
-        if not model_path.exists():
-             raise FileNotFoundError(f"Model file not found at {model_path}")
-             
-        self.xgb_model.load_model(str(model_path))
-        
-        # 2. Load the ResNet Eyes (CPU mode for servers)
-        self.device = torch.device("cpu")
-        resnet = models.resnet18(weights=models.ResNet18_Weights.DEFAULT)
-        # Modify first layer for 3 channels (standard) - Wait, previous code had specific stride/padding?
-        # Original: resnet.conv1 = nn.Conv2d(3, 64, kernel_size=7, stride=2, padding=3, bias=False)
-        # ResNet18 default is 3 channels, but let's match the original script exactly to be safe.
-        resnet.conv1 = nn.Conv2d(3, 64, kernel_size=7, stride=2, padding=3, bias=False)
-        
-        self.feature_extractor = nn.Sequential(*list(resnet.children())[:-1]).to(self.device)
-        self.feature_extractor.eval()
+        # 3. Read settings (inputs not read at model size are resized by the engine)
+        self.read_resampling = getattr(settings, 'VUNA_READ_RESAMPLING', 'bilinear')
+
+        # 4. Micro-batching engine shared by all request threads
+        self.batching_enabled = getattr(settings, 'VUNA_BATCHING_ENABLED', True)
+        self.batcher = MicroBatcher(
+            self._embed_and_score_batch,
+            max_batch_size=getattr(settings, 'VUNA_BATCH_MAX_SIZE', 16),
+            max_wait_ms=getattr(settings, 'VUNA_BATCH_MAX_WAIT_MS', 10),
+        )
         
-        # 3. Setup Image Resizer
-        self.resizer = transforms.Resize((128, 128))
+        # 5. Sliding-window scoring limits (tiled mode)
+        self.tile_size = getattr(settings, 'VUNA_TILE_SIZE', 512)
+        self.tile_stride = getattr(settings, 'VUNA_TILE_STRIDE', None) or self.tile_size
+        self.tile_batch_size = getattr(settings, 'VUNA_TILE_BATCH_SIZE', 32)
+        self.tile_queue_size = getattr(settings, 'VUNA_TILE_QUEUE_SIZE', 64)
+        self.tile_readers = getattr(settings, 'VUNA_TILE_READERS', 2)
+
+        # The invoice: results carry its version, and cached results priced
+        # under another one are repriced from their flux on the way out
+        self.pricing = get_pricing()
+
+        # 6. Result cache keyed by raster content + model version
+        # Non-eager backends produce slightly different features, so they
+        # get their own cache entries and embedding store
+        self.extractor_version, self.model_version = model_versions(engine_info, self.read_resampling)
+        self.cache = PredictionCache(
+            max_entries=getattr(settings, 'VUNA_PREDICTION_CACHE_SIZE', 1024),
+            disk_dir=prediction_dir(getattr(settings, 'VUNA_CACHE_DIR', None)),
+        )
+
+        # 7. Identical concurrent verifications share one computation: across
+        # threads directly, across worker processes through a table of lock
+        # files (the second process then finds the first one's result in the
+        # shared disk caches)
+        self.inflight = SingleFlight(
+            lock_dir=getattr(settings, 'VUNA_SINGLEFLIGHT_DIR', None),
+            slots=getattr(settings, 'VUNA_SINGLEFLIGHT_SLOTS', 1024),
+            timeout=getattr(settings, 'VUNA_SINGLEFLIGHT_TIMEOUT', 300.0),
+        )
+
+        # 8. ResNet embeddings keyed by raster content + extractor version, so
+        # a new XGBoost model can re-score known rasters without the CNN
+        self.embeddings = None
+        embedding_dir = getattr(settings, 'VUNA_EMBEDDING_DIR', None)
+        if embedding_dir:
+            self.embeddings = EmbeddingStore(os.path.join(embedding_dir, self.extractor_version))
         
         VunaVerifier._model_loaded = True
 
-    def verify(self, input_path_or_url):
+    def warm_up(self):
+        """
+        Runs one model-sized input through the ResNet and XGBoost, so the
+        first real request doesn't pay for allocator and kernel setup (or,
+        with an inference server, finds out early that it is unreachable).
+        Bypasses the caches; returns the seconds taken.
+        """
+        started = time.perf_counter()
+        self.engine.score(self.engine.embed([np.zeros((3,) + MODEL_SHAPE, dtype=np.float32)]))
+        return time.perf_counter() - started
+
+    def score_path(self, path, bands=MODEL_BANDS):
         """
-        Main entry point. Handles URL or local path.
-        Returns dictionary with results.
+        Predicted flux of a whole local raster, read the way _predict reads
+        it but bypassing every cache: for parity checks between files.
+        """
+        with rasterio.open(path) as src:
+            img = read_model_bands(src, bands=bands, resampling=self.read_resampling)
+        return self._infer_batch([self._prepare_input(preprocess_bands(img))])[0]
+
+    def verify(self, input_path_or_url, tiled=False, boundary=None):
+        """
+        Main entry point. Handles URL, local path, raw bytes or a file-like
+        object (e.g. an upload), the last two without touching disk.
+        Returns dictionary with results; with tiled=True the scene is scored
+        window by window and the result also carries a per-tile flux grid.
+        An optional ProjectBoundary restricts reading and scoring to the
+        project's polygon.
+
+        Identical concurrent calls (same URL, path or bytes, same options)
+        share one computation: see self.inflight.
+        """
+        return self._verify_coalesced(input_path_or_url, tiled=tiled, boundary=boundary)[0]
+
+    def verify_scene(self, input_path_or_url, tiled=False, boundary=None, name=None, raster_key=None):
+        """
+        verify(), also returning what identifies the scene in a project's
+        verification history: {"raster_key", "acquired_on"}, or None when
+        the input couldn't be read. The acquisition date comes from the
+        raster's tags, else from a date in `name` (an upload's file name;
+        defaults to the path or URL). Passing the already known
+        `raster_key` of a local path saves hashing it twice.
+        """
+        if name is None and isinstance(input_path_or_url, (str, os.PathLike)):
+            name = str(input_path_or_url)
+        result, scene = self._verify_coalesced(input_path_or_url, tiled=tiled, boundary=boundary, raster_key=raster_key)
+        if scene is None:
+            return result, None
+        raster_key, readable = scene
+        return result, {"raster_key": raster_key, "acquired_on": self._acquisition_date(readable, name)}
+
+    def _verify_coalesced(self, input_path_or_url, tiled=False, boundary=None, raster_key=None):
+        data = None
+
+        # In-memory rasters are hashed up front and coalesced on content;
+        # URLs and paths on the name, before anything is downloaded or read
+        if isinstance(input_path_or_url, (bytes, bytearray, memoryview)):
+            data = bytes(input_path_or_url)
+        elif hasattr(input_path_or_url, 'read'):
+            if hasattr(input_path_or_url, 'seek'):
+                input_path_or_url.seek(0)
+            data = input_path_or_url.read()
+        if data is not None:
+            with stage('hash'):
+                raster_key = content_hash(data)
+            count(BYTES_READ, len(data), kind='hashed')
+            source = f"raster:{raster_key}"
+        elif str(input_path_or_url).startswith(('http://', 'https://')):
+            source = f"url:{input_path_or_url}"
+        else:
+            source = f"path:{os.path.abspath(input_path_or_url)}"
+
+        flight_key = PredictionCache.make_key(source, self.model_version, self._variant(tiled, boundary))
+        (result, scene), shared = self.inflight.do(
+            flight_key,
+            lambda: self._verify(input_path_or_url, data, raster_key, tiled=tiled, boundary=boundary),
+        )
+        if shared:
+            count(VERIFICATIONS, status=result.get('status'), source='coalesced')
+        # Every caller gets its own copy to add project details to
+        return dict(result), scene
+
+    def _verify(self, input_path_or_url, data=None, raster_key=None, tiled=False, boundary=None):
+        """
+        One uncoalesced verification. In-memory rasters arrive as `data`,
+        already hashed to `raster_key`. Returns (result, scene): scene is
+        (raster_key, the path or bytes to read it from), None if unreadable.
         """
-        temp_file = None
         target_path = input_path_or_url
 
-        try:
-            # Handle URL
-            if str(input_path_or_url).startswith(('http://', 'https://')):
-                target_path = self._download_file(input_path_or_url)
-                temp_file = target_path
+        # Handle URL: pooled, cached fetch; COGs are range-read in place
+        if data is None and str(input_path_or_url).startswith(('http://', 'https://')):
+            try:
+                with stage('fetch'):
+                    fetched = get_fetcher().fetch(str(input_path_or_url))
+            except (requests.RequestException, RasterioError) as e:
+                # Unreachable, 404, timed out: the caller's problem, not a 500
+                count(VERIFICATIONS, status='error', source='fetch')
+                return {"status": "error", "message": f"Could not fetch the image: {e}"}, None
+            target_path = fetched.path
+            raster_key = fetched.content_key
+        elif data is None:
+            if not os.path.exists(target_path):
+                count(VERIFICATIONS, status='error', source='input')
+                return {"status": "error", "message": "File not found"}, None
+            if raster_key is None:
+                with stage('hash'):
+                    raster_key = content_hash(target_path)
+                count(BYTES_READ, os.path.getsize(target_path), kind='hashed')
+        scene = raster_key, data if data is not None else target_path
+
+        # Same bytes + same model = same answer; skip rasterio and torch
+        cache_key = self.cache_key(raster_key, tiled=tiled, boundary=boundary)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            count(VERIFICATIONS, status='success', source='cache')
+            return self.pricing.reprice(cached), scene
 
-            # Run Prediction
-            return self._predict(target_path)
+        # Same bytes + same extractor = same features; only XGBoost needs to run
+        embedding_key = None
+        if not tiled and self.embeddings is not None:
+            embedding_key = self.embedding_key(raster_key, boundary)
+            embedding = self.embeddings.get(embedding_key)
+            if embedding is not None:
+                with stage('xgboost'):
+                    result = flux_result(float(self.engine.score(embedding[None, :])[0]), self.pricing)
+                self.cache.set(cache_key, result)
+                count(VERIFICATIONS, status='success', source='embedding')
+                return result, scene
 
+        # Stored rasters converted by cog.ingest keep their model bands in a
+        # small companion file, which holds the same pixels
+        bands = MODEL_BANDS
+        if data is None and not str(input_path_or_url).startswith(('http://', 'https://')):
+            target_path, bands = model_source(target_path)
+
+        # Run Prediction
+        memfile = MemoryFile(data) if data is not None else None
+        try:
+            if memfile is not None:
+                target_path = memfile.name
+            if tiled:
+                result = self._predict_tiled(target_path, boundary=boundary, bands=bands)
+            else:
+                result = self._predict(target_path, boundary=boundary, embedding_key=embedding_key, bands=bands)
         finally:
-            # Cleanup temp file if we created one
-            if temp_file and os.path.exists(temp_file):
-                os.remove(temp_file)
+            if memfile is not None:
+                memfile.close()
+        if result.get('status') == 'success':
+            self.cache.set(cache_key, result)
+        count(VERIFICATIONS, status=result.get('status'), source='tiled' if tiled else 'pipeline')
+        return result, scene
 
-    def _download_file(self, url):
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-        
-        # Save to a temporary file
-        filename = f"temp_{uuid.uuid4().hex}.tif"
-        path = os.path.join(settings.BASE_DIR, filename)
-        
-        with open(path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        
-        return path
+    def _acquisition_date(self, readable, name=None):
+        try:
+            if isinstance(readable, bytes):
+                with MemoryFile(readable) as memfile, memfile.open() as src:
+                    return acquisition_date(src, name)
+            with rasterio.open(readable) as src:
+                return acquisition_date(src, name)
+        except RasterioError:
+            return None
 
-    def _predict(self, image_path):
+    def raster_key(self, input_path_or_url):
         """
-        Input: Path to a Sentinel-2 TIF image.
+        The content key verify() identifies a local path or URL by, without
+        verifying it. URLs are fetched into the download cache, so the
+        verification that usually follows doesn't download them again.
+        """
+        if str(input_path_or_url).startswith(('http://', 'https://')):
+            with stage('fetch'):
+                return get_fetcher().fetch(str(input_path_or_url)).content_key
+        with stage('hash'):
+            return content_hash(input_path_or_url)
+
+    def cache_key(self, raster_key, tiled=False, boundary=None):
+        """
+        Key of a verification result in self.cache.
+        """
+        return PredictionCache.make_key(raster_key, self.model_version, self._variant(tiled, boundary))
+
+    def _variant(self, tiled=False, boundary=None):
+        variant = []
+        if tiled:
+            variant.append(f"tiled-{self.tile_size}-{self.tile_stride}")
+        if boundary:
+            variant.append(f"mask-{boundary.digest}")
+        return '-'.join(variant) or None
+
+    def embedding_key(self, raster_key, boundary=None):
+        """
+        Key of a scene's whole-image embedding in self.embeddings. The store
+        is already per extractor version, so only the input is named here.
+        """
+        return f"{raster_key}:mask-{boundary.digest}" if boundary else raster_key
+
+    def _predict(self, image_path, boundary=None, embedding_key=None, bands=MODEL_BANDS):
+        """
+        Input: Path to a Sentinel-2 TIF image (and optionally the project's
+        boundary, and where in the file bands 7, 8, 6 are).
         Output: Dictionary with Carbon Flux, Tonnes, and Dollar Value.
+        With an embedding_key the ResNet features are kept in self.embeddings.
         """
         try:
-            # Check if file exists
-            if not os.path.exists(image_path):
+            # Check if file exists (GDAL virtual paths are checked by rasterio)
+            if not _is_virtual(image_path) and not os.path.exists(image_path):
                 return {"status": "error", "message": "File not found"}
 
-            # A. Read Physics Bands (7, 8, 6)
+            # A. Read Physics Bands (7, 8, 6), decimated straight to 128x128
             # Note: We need to handle potential rasterio errors gracefully
-            with rasterio.open(image_path) as src:
+            with stage('read'), rasterio.open(image_path) as src:
                 # Check band count
                 if src.count < 8:
                      # Fallback or error? Logic asks for 7, 8, 6.
                      # If file has fewer than 8 bands, this will fail.
                      pass
-                img = src.read([7, 8, 6])
-            
-            # B. Preprocess (Normalize)
-            img[img == -9999] = 0.0
-            img = np.nan_to_num(img, nan=0.0)
-            
-            # Clip and Scale
-            # Band 7 (index 0 in 'img') -> Clip -1..1
-            img[0] = np.clip(img[0], -1, 1)
-            # Band 8 (index 1 in 'img') -> Clip -1..1
-            img[1] = np.clip(img[1], -1, 1)
-            # Band 6 (index 2 in 'img') -> Divide by 3000
-            img[2] = img[2] / 3000.0
+                # Only the polygon's bounding window when we know the boundary
+                window = mask = None
+                if boundary:
+                    window = boundary.window(src)
+                    if window is None:
+                        return {"status": "error", "message": "Project boundary does not overlap the image"}
+                    mask = boundary.mask(src.crs, model_grid_transform(src, window), MODEL_SHAPE)
+                    if not mask.any():
+                        return {"status": "error", "message": "Project boundary does not overlap the image"}
+                img = read_model_bands(src, window=window, bands=bands, resampling=self.read_resampling)
+            count(BYTES_READ, img.nbytes, kind='decoded')
             
-            # C. Extract Features
-            tensor = self.resizer(torch.from_numpy(img).float().unsqueeze(0)).to(self.device)
-            features = self.feature_extractor(tensor).view(1, -1).detach().numpy()
+            # B. Preprocess (Normalize) - on the small array only
+            with stage('preprocess'):
+                img = preprocess_bands(img)
+                if mask is not None:
+                    # Pixels outside the forest don't count
+                    img[:, ~mask] = 0.0
+                model_input = self._prepare_input(img)
             
-            # D. Predict Flux
-            flux_pred = float(self.xgb_model.predict(features)[0])
+            # C + D. Extract Features and Predict Flux (batched with concurrent requests)
+            with stage('inference'):
+                flux_pred, embedding = self._score(model_input)
+            if embedding_key is not None:
+                with stage('embedding_store'):
+                    self.embeddings.put(embedding_key, embedding)
             
             # E. Calculate Economics (The Invoice)
-            # Formula: Flux * 18 (GPP) * 0.5 (Net) * 365 days * 10k m2 / 1M g->tonnes * 3.67 (C->CO2)
-            tonnes_per_year = (flux_pred * 18 * 0.5 * 365 * 10000 / 1_000_000) * (44/12)
-            value_usd = tonnes_per_year * 20.0 # Assumed $20/credit
+            return flux_result(flux_pred, self.pricing)
             
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    def _predict_tiled(self, image_path, boundary=None, bands=MODEL_BANDS):
+        """
+        Input: Path to a Sentinel-2 TIF image.
+        Output: Per-hectare figures from the area-weighted mean flux, scene
+        totals over the scored area, and the georeferenced flux grid.
+        """
+        try:
+            if not _is_virtual(image_path) and not os.path.exists(image_path):
+                return {"status": "error", "message": "File not found"}
+
+            with stage('tiled_scoring'):
+                grid = score_tiles(
+                    image_path,
+                    lambda imgs: self._infer_batch([self._prepare_input(img) for img in imgs]),
+                    tile_size=self.tile_size,
+                    stride=self.tile_stride,
+                    batch_size=self.tile_batch_size,
+                    queue_size=self.tile_queue_size,
+                    readers=self.tile_readers,
+                    resampling=self.read_resampling,
+                    boundary=boundary,
+                    bands=bands,
+                )
+            flux_pred = grid.mean_flux()
+            if flux_pred is None:
+                return {"status": "error", "message": "No tiles could be scored"}
+
+            # Per-hectare invoice from the mean, totals from each cell's own flux and area
+            tonnes_per_year, value_usd = carbon_economics(flux_pred, self.pricing)
+            scored = grid.scored
+            cell_tonnes, cell_usd = carbon_economics(grid.flux[scored], self.pricing)
+            area_ha = float(grid.area_ha[scored].sum())
+
             return {
                 "status": "success",
                 "carbon_flux": round(flux_pred, 4),
                 "annual_tonnes_co2": round(tonnes_per_year, 2),
-                "estimated_revenue_usd": round(value_usd, 2)
+                "estimated_revenue_usd": round(value_usd, 2),
+                "area_ha": round(area_ha, 2),
+                "total_annual_tonnes_co2": round(float((cell_tonnes * grid.area_ha[scored]).sum()), 2),
+                "total_revenue_usd": round(float((cell_usd * grid.area_ha[scored]).sum()), 2),
+                "tiles": int(scored.sum()),
+                "pricing": self.pricing.version,
+                "grid": grid.to_dict(),
             }
-            
+
         except Exception as e:
             return {"status": "error", "message": str(e)}
+
+    def _prepare_input(self, img):
+        """
+        One preprocessed (3, H, W) band stack as a contiguous float32 array,
+        ready to batch. Inputs not read at model size are resized by the
+        engine.
+        """
+        return np.ascontiguousarray(img, dtype=np.float32)
+
+    def _score(self, model_input):
+        """
+        Runs one prepared input through ResNet + XGBoost and returns
+        (flux, 512-d feature vector). Concurrent callers are grouped into a
+        single batched pass.
+        """
+        if not self.batching_enabled:
+            return self._embed_and_score_batch([model_input])[0]
+        return self.batcher.run(model_input).value
+
+    def _embed_batch(self, inputs):
+        """
+        Input: list of prepared (3, H, W) arrays.
+        Output: (n, 512) float32 array of ResNet features.
+        """
+        observe(BATCH_SIZE, len(inputs))
+        with stage('cnn'):
+            return self.engine.embed(inputs)
+
+    def _embed_and_score_batch(self, inputs):
+        features = self._embed_batch(inputs)
+        with stage('xgboost'):
+            predictions = self.engine.score(features)
+        return [(float(p), row) for p, row in zip(predictions, features)]
+
+    def _infer_batch(self, inputs):
+        """
+        Input: list of prepared (3, H, W) arrays.
+        Output: list of predicted carbon flux values, one per input.
+        """
+        features = self._embed_batch(inputs)
+        with stage('xgboost'):
+            return [float(p) for p in self.engine.score(features)]
+
+    def rescore(self, embedding_keys):
+        """
+        Scores stored embeddings with the current XGBoost model in one
+        vectorized predict. Returns {embedding_key: result} for the keys
+        present in the store.
+        """
+        if self.embeddings is None:
+            return {}
+        keys, matrix = self.embeddings.matrix(embedding_keys)
+        if not keys:
+            return {}
+        return {key: flux_result(float(p), self.pricing) for key, p in zip(keys, self.engine.score(matrix))}
+
+    def stats(self):
+        """
+        Runtime counters for the shared inference path.
+        """
+        return {
+            "batching": self.batcher.stats(),
+            "engine": dict(self.engine.info, remote=isinstance(self.engine, InferenceClient)),
+            "cache": self.cache.stats(),
+            "inflight": self.inflight.stats(),
+            "embeddings": self.embeddings.stats() if self.embeddings is not None else None,
+            "masks": get_mask_cache().stats(),
+            "fetch": get_fetcher().stats(),
+        }
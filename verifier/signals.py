@@ -0,0 +1,68 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .freshness import projects_changed
+from .models import Project
+from .spatial import get_spatial_index
+from .summary import locked_states, record_changes
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def project_written(sender, **kwargs):
+    projects_changed()
+
+
+@receiver(post_save, sender=Project)
+def reindex_project(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'geojson_boundary' in update_fields:
+        get_spatial_index().update(instance)
+
+
+@receiver(post_delete, sender=Project)
+def unindex_project(sender, instance, **kwargs):
+    get_spatial_index().remove(instance.pk)
+
+
+def _touches_summary(update_fields):
+    return update_fields is None or not set(update_fields).isdisjoint(Project.SUMMARY_FIELDS)
+
+
+@receiver(pre_save, sender=Project)
+def lock_summary_state(sender, instance, update_fields=None, **kwargs):
+    # What the summary counts the stored row as, read under a lock that
+    # Project.save's transaction holds until summarize_project has run, so
+    # concurrent saves of one row move it one after the other
+    if not _touches_summary(update_fields):
+        return
+    instance._summary_before = locked_states([instance.pk]).get(instance.pk)
+
+
+@receiver(post_save, sender=Project)
+def summarize_project(sender, instance, update_fields=None, **kwargs):
+    if not _touches_summary(update_fields):
+        return
+    old = instance.__dict__.pop('_summary_before', None)
+    if update_fields is None or old is None:
+        new = instance.summary_state()
+    else:
+        # Fields left out of the save kept their stored values
+        new = tuple(
+            getattr(instance, name) if name in update_fields else stored
+            for name, stored in zip(Project.SUMMARY_FIELDS, old)
+        )
+    record_changes([(old, new)])
+
+
+@receiver(pre_delete, sender=Project)
+def lock_deleted_summary_state(sender, instance, **kwargs):
+    # Inside the deletion's transaction; a row someone else already deleted
+    # is no longer counted
+    instance._summary_before = locked_states([instance.pk]).get(instance.pk)
+
+
+@receiver(post_delete, sender=Project)
+def unsummarize_project(sender, instance, **kwargs):
+    old = instance.__dict__.pop('_summary_before', None)
+    if old is not None:
+        record_changes([(old, None)])
@@ -0,0 +1,118 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development only
+    fcntl = None
+
+# Deliberately free of Django imports, like cache.py.
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time.
+
+    Threads of one process asking for a key that is already being computed
+    wait for that computation and share its result (or exception). Across
+    processes, a table of `slots` lock files in `lock_dir` serializes calls
+    whose keys hash to the same slot: the second process waits for the
+    first and then runs, by which time the shared on-disk caches answer it
+    cheaply. A process that waits longer than `timeout` seconds for another
+    one gives up waiting and runs anyway.
+    """
+
+    def __init__(self, lock_dir=None, slots=1024, timeout=300.0, poll_interval=0.05):
+        self.lock_dir = str(lock_dir) if lock_dir else None
+        self.slots = max(1, int(slots))
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        if self.lock_dir and fcntl is not None:
+            os.makedirs(self.lock_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.process_waits = 0
+        self.process_timeouts = 0
+
+    def do(self, key, fn):
+        """
+        Returns (fn(), shared): `shared` is True when the value came from a
+        call another thread started.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = Future()
+                self.leaders += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+        if not leader:
+            return call.result(), True
+
+        try:
+            with self._process_lock(key):
+                value = fn()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(value)
+            return value, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    @contextmanager
+    def _process_lock(self, key):
+        if not self.lock_dir or fcntl is None:
+            yield
+            return
+        slot = int(hashlib.sha256(key.encode('utf-8')).hexdigest()[:8], 16) % self.slots
+        fd = os.open(os.path.join(self.lock_dir, f"{slot:04x}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            locked = self._acquire(fd)
+            try:
+                yield
+            finally:
+                if locked:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def _acquire(self, fd):
+        # Polled rather than blocking so a stuck peer can't hold us forever
+        deadline = None
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                pass
+            now = time.monotonic()
+            if deadline is None:
+                deadline = now + self.timeout
+                with self._lock:
+                    self.process_waits += 1
+            elif now >= deadline:
+                with self._lock:
+                    self.process_timeouts += 1
+                return False
+            time.sleep(self.poll_interval)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "process_waits": self.process_waits,
+                "process_timeouts": self.process_timeouts,
+            }
@@ -0,0 +1,185 @@
+import math
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Max
+
+from .freshness import projects_version
+from .geometry import PreparedPolygon, parse_boundary
+from .models import Project
+
+# Boxes spanning more cells than this skip the grid and are always checked
+MAX_CELLS_PER_ENTRY = 10_000
+
+
+class GridIndex:
+    """
+    Uniform lon/lat grid over bounding boxes. Each cell lists the entries
+    whose box touches it, so a point or box lookup only looks at the few
+    entries near it; exact geometry tests run on those candidates only.
+    """
+
+    def __init__(self, cell_degrees=0.1):
+        self.cell_degrees = float(cell_degrees)
+        self._cells = defaultdict(set)
+        self._large = set()
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def keys(self):
+        return list(self._entries)
+
+    def cell_count(self):
+        return len(self._cells)
+
+    def insert(self, key, polygon):
+        self.remove(key)
+        if polygon.bbox is None:
+            return
+        cells = self._cells_for(polygon.bbox)
+        if cells is None:
+            self._large.add(key)
+        else:
+            for cell in cells:
+                self._cells[cell].add(key)
+        self._entries[key] = polygon
+
+    def remove(self, key):
+        polygon = self._entries.pop(key, None)
+        if polygon is None:
+            return
+        self._large.discard(key)
+        for cell in self._cells_for(polygon.bbox) or ():
+            keys = self._cells.get(cell)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._cells[cell]
+
+    def locate(self, x, y):
+        """
+        Keys whose polygon contains (x, y), smallest polygon first.
+        """
+        candidates = self._cells.get(self._cell(x, y), set()) | self._large
+        hits = [k for k in candidates if self._entries[k].contains(x, y)]
+        return sorted(hits, key=lambda k: _bbox_area(self._entries[k].bbox))
+
+    def intersecting(self, box):
+        """
+        Keys whose polygon intersects the (min_x, min_y, max_x, max_y) box.
+        """
+        cells = self._cells_for(box)
+        if cells is None:
+            candidates = set(self._entries)
+        else:
+            candidates = set(self._large)
+            for cell in cells:
+                candidates |= self._cells.get(cell, set())
+        return sorted(k for k in candidates if self._entries[k].intersects_box(box))
+
+    def _cell(self, x, y):
+        return math.floor(x / self.cell_degrees), math.floor(y / self.cell_degrees)
+
+    def _cells_for(self, box):
+        x0, y0 = self._cell(box[0], box[1])
+        x1, y1 = self._cell(box[2], box[3])
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > MAX_CELLS_PER_ENTRY:
+            return None
+        return [(cx, cy) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1)]
+
+
+def _bbox_area(bbox):
+    return (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+
+
+class ProjectSpatialIndex:
+    """
+    In-process GridIndex over project boundaries.
+
+    Built from the database on first use. Saves in this process update it
+    directly (see signals); writes from other processes or bulk paths are
+    picked up when the project version stamp moves, by re-reading only the
+    rows updated since the last sync.
+    """
+
+    def __init__(self, cell_degrees=0.1):
+        self.grid = GridIndex(cell_degrees)
+        self._lock = threading.RLock()
+        self._version = None
+        self._synced_at = None
+
+    def locate(self, lon, lat):
+        self.sync()
+        with self._lock:
+            return self.grid.locate(lon, lat)
+
+    def intersecting(self, box):
+        self.sync()
+        with self._lock:
+            return self.grid.intersecting(box)
+
+    def update(self, project):
+        """
+        Re-indexes one project. A no-op until the index has been built.
+        """
+        with self._lock:
+            if self._version is None:
+                return
+            self._index(project.pk, project.geojson_boundary)
+
+    def remove(self, pk):
+        with self._lock:
+            self.grid.remove(pk)
+
+    def sync(self):
+        version = projects_version()['etag']
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            rows = Project.objects.all()
+            if self._synced_at is not None:
+                rows = rows.filter(updated_at__gte=self._synced_at)
+                # Deletions don't leave rows behind to find by updated_at
+                live = set(Project.objects.values_list('id', flat=True))
+                for pk in [pk for pk in self.grid.keys() if pk not in live]:
+                    self.grid.remove(pk)
+            for pk, text in rows.values_list('id', 'geojson_boundary').iterator():
+                self._index(pk, text)
+            self._synced_at = Project.objects.aggregate(latest=Max('updated_at'))['latest'] or self._synced_at
+            self._version = version
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self.grid),
+                "cells": self.grid.cell_count(),
+                "cell_degrees": self.grid.cell_degrees,
+            }
+
+    def _index(self, pk, text):
+        geometry = parse_boundary(text)
+        if geometry is None:
+            self.grid.remove(pk)
+        else:
+            self.grid.insert(pk, PreparedPolygon(geometry))
+
+
+_spatial_index = None
+_spatial_index_lock = threading.Lock()
+
+
+def get_spatial_index():
+    """
+    The per-process ProjectSpatialIndex, created on first use.
+    """
+    global _spatial_index
+    if _spatial_index is None:
+        with _spatial_index_lock:
+            if _spatial_index is None:
+                _spatial_index = ProjectSpatialIndex(getattr(settings, 'VUNA_SPATIAL_CELL_DEGREES', 0.1))
+    return _spatial_index
@@ -0,0 +1,187 @@
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Project, SummaryBucket
+
+# Same bands as the map legend: flux above each threshold, highest first
+FLUX_BANDS = (('high', 0.07), ('good', 0.04), ('moderate', 0.02), ('low', None))
+UNVERIFIED = 'unverified'
+
+DIMENSIONS = ('total', 'flux_band', 'category')
+
+
+def flux_band(flux):
+    if flux is None:
+        return UNVERIFIED
+    for band, threshold in FLUX_BANDS:
+        if threshold is None or flux > threshold:
+            return band
+
+
+def bucket_keys(state):
+    """
+    The (dimension, key) buckets a project with this summary state
+    ((cached_flux, category)) is counted in.
+    """
+    flux, category = state
+    return [('total', ''), ('flux_band', flux_band(flux)), ('category', category or '')]
+
+
+def record_changes(changes):
+    """
+    Applies [(old_state, new_state)] to the summary table, a state being
+    Project.summary_state() or None for "not counted" (a new or deleted
+    project). Only the buckets whose totals move are written, each with one
+    relative UPDATE, so concurrent writers don't lose each other's counts.
+    """
+    deltas = defaultdict(lambda: [0, 0, 0.0])
+    for old, new in changes:
+        if old == new:
+            continue
+        for state, sign in ((old, -1), (new, 1)):
+            if state is None:
+                continue
+            flux = state[0]
+            for key in bucket_keys(state):
+                delta = deltas[key]
+                delta[0] += sign
+                delta[1] += sign if flux is not None else 0
+                delta[2] += sign * (flux or 0.0)
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+
+    now = timezone.now()
+    with transaction.atomic():
+        SummaryBucket.objects.bulk_create(
+            [SummaryBucket(dimension=dimension, key=key) for dimension, key in deltas],
+            ignore_conflicts=True,
+        )
+        for (dimension, key), (projects, verified, flux_sum) in deltas.items():
+            SummaryBucket.objects.filter(dimension=dimension, key=key).update(
+                projects=F('projects') + projects,
+                verified=F('verified') + verified,
+                flux_sum=F('flux_sum') + flux_sum,
+                updated_at=now,
+            )
+
+
+def locked_states(pks):
+    """
+    {pk: summary state} of the given rows as stored now, locking them until
+    the surrounding transaction ends. A concurrent writer of the same rows
+    waits, then reads what this one wrote, so no transition is counted
+    twice. Call inside transaction.atomic().
+    """
+    pks = sorted({pk for pk in pks if pk is not None})
+    if not pks:
+        return {}
+    rows = Project.objects.filter(pk__in=pks).order_by('pk')
+    if connection.features.has_select_for_update:
+        rows = rows.select_for_update()
+    else:
+        # SQLite has no row locks: take the database write lock before reading
+        rows.update(category=F('category'))
+    return {pk: tuple(state) for pk, *state in rows.values_list('pk', *Project.SUMMARY_FIELDS)}
+
+
+@contextmanager
+def tracking(projects, fields=None):
+    """
+    Wraps writing `projects` in bulk (bulk_create / bulk_update bypass the
+    save signals), `fields` being the fields written (default: all):
+
+        with tracking(projects, Project.VERIFICATION_FIELDS):
+            Project.objects.bulk_update(projects, Project.VERIFICATION_FIELDS)
+
+    The rows are locked and their stored states read first, and the summary
+    moves from those to what was written, in the same transaction.
+    Projects without a pk yet are counted as new; rows deleted meanwhile
+    are left out.
+    """
+    projects = list(projects)
+    existing = {id(project) for project in projects if project.pk is not None}
+    with transaction.atomic():
+        old = locked_states(project.pk for project in projects)
+        yield
+        # The last instance of a row is the one written
+        latest = {project.pk if project.pk is not None else id(project): project for project in projects}
+        changes = []
+        for project in latest.values():
+            if id(project) in existing and project.pk not in old:
+                continue  # deleted meanwhile: the update wrote nothing
+            before = old.get(project.pk)
+            after = project.summary_state()
+            if fields is not None and before is not None:
+                # Fields left out of the write kept their stored values
+                after = tuple(
+                    value if name in fields else stored
+                    for name, value, stored in zip(Project.SUMMARY_FIELDS, after, before)
+                )
+            changes.append((before, after))
+        record_changes(changes)
+
+
+def rebuild_summary():
+    """
+    Recomputes the whole summary table from the projects, e.g. after writes
+    that bypassed both the signals and tracking(). Returns the
+    number of projects counted.
+    """
+    totals = defaultdict(lambda: [0, 0, 0.0])
+    counted = 0
+    for state in Project.objects.values_list(*Project.SUMMARY_FIELDS).iterator(chunk_size=5000):
+        counted += 1
+        for key in bucket_keys(state):
+            total = totals[key]
+            total[0] += 1
+            total[1] += state[0] is not None
+            total[2] += state[0] or 0.0
+    with transaction.atomic():
+        SummaryBucket.objects.all().delete()
+        SummaryBucket.objects.bulk_create([
+            SummaryBucket(dimension=dimension, key=key, projects=projects, verified=verified, flux_sum=flux_sum)
+            for (dimension, key), (projects, verified, flux_sum) in totals.items()
+        ])
+    return counted
+
+
+def portfolio_summary(pricing):
+    """
+    Totals and distributions from the summary table (a handful of rows,
+    whatever the number of projects), with CO2 and revenue priced under
+    `pricing` from the summed flux.
+    """
+    buckets = {(b.dimension, b.key): b for b in SummaryBucket.objects.all()}
+
+    def figures(bucket):
+        projects, verified, flux_sum = (bucket.projects, bucket.verified, bucket.flux_sum) if bucket else (0, 0, 0.0)
+        tonnes_per_year, value_usd = pricing.economics(flux_sum)
+        return {
+            "projects": projects,
+            "verified_projects": verified,
+            "mean_flux": round(flux_sum / verified, 4) if verified else None,
+            "annual_tonnes_co2": round(tonnes_per_year, 2),
+            "estimated_revenue_usd": round(value_usd, 2),
+        }
+
+    total = buckets.get(('total', ''))
+    bands = [band for band, _ in FLUX_BANDS] + [UNVERIFIED]
+    categories = sorted(key for dimension, key in buckets if dimension == 'category')
+    return {
+        "pricing": pricing.to_dict(),
+        **figures(total),
+        "by_flux_band": [
+            dict(band=band, min_flux=dict(FLUX_BANDS).get(band), **figures(buckets.get(('flux_band', band))))
+            for band in bands
+        ],
+        "by_category": [
+            dict(category=key or None, **figures(buckets[('category', key)]))
+            for key in categories if buckets[('category', key)].projects
+        ],
+        "updated_at": max((b.updated_at for b in buckets.values()), default=None),
+    }
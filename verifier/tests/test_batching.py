@@ -0,0 +1,80 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from verifier.batching import MicroBatcher
+from verifier.raster import MODEL_SHAPE
+
+from .utils import FakeEngine, fake_verifier
+
+
+class MicroBatcherTests(SimpleTestCase):
+    def test_concurrent_items_share_batches_and_get_their_own_outputs(self):
+        batches = []
+        release = threading.Event()
+
+        def double(items):
+            release.wait(5)
+            batches.append(list(items))
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(double, max_batch_size=4, max_wait_ms=200)
+        futures = [batcher.submit(i) for i in range(10)]
+        release.set()
+        results = [future.result(5) for future in futures]
+
+        self.assertEqual([r.value for r in results], [i * 2 for i in range(10)])
+        self.assertTrue(all(len(batch) <= 4 for batch in batches))
+        self.assertLess(len(batches), 10)
+        self.assertEqual(sorted(i for batch in batches for i in batch), list(range(10)))
+        self.assertEqual(results[-1].batch_size, len(batches[-1]))
+        stats = batcher.stats()
+        self.assertEqual(stats['requests'], 10)
+        self.assertEqual(stats['batches'], len(batches))
+        self.assertIsNotNone(stats['latency_ms']['p95'])
+
+    def test_lone_item_is_flushed_after_max_wait(self):
+        batcher = MicroBatcher(lambda items: items, max_batch_size=64, max_wait_ms=20)
+        started = time.perf_counter()
+        result = batcher.run('scene', timeout=5)
+        self.assertEqual((result.value, result.batch_size), ('scene', 1))
+        self.assertGreaterEqual(time.perf_counter() - started, 0.015)
+        self.assertLess(result.total_ms, 2000)
+
+    def test_errors_reach_every_caller_in_the_batch(self):
+        def broken(items):
+            raise ValueError("model failed")
+
+        batcher = MicroBatcher(broken, max_batch_size=8, max_wait_ms=50)
+        futures = [batcher.submit(i) for i in range(3)]
+        for future in futures:
+            with self.assertRaisesMessage(ValueError, "model failed"):
+                future.result(5)
+        self.assertEqual(batcher.stats()['errors'], 3)
+
+        # The loop survives a failed batch
+        batcher.batch_fn = lambda items: items[:-1]
+        with self.assertRaises(RuntimeError):
+            batcher.run(1, timeout=5)
+        batcher.batch_fn = lambda items: items
+        self.assertEqual(batcher.run(7, timeout=5).value, 7)
+
+
+class VerifierBatchingTests(SimpleTestCase):
+    def test_concurrent_predictions_share_engine_batches(self):
+        engine = FakeEngine()
+        verifier = fake_verifier(self, engine, VUNA_BATCH_MAX_SIZE=8, VUNA_BATCH_MAX_WAIT_MS=500)
+        inputs = [np.full((3,) + MODEL_SHAPE, i / 10, dtype=np.float32) for i in range(8)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            batched = list(pool.map(verifier._score, inputs))
+
+        self.assertLess(len(engine.batches), 8)
+        # Each caller gets its own input's flux and features, as unbatched
+        verifier.batching_enabled = False
+        for model_input, (flux, features) in zip(inputs, batched):
+            alone, alone_features = verifier._score(model_input)
+            self.assertEqual(flux, alone)
+            np.testing.assert_array_equal(features, alone_features)
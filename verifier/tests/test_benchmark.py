@@ -0,0 +1,113 @@
+import io
+import json
+from unittest import mock
+
+import rasterio
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+
+from verifier import fetch
+from verifier.benchmark import compare, make_synthetic_scene, run_load, summarize, time_stage
+from verifier.models import Project
+
+from .utils import fake_verifier, temp_dir
+
+
+class BenchmarkHelperTests(SimpleTestCase):
+    def test_summaries(self):
+        summary = summarize(range(1, 101))
+        self.assertEqual((summary['n'], summary['min_ms'], summary['max_ms'], summary['mean_ms']), (100, 1, 100, 50.5))
+        self.assertEqual(summary['p50_ms'], 50.5)
+        self.assertEqual(summarize([]), {"n": 0})
+
+        calls = []
+        summary, value = time_stage(lambda: calls.append(1) or len(calls), repeat=3, warmup=2)
+        self.assertEqual((summary['n'], value), (3, 5))
+
+    def test_load_counts_failures(self):
+        outcomes = iter([True, False, True, True] * 5)
+
+        def request():
+            if next(outcomes) is False:
+                raise RuntimeError("refused")
+            return True
+
+        run = run_load(request, total=20, concurrency=4)
+        self.assertEqual((run['requests'], run['errors'], run['latency']['n']), (20, 5, 20))
+        self.assertGreater(run['throughput_rps'], 0)
+
+    def test_regressions_are_flagged_in_the_right_direction(self):
+        baseline = {
+            "stages": {"cnn": {"p50_ms": 100.0}, "read": {"p50_ms": 10.0}, "new": {}},
+            "end_to_end": {"cold_c1": {"throughput_rps": 10.0, "latency": {"p99_ms": 200.0}}},
+        }
+        current = {
+            "stages": {"cnn": {"p50_ms": 130.0}, "read": {"p50_ms": 5.0}, "new": {"p50_ms": 1.0}},
+            "end_to_end": {"cold_c1": {"throughput_rps": 7.0, "latency": {"p99_ms": 210.0}}},
+        }
+        rows = {row['name']: row for row in compare(baseline, current, max_regression=0.2)}
+        self.assertEqual(set(rows), {'stage.cnn', 'stage.read', 'e2e.cold_c1.throughput_rps', 'e2e.cold_c1.latency.p99_ms'})
+        self.assertEqual(rows['stage.cnn']['change'], 0.3)
+        self.assertTrue(rows['stage.cnn']['regressed'])
+        self.assertFalse(rows['stage.read']['regressed'])
+        self.assertTrue(rows['e2e.cold_c1.throughput_rps']['regressed'])
+        self.assertFalse(rows['e2e.cold_c1.latency.p99_ms']['regressed'])
+
+    def test_synthetic_scenes_are_cog_like(self):
+        path = make_synthetic_scene(temp_dir(self) / 's.tif', width=512, height=300, block_size=256)
+        with rasterio.open(path) as src:
+            self.assertEqual((src.count, src.width, src.height), (13, 512, 300))
+            self.assertEqual(src.block_shapes[0], (256, 256))
+            self.assertEqual(src.overviews(1), [2, 4])  # down to 128 pixels on the long side
+            band7 = src.read(7, masked=True)
+            self.assertTrue(-0.2 <= band7.min() and band7.max() <= 0.9)
+            self.assertTrue(band7.mask.any())
+        with self.assertRaises(ValueError):
+            make_synthetic_scene(temp_dir(self) / 't.tif', bands=6)
+
+
+class BenchmarkCommandTests(TestCase):
+    def setUp(self):
+        self.verifier = fake_verifier(self)
+        self.enterContext(mock.patch.object(fetch, '_fetcher', None))
+        self.dir = temp_dir(self)
+
+    def benchmark(self, *args):
+        err = io.StringIO()
+        call_command(
+            'benchmark_verifier', '--width', '256', '--height', '256', '--repeat', '2', '--requests', '4',
+            '--concurrency', '1,2', *args, stdout=io.StringIO(), stderr=err,
+        )
+        return err.getvalue()
+
+    def test_results_cover_every_stage_and_level(self):
+        output = self.dir / 'run.json'
+        self.benchmark('--output', str(output))
+        results = json.loads(output.read_text())
+
+        self.assertEqual(set(results['stages']), {
+            'fetch', 'read', 'preprocess', 'cnn', 'xgboost', 'db_write', 'verify_path', 'verify_url', 'verify_cached',
+        })
+        self.assertTrue(all(stats['n'] == 2 for stats in results['stages'].values()))
+        self.assertEqual(set(results['end_to_end']), {'cold_c1', 'cached_c1', 'cold_c2', 'cached_c2'})
+        self.assertTrue(all(run['errors'] == 0 for run in results['end_to_end'].values()))
+        self.assertEqual(results['params']['model_version'], self.verifier.model_version)
+        self.assertIn('python', results['environment'])
+        # The timed DB write was rolled back
+        self.assertFalse(Project.objects.exists())
+
+    def test_comparison_against_a_baseline(self):
+        baseline = self.dir / 'baseline.json'
+        slow = {"stages": {name: {"p50_ms": 1e9} for name in ('read', 'cnn')}}
+        baseline.write_text(json.dumps(slow))
+        self.assertIn("No regressions.", self.benchmark('--skip-e2e', '--compare', str(baseline)))
+
+        fast = {"stages": {name: {"p50_ms": 1e-9} for name in ('read', 'cnn')}}
+        baseline.write_text(json.dumps(fast))
+        with self.assertRaisesMessage(CommandError, "stage.read, stage.cnn"):
+            self.benchmark('--skip-e2e', '--compare', str(baseline))
+
+    def test_bad_concurrency(self):
+        with self.assertRaises(CommandError):
+            self.benchmark('--concurrency', 'many')
@@ -0,0 +1,86 @@
+import json
+import time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from verifier.bulk import resolve_items, stream_bulk_verification
+from verifier.models import Project, VerificationRecord
+
+from .utils import fake_verifier, temp_dir, write_scene
+
+
+class BulkVerificationTests(TestCase):
+    def setUp(self):
+        self.verifier = fake_verifier(self)
+        self.media = temp_dir(self)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media))
+        (self.media / 'projects').mkdir()
+        self.projects = []
+        for i in range(5):
+            name = f'projects/forest{i}_2025-0{i + 1}-01.tif'
+            write_scene(self.media / name, size=64, seed=i)
+            self.projects.append(Project.objects.create(
+                name=f"Forest {i}", latitude=-1.25, longitude=36.83, tiff_file=name,
+            ))
+
+    def lines(self, response):
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_results_stream_and_projects_are_updated(self):
+        bare = Project.objects.create(name="No scene", latitude=0, longitude=0)
+        response = self.client.post(reverse('verify-bulk'), {
+            'project_ids': [self.projects[0].pk, bare.pk, 999],
+        }, content_type='application/json')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        *results, summary = self.lines(response)
+
+        results = {r['index']: r for r in results}
+        self.assertEqual(results[0]['status'], 'success')
+        self.assertIsNone(results[0]['source'])  # no server paths
+        self.assertEqual(results[1]['message'], "Project has no stored raster; pass an image_url")
+        self.assertEqual(results[2]['message'], "Project not found")
+        self.assertEqual(summary['summary'], {"total": 3, "succeeded": 1, "failed": 2, "projects_updated": 1})
+
+        self.projects[0].refresh_from_db()
+        self.assertEqual(self.projects[0].cached_flux, results[0]['carbon_flux'])
+        record = VerificationRecord.objects.get(project=self.projects[0])
+        self.assertEqual(record.acquired_on.isoformat(), '2025-01-01')
+
+    def test_invalid_requests(self):
+        url = reverse('verify-bulk')
+        self.assertEqual(self.client.post(url, {}, content_type='application/json').status_code, 400)
+        with override_settings(VUNA_BULK_MAX_ITEMS=2):
+            response = self.client.post(url, {'project_ids': [1, 2, 3]}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(VUNA_BULK_FLUSH_SIZE=2, VUNA_BULK_CONCURRENCY=1)
+    def test_results_are_written_in_batches_as_they_arrive(self):
+        stream = stream_bulk_verification(resolve_items([p.pk for p in self.projects]))
+        for _ in range(2):
+            next(stream)
+        self.assertEqual(Project.objects.filter(cached_flux__isnull=False).count(), 2)
+        summary = [json.loads(line) for line in stream][-1]
+        self.assertEqual(summary['summary']['projects_updated'], 5)
+        self.assertEqual(Project.objects.filter(cached_flux__isnull=False).count(), 5)
+
+    @override_settings(VUNA_BULK_FLUSH_SIZE=50, VUNA_BULK_CONCURRENCY=1)
+    def test_disconnect_keeps_finished_results_and_cancels_the_rest(self):
+        calls = []
+        verify_scene = self.verifier.verify_scene
+
+        def slow(*args, **kwargs):
+            calls.append(args[0])
+            time.sleep(0.05)
+            return verify_scene(*args, **kwargs)
+
+        with mock.patch.object(self.verifier, 'verify_scene', side_effect=slow):
+            stream = stream_bulk_verification(resolve_items([p.pk for p in self.projects]))
+            next(stream)
+            next(stream)
+            stream.close()
+            time.sleep(0.2)
+        self.assertEqual(Project.objects.filter(cached_flux__isnull=False).count(), 2)
+        self.assertEqual(VerificationRecord.objects.count(), 2)
+        self.assertLess(len(calls), 5)
@@ -0,0 +1,83 @@
+import io
+import shutil
+
+from django.test import SimpleTestCase
+
+from verifier.cache import PredictionCache, content_hash
+
+from .utils import FakeEngine, fake_verifier, temp_dir, write_scene
+
+
+class PredictionCacheTests(SimpleTestCase):
+    def test_memory_hits_misses_and_lru_eviction(self):
+        cache = PredictionCache(max_entries=2)
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', {'carbon_flux': 0.1})
+        cache.set('b', {'carbon_flux': 0.2})
+        self.assertEqual(cache.get('a'), {'carbon_flux': 0.1})
+        cache.set('c', {'carbon_flux': 0.3})  # evicts b, the least recently used
+
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        stats = cache.stats()
+        self.assertEqual((stats['entries'], stats['evictions']), (2, 1))
+        self.assertEqual((stats['memory_hits'], stats['misses']), (2, 2))
+
+    def test_callers_get_copies(self):
+        cache = PredictionCache()
+        cache.set('a', {'carbon_flux': 0.1})
+        cache.get('a')['project_id'] = 7
+        self.assertEqual(cache.get('a'), {'carbon_flux': 0.1})
+
+    def test_disk_tier_survives_a_new_instance(self):
+        disk_dir = temp_dir(self)
+        PredictionCache(max_entries=0, disk_dir=disk_dir).set('a', {'carbon_flux': 0.1})
+        cache = PredictionCache(disk_dir=disk_dir)
+        self.assertEqual(cache.get('a'), {'carbon_flux': 0.1})
+        self.assertEqual(cache.get('a'), {'carbon_flux': 0.1})
+        stats = cache.stats()
+        self.assertEqual((stats['disk_hits'], stats['memory_hits']), (1, 1))
+
+    def test_content_hash_is_the_same_for_path_bytes_and_file(self):
+        path = write_scene(temp_dir(self) / 'scene.tif', size=32)
+        with open(path, 'rb') as f:
+            data = f.read()
+        upload = io.BytesIO(data)
+        upload.seek(10)
+        self.assertEqual(content_hash(path), content_hash(data))
+        self.assertEqual(content_hash(path), content_hash(upload))
+        self.assertEqual(upload.tell(), 10)
+
+
+class VerificationCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.engine = FakeEngine()
+        self.verifier = fake_verifier(self, self.engine)
+        self.scenes = temp_dir(self)
+        self.path = write_scene(self.scenes / 'scene.tif', size=64)
+
+    def test_same_content_is_served_from_the_cache(self):
+        first = self.verifier.verify(self.path)
+        self.assertEqual(first['status'], 'success')
+        calls = len(self.engine.batches)
+
+        # Another name, same bytes
+        copy = shutil.copy(self.path, self.scenes / 'copy.tif')
+        with open(copy, 'rb') as f:
+            data = f.read()
+        self.assertEqual(self.verifier.verify(copy), first)
+        self.assertEqual(self.verifier.verify(data), first)
+        self.assertEqual(len(self.engine.batches), calls)
+        self.assertEqual(self.verifier.cache.stats()['memory_hits'], 2)
+
+        # Other bytes are computed
+        other = write_scene(self.scenes / 'other.tif', size=64, seed=1)
+        self.assertNotEqual(self.verifier.verify(other)['carbon_flux'], first['carbon_flux'])
+        self.assertEqual(len(self.engine.batches), calls + 1)
+
+    def test_results_are_keyed_on_the_model_version(self):
+        self.verifier.verify(self.path)
+        key = self.verifier.cache_key(content_hash(self.path))
+        self.assertIsNotNone(self.verifier.cache.get(key))
+        self.assertIn(self.verifier.model_version, key)
+        self.assertIsNone(self.verifier.cache.get(key.replace(self.verifier.model_version, 'other-model')))
@@ -0,0 +1,229 @@
+import datetime
+import io
+import os
+import shutil
+from unittest import mock
+
+import numpy as np
+import rasterio
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from verifier import cog
+from verifier.cache import content_hash
+from verifier.cog import ConversionError, companion_path, ingest, is_cog, model_source
+from verifier.models import Project, StoredRaster, VerificationRecord
+from verifier.raster import MODEL_BANDS, NODATA_VALUE
+from verifier.uploads import ingest_stored_raster
+
+from .utils import fake_verifier, scene_array, temp_dir, write_scene
+
+
+def band_mean(path, bands):
+    with rasterio.open(path) as src:
+        return float(src.read(list(bands)).mean())
+
+
+class IngestTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = temp_dir(self)
+        data = scene_array(512)
+        # A nodata corner, as at the edge of a swath
+        data[:, :64, :64] = NODATA_VALUE
+        self.data = data
+        self.path = write_scene(self.dir / 'scene.tif', data=data)
+
+    def test_a_conversion_keeps_every_pixel(self):
+        original_hash = content_hash(self.path)
+        report = ingest(self.path, block_size=256)
+
+        self.assertTrue(is_cog(self.path))
+        self.assertNotEqual(content_hash(self.path), original_hash)
+        with rasterio.open(self.path) as src:
+            self.assertTrue(np.array_equal(src.read(), self.data))
+            self.assertEqual(src.block_shapes[0], (256, 256))
+            self.assertTrue(src.overviews(1))
+        self.assertEqual(report['stored_bytes'], os.path.getsize(self.path))
+        self.assertEqual(sorted(os.listdir(self.dir)), ['scene.model.tif', 'scene.tif'])
+
+        # Statistics of the original, nodata excluded
+        self.assertEqual(len(report['band_stats']), 13)
+        first = report['band_stats'][0]
+        valid = self.data[0][self.data[0] != NODATA_VALUE]
+        self.assertEqual((first['valid_pixels'], first['nodata_pixels']), (valid.size, 64 * 64))
+        self.assertAlmostEqual(first['mean'], float(valid.mean()), places=4)
+        self.assertAlmostEqual(first['max'], float(valid.max()), places=5)
+
+        # What the model sees barely moves, whichever file serves it
+        for parity in (report['parity'], report['companion_parity']):
+            self.assertLessEqual(parity['mean_abs_diff'], 0.005)
+
+    def test_a_nan_nodata_raster_converts(self):
+        data = scene_array(512)
+        data[:, :64, :64] = np.nan
+        path = write_scene(self.dir / 'nan.tif', data=data, nodata=float('nan'))
+        report = ingest(path, block_size=256, companion=False)
+
+        self.assertTrue(is_cog(path))
+        with rasterio.open(path) as src:
+            self.assertTrue(np.isnan(src.nodata))
+            self.assertTrue(np.array_equal(src.read(), data, equal_nan=True))
+        first = report['band_stats'][0]
+        self.assertEqual((first['valid_pixels'], first['nodata_pixels']), (512 * 512 - 64 * 64, 64 * 64))
+        self.assertAlmostEqual(first['mean'], float(np.nanmean(data[0])), places=4)
+
+    def test_the_companion_serves_the_model_bands(self):
+        ingest(self.path, block_size=256)
+        companion = companion_path(self.path)
+        self.assertEqual(companion, str(self.dir / 'scene.model.tif'))
+        with rasterio.open(companion) as src:
+            self.assertEqual(src.count, 3)
+            self.assertTrue(np.array_equal(src.read(), self.data[[b - 1 for b in MODEL_BANDS]]))
+        self.assertEqual(model_source(self.path), (companion, (1, 2, 3)))
+
+        # A raster rewritten after its companion no longer trusts it
+        stat = os.stat(companion)
+        os.utime(self.path, (stat.st_atime, stat.st_mtime + 10))
+        self.assertEqual(model_source(self.path), (self.path, MODEL_BANDS))
+        os.remove(companion)
+        self.assertEqual(model_source(self.path), (self.path, MODEL_BANDS))
+
+    def test_failed_checks_leave_the_original(self):
+        original_hash = content_hash(self.path)
+        convert = cog.convert_to_cog
+
+        def corrupting(path, output, **options):
+            convert(path, output, **options)
+            with rasterio.open(output, 'r+', IGNORE_COG_LAYOUT_BREAK='YES') as dst:
+                band = dst.read(1)
+                band[300, 300] += 1
+                dst.write(band, 1)
+
+        for kwargs, message in (
+            ({'parity_tolerance': -1}, "model input differs"),
+            ({'score': lambda path, bands: band_mean(path, bands) * (2 if path != self.path else 1)},
+             "carbon_flux differs"),
+        ):
+            with self.assertRaisesMessage(ConversionError, message):
+                ingest(self.path, block_size=256, **kwargs)
+        with mock.patch.object(cog, 'convert_to_cog', corrupting):
+            with self.assertRaisesMessage(ConversionError, "Pixels differ"):
+                ingest(self.path, block_size=256, companion=False)
+        with self.assertRaises(ConversionError):
+            ingest(self.dir / 'missing.tif')
+
+        self.assertEqual(content_hash(self.path), original_hash)
+        self.assertEqual(os.listdir(self.dir), ['scene.tif'])
+
+    def test_the_flux_check(self):
+        verifier = fake_verifier(self, VUNA_BATCHING_ENABLED=False)
+        report = ingest(self.path, block_size=256, score=verifier.score_path)
+        self.assertLessEqual(report['parity']['flux_diff'], 0.005)
+        self.assertLessEqual(report['companion_parity']['flux_diff'], 0.005)
+
+
+@override_settings(VUNA_COG_BLOCK_SIZE=256)
+class StoredRasterTests(TestCase):
+    def setUp(self):
+        self.media = temp_dir(self)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media))
+        (self.media / 'projects').mkdir()
+        self.projects = []
+        for i in range(2):
+            name = f'projects/forest{i}.tif'
+            write_scene(self.media / name, size=512, seed=i)
+            self.projects.append(Project.objects.create(
+                name=f"Forest {i}", latitude=-1.24, longitude=36.83, tiff_file=name,
+            ))
+
+    def convert(self, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('convert_stored_rasters', *args, stdout=out, stderr=err)
+        return out.getvalue() + err.getvalue()
+
+    def test_ingest_records_the_raster_and_keeps_the_history(self):
+        project = self.projects[0]
+        path = project.tiff_file.path
+        original_key, original_bytes = content_hash(path), os.path.getsize(path)
+        VerificationRecord.objects.create(
+            project=project, raster_key=original_key, acquired_on=datetime.date(2025, 1, 1), source=path,
+            model_version='test', carbon_flux=0.05, annual_tonnes_co2=5.0, estimated_revenue_usd=100.0,
+        )
+
+        stored = ingest_stored_raster(project.tiff_file.name)
+        self.assertEqual((stored.source_key, stored.original_bytes), (original_key, original_bytes))
+        self.assertEqual(stored.content_key, content_hash(path))
+        self.assertTrue(stored.has_companion)
+        self.assertEqual(len(stored.band_stats), 13)
+        self.assertEqual(set(stored.parity), {'cog', 'companion'})
+        self.assertEqual(VerificationRecord.objects.get().raster_key, stored.content_key)
+
+        # Already ingested as it is: skipped, unless forced
+        self.assertIsNone(ingest_stored_raster(project.tiff_file.name))
+        again = ingest_stored_raster(project.tiff_file.name, force=True, companion=False)
+        self.assertEqual((again.pk, again.source_key, again.original_bytes), (stored.pk, original_key, original_bytes))
+        self.assertFalse(again.has_companion)
+
+    def test_verification_reads_the_companion(self):
+        verifier = fake_verifier(self, VUNA_BATCHING_ENABLED=False)
+        path = self.projects[0].tiff_file.path
+        reference = verifier.verify(shutil.copy(path, self.media / 'reference.tif'))
+        ingest_stored_raster(self.projects[0].tiff_file.name)
+
+        sources = []
+
+        def spy(path):
+            sources.append(model_source(path))
+            return sources[-1]
+
+        with mock.patch('verifier.services.model_source', spy):
+            result = verifier.verify(path)
+        self.assertEqual(sources, [(companion_path(path), (1, 2, 3))])
+        self.assertAlmostEqual(result['carbon_flux'], reference['carbon_flux'], delta=0.005)
+
+    def test_the_command(self):
+        self.projects.append(Project.objects.create(
+            name="Gone", latitude=-1.24, longitude=36.83, tiff_file='projects/gone.tif',
+        ))
+        (self.media / 'projects' / 'broken.tif').write_bytes(b'not a tiff')
+        self.projects.append(Project.objects.create(
+            name="Broken", latitude=-1.24, longitude=36.83, tiff_file='projects/broken.tif',
+        ))
+
+        output = self.convert('--dry-run')
+        self.assertIn("3 rasters to convert", output)
+        self.assertIn("Missing: projects/gone.tif", output)
+        self.assertFalse(StoredRaster.objects.exists())
+
+        output = self.convert('--no-companion')
+        self.assertIn("Converted 2 rasters", output)
+        self.assertIn("skipped 0, failed 1", output)
+        self.assertIn("projects/broken.tif: ", output)
+        self.assertEqual(sorted(StoredRaster.objects.values_list('name', 'has_companion')), [
+            ('projects/forest0.tif', False), ('projects/forest1.tif', False),
+        ])
+        self.assertFalse(os.path.exists(companion_path(self.projects[0].tiff_file.path)))
+
+        self.assertIn("1 rasters to convert", self.convert('--dry-run'))
+        fake_verifier(self, VUNA_BATCHING_ENABLED=False)
+        output = self.convert('--force', '--check-flux')
+        self.assertIn("Converted 2 rasters", output)
+        self.assertTrue(all(r.parity['cog']['flux_diff'] <= 0.005 for r in StoredRaster.objects.all()))
+
+    def test_rescoring_finds_the_embedding_of_the_upload(self):
+        verifier = fake_verifier(self, VUNA_BATCHING_ENABLED=False)
+        for project in self.projects:
+            project.record_verification(verifier.verify(project.tiff_file.path))
+        for project in self.projects:
+            ingest_stored_raster(project.tiff_file.name)
+        embedded = len(verifier.engine.batches)
+
+        out = io.StringIO()
+        call_command('rescore_projects', stdout=out)
+        self.assertIn("Updated 2 projects", out.getvalue())
+        self.assertNotIn("no stored embedding", out.getvalue())
+        self.assertEqual(len(verifier.engine.batches), embedded)
+
+        # The vector now also sits under the converted file's hash
+        path = self.projects[0].tiff_file.path
+        self.assertIn(verifier.embedding_key(content_hash(path)), verifier.embeddings)
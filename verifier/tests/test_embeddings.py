@@ -0,0 +1,121 @@
+import io
+from unittest import mock
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from verifier.embeddings import EmbeddingStore
+from verifier.models import Project
+
+from .utils import fake_verifier, temp_dir, write_scene
+
+
+def vector(seed, dim=8):
+    return np.random.default_rng(seed).normal(size=dim).astype(np.float32)
+
+
+class EmbeddingStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = temp_dir(self)
+
+    def test_vectors_round_trip_and_persist(self):
+        store = EmbeddingStore(self.dir, dim=8)
+        store.put('a', vector(0))
+        store.put('b', vector(1))
+        store.put('a', vector(2))  # first write wins
+        self.assertTrue(np.array_equal(store.get('a'), vector(0)))
+        self.assertIsNone(store.get('c'))
+        self.assertEqual(len(store), 2)
+        with self.assertRaises(ValueError):
+            store.put('d', np.zeros(7))
+
+        reopened = EmbeddingStore(self.dir, dim=8)
+        keys, matrix = reopened.matrix()
+        self.assertEqual(keys, ['a', 'b'])
+        self.assertEqual(matrix.dtype, np.float32)
+        self.assertTrue(np.array_equal(matrix, np.stack([vector(0), vector(1)])))
+        keys, matrix = reopened.matrix(['b', 'missing', 'a'])
+        self.assertEqual(keys, ['b', 'a'])
+        self.assertTrue(np.array_equal(matrix[0], vector(1)))
+
+        stats = store.stats()
+        self.assertEqual((stats['entries'], stats['bytes'], stats['hits'], stats['misses'], stats['writes']),
+                         (2, 64, 1, 1, 2))
+
+    def test_stores_sharing_a_directory_see_each_others_rows(self):
+        first, second = EmbeddingStore(self.dir, dim=8), EmbeddingStore(self.dir, dim=8)
+        first.put('a', vector(0))
+        second.put('a', vector(5))
+        second.put('b', vector(1))
+        self.assertTrue(np.array_equal(first.get('b'), vector(1)))
+        self.assertTrue(np.array_equal(second.get('a'), vector(0)))
+        self.assertEqual(len(first), 2)
+
+    def test_torn_writes_are_ignored_and_repaired(self):
+        store = EmbeddingStore(self.dir, dim=8)
+        store.put('a', vector(0))
+        # A writer that died after its row, and one mid-way through its key
+        with open(store.vectors_path, 'ab') as f:
+            f.write(vector(9).tobytes())
+        with open(store.keys_path, 'a') as f:
+            f.write('parti')
+
+        reopened = EmbeddingStore(self.dir, dim=8)
+        self.assertEqual(len(reopened), 1)
+        self.assertIsNone(reopened.get('parti'))
+        # Once the partial key is gone, the next append overwrites the orphaned row
+        with open(store.keys_path, 'r+') as f:
+            f.truncate(len('a\n'))
+        reopened.put('b', vector(1))
+        self.assertTrue(np.array_equal(EmbeddingStore(self.dir, dim=8).get('b'), vector(1)))
+
+
+class EmbeddingReuseTests(TestCase):
+    def setUp(self):
+        self.verifier = fake_verifier(self)
+        self.engine = self.verifier.engine
+        self.media = temp_dir(self)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media))
+        (self.media / 'projects').mkdir()
+
+    def test_a_cache_miss_reuses_the_stored_embedding(self):
+        path = write_scene(self.media / 'a.tif', size=64)
+        first = self.verifier.verify(path)
+        self.assertEqual(len(self.engine.batches), 1)
+        self.assertEqual(len(self.verifier.embeddings), 1)
+
+        # Say the result cache lost it, or was keyed for another model
+        with mock.patch.object(self.verifier.cache, 'get', return_value=None):
+            self.assertEqual(self.verifier.verify(path), first)
+        self.assertEqual(len(self.engine.batches), 1)
+        self.assertEqual(self.verifier.embeddings.stats()['hits'], 1)
+
+    def test_rescore_projects_applies_a_new_model_without_the_cnn(self):
+        projects = []
+        for i in range(3):
+            name = f'projects/forest{i}.tif'
+            write_scene(self.media / name, size=64, seed=i)
+            projects.append(Project.objects.create(name=f"Forest {i}", latitude=-1.2, longitude=36.8, tiff_file=name))
+        for project in projects[:2]:
+            project.record_verification(self.verifier.verify(project.tiff_file.path))
+        embedded = len(self.engine.batches)
+
+        # A new XGBoost model: twice the flux (before rounding)
+        score = self.engine.score
+        with mock.patch.object(self.engine, 'score', side_effect=lambda f: 2 * score(f)):
+            out = io.StringIO()
+            call_command('rescore_projects', stdout=out)
+        self.assertEqual(len(self.engine.batches), embedded)
+        self.assertIn("Updated 2 projects", out.getvalue())
+        self.assertIn("1 projects have no stored embedding", out.getvalue())
+
+        for project in projects:
+            before = project.cached_flux
+            project.refresh_from_db()
+            if before is None:
+                self.assertIsNone(project.cached_flux)
+            else:
+                self.assertAlmostEqual(project.cached_flux, 2 * before, places=3)
+        # And a fresh verification of the scene answers the new figure from the cache
+        self.assertEqual(self.verifier.verify(projects[0].tiff_file.path)['carbon_flux'], projects[0].cached_flux)
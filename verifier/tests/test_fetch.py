@@ -0,0 +1,179 @@
+import os
+import re
+import socket
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import rasterio
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from verifier import fetch
+from verifier.cache import content_hash
+from verifier.fetch import RemoteFetcher
+
+from .test_metrics import samples
+from .utils import fake_verifier, temp_dir, write_scene
+
+
+class RasterHandler(BaseHTTPRequestHandler):
+    """
+    Serves files from `root` with an ETag, honouring byte ranges (unless
+    the path contains "norange") and If-None-Match; 404 for missing files.
+    Counts the requests.
+    """
+    root = None
+    requests = Counter()
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.respond(body=False)
+
+    def do_GET(self):
+        self.respond(body=True)
+
+    def respond(self, body):
+        self.requests[self.command, self.path] += 1
+        try:
+            with open(os.path.join(self.root, self.path.lstrip('/')), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            self.send_error(404)
+            return
+        etag = f'"{content_hash(data)[:16]}"'
+        ranges = 'norange' not in self.path
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if ranges and match and self.command == 'GET':
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(data) - 1
+            chunk = data[start:end + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{start + len(chunk) - 1}/{len(data)}')
+        else:
+            chunk = data
+            self.send_response(200)
+        if ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(chunk)))
+        self.end_headers()
+        if body:
+            self.wfile.write(chunk)
+
+
+class RemoteFetcherTests(SimpleTestCase):
+    def setUp(self):
+        self.www = temp_dir(self)
+        handler = type('Handler', (RasterHandler,), {'root': str(self.www), 'requests': Counter()})
+        self.requests = handler.requests
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.base = f"http://127.0.0.1:{server.server_port}"
+        self.cache_dir = temp_dir(self)
+
+    def fetcher(self, **options):
+        return RemoteFetcher(self.cache_dir, **options)
+
+    def test_downloads_are_cached_and_revalidated(self):
+        path = write_scene(self.www / 'norange.tif', size=64)
+        url = f"{self.base}/norange.tif"
+        fetcher = self.fetcher(fresh_seconds=300)
+
+        first = fetcher.fetch(url)
+        self.assertFalse(first.ranged)
+        self.assertEqual(first.content_key, content_hash(path))
+        self.assertEqual(content_hash(first.path), content_hash(path))
+        self.assertEqual(fetcher.fetch(url).path, first.path)
+        self.assertEqual(self.requests['GET', '/norange.tif'], 1)
+
+        fetcher.fresh_seconds = 0
+        again = fetcher.fetch(url)
+        self.assertEqual(again.content_key, first.content_key)
+        stats = fetcher.stats()
+        self.assertEqual((stats['downloads'], stats['fresh_hits'], stats['revalidated']), (1, 1, 1))
+
+        # Changed on the server: downloaded afresh
+        write_scene(self.www / 'norange.tif', size=64, seed=1)
+        self.assertNotEqual(fetcher.fetch(url).content_key, first.content_key)
+        self.assertEqual(fetcher.stats()['downloads'], 2)
+
+    def test_cache_is_size_bounded(self):
+        for i in range(3):
+            write_scene(self.www / f'norange{i}.tif', size=64, seed=i)
+        size = os.path.getsize(self.www / 'norange0.tif')
+        fetcher = self.fetcher(max_cache_bytes=int(size * 2.5))
+        fetched = [fetcher.fetch(f"{self.base}/norange{i}.tif") for i in range(3)]
+        self.assertFalse(os.path.exists(fetched[0].path))
+        self.assertTrue(os.path.exists(fetched[2].path))
+        self.assertEqual(fetcher.stats()['evictions'], 1)
+        self.assertLessEqual(fetcher.stats()['cache_bytes'], size * 2.5)
+
+    def test_tiled_rasters_are_range_read_in_place(self):
+        write_scene(self.www / 'cog.tif', size=512, tiled=True, blockxsize=256, blockysize=256)
+        url = f"{self.base}/cog.tif"
+        fetcher = self.fetcher(fresh_seconds=300)
+
+        fetched = fetcher.fetch(url)
+        self.assertTrue(fetched.ranged)
+        self.assertEqual(fetched.path, f"/vsicurl/{url}")
+        self.assertEqual(os.listdir(self.cache_dir), [])
+        with rasterio.open(fetched.path) as src:
+            self.assertEqual(src.count, 13)
+
+        # Remembered per URL: no HEAD while fresh, then one HEAD and no reopening
+        heads = self.requests['HEAD', '/cog.tif']
+        self.assertEqual(fetcher.fetch(url).content_key, fetched.content_key)
+        self.assertEqual(self.requests['HEAD', '/cog.tif'], heads)
+        fetcher.fresh_seconds = 0
+        self.assertEqual(fetcher.fetch(url).content_key, fetched.content_key)
+        self.assertEqual(self.requests['HEAD', '/cog.tif'], heads + 1)
+        stats = fetcher.stats()
+        self.assertEqual((stats['probes'], stats['probe_hits'], stats['range_reads']), (1, 2, 3))
+
+    def test_striped_rasters_are_downloaded(self):
+        write_scene(self.www / 'striped.tif', size=64)
+        fetcher = self.fetcher()
+        self.assertFalse(fetcher.fetch(f"{self.base}/striped.tif").ranged)
+        self.assertFalse(fetcher.fetch(f"{self.base}/striped.tif").ranged)
+        self.assertEqual(fetcher.stats()['probes'], 1)
+
+    def test_verifying_a_url_shares_results_with_the_same_bytes(self):
+        verifier = fake_verifier(self)
+        path = write_scene(self.www / 'norange.tif', size=64)
+        # A fetcher of its own, downloading into this test's cache
+        self.enterContext(mock.patch.object(fetch, '_fetcher', None))
+        self.enterContext(self.settings(VUNA_CACHE_DIR=self.cache_dir))
+
+        remote = verifier.verify(f"{self.base}/norange.tif")
+        self.assertEqual(remote['status'], 'success')
+        self.assertEqual(verifier.verify(path), remote)
+        self.assertEqual(verifier.cache.stats()['memory_hits'], 1)
+
+    def test_failed_fetches_are_errors_not_exceptions(self):
+        verifier = fake_verifier(self)
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            closed = f"http://127.0.0.1:{sock.getsockname()[1]}/scene.tif"
+        errors = 'vuna_stage_errors_total{stage="fetch",'
+        before = sum(v for k, v in samples().items() if k.startswith(errors))
+
+        for url in (f"{self.base}/missing.tif", closed):
+            result = verifier.verify(url)
+            self.assertEqual(result['status'], 'error')
+            self.assertIn("Could not fetch the image", result['message'])
+        self.assertIn("404", verifier.verify(f"{self.base}/missing.tif")['message'])
+        self.assertEqual(sum(v for k, v in samples().items() if k.startswith(errors)), before + 3)
+
+        response = self.client.post(reverse('verify-credit'), {'image_url': f"{self.base}/missing.tif"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['status'], 'error')
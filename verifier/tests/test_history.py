@@ -0,0 +1,127 @@
+import datetime
+import io
+
+import rasterio
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from verifier.economics import DEFAULT_PRICING
+from verifier.models import Project, VerificationRecord
+from verifier.raster import acquisition_date
+
+from .utils import fake_verifier, temp_dir, write_scene
+
+
+class AcquisitionDateTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = temp_dir(self)
+
+    def test_acquisition_date_from_tags_then_name(self):
+        tagged = write_scene(self.dir / 'tagged.tif', size=16, date=datetime.date(2024, 6, 1))
+        named = write_scene(self.dir / 'S2A_MSIL2A_20230115T083211.tif', size=16)
+        with rasterio.open(tagged) as src:
+            self.assertEqual(acquisition_date(src, 'upload_2020-01-01.tif'), datetime.date(2024, 6, 1))
+        with rasterio.open(named) as src:
+            self.assertEqual(acquisition_date(src), datetime.date(2023, 1, 15))
+            self.assertEqual(acquisition_date(src, 'karura_2025-02-03.tif'), datetime.date(2025, 2, 3))
+
+    def test_no_date_and_impossible_dates(self):
+        path = write_scene(self.dir / 'scene_20231399.tif', size=16)
+        with rasterio.open(path) as src:
+            self.assertIsNone(acquisition_date(src))
+            self.assertIsNone(acquisition_date(src, 'upload.tif'))
+
+
+class HistorySeriesTests(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(name="Karura", latitude=-1.24, longitude=36.83)
+        scenes = [
+            ('2024-01-05', 0.04), ('2024-01-20', 0.06), ('2024-03-02', 0.05), ('2025-02-10', 0.08),
+        ]
+        for i, (day, flux) in enumerate(scenes):
+            tonnes, usd = DEFAULT_PRICING.economics(flux)
+            VerificationRecord.objects.create(
+                project=self.project, raster_key=f"k{i}", acquired_on=datetime.date.fromisoformat(day),
+                source=f"scene{i}.tif", model_version='test', carbon_flux=flux,
+                annual_tonnes_co2=tonnes, estimated_revenue_usd=usd,
+            )
+        self.url = reverse('project-history', args=[self.project.pk])
+
+    def test_monthly_and_yearly_series(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual((data['scenes'], data['first'], data['last']), (4, '2024-01-05', '2025-02-10'))
+        self.assertEqual(data['pricing'], DEFAULT_PRICING.version)
+        self.assertEqual([m['period'] for m in data['monthly']], ['2024-01', '2024-03', '2025-02'])
+        january = data['monthly'][0]
+        self.assertEqual((january['scenes'], january['first'], january['last']), (2, '2024-01-05', '2024-01-20'))
+        self.assertEqual(january['carbon_flux'], 0.05)
+        self.assertEqual(january['estimated_revenue_usd'], round(DEFAULT_PRICING.economics(0.05)[1], 2))
+        self.assertEqual([(y['period'], y['scenes']) for y in data['yearly']], [('2024', 3), ('2025', 1)])
+
+    def test_date_range_and_pricing_scenarios(self):
+        data = self.client.get(self.url, {'start': '2024-01-10', 'end': '2024-12-31', 'carbon_price': 40}).json()
+        self.assertEqual(data['scenes'], 2)
+        self.assertEqual(data['pricing'], f"{DEFAULT_PRICING.version}@40")
+        self.assertEqual(data['monthly'][0]['estimated_revenue_usd'], round(2 * DEFAULT_PRICING.economics(0.06)[1], 2))
+
+    def test_errors(self):
+        self.assertEqual(self.client.get(reverse('project-history', args=[999])).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'start': '2024-13-01'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'pricing': 'unknown'}).status_code, 400)
+        empty = self.client.get(self.url, {'start': '2030-01-01'}).json()
+        self.assertEqual((empty['scenes'], empty['first'], empty['monthly']), (0, None, []))
+
+
+class VerifyHistoryCommandTests(TestCase):
+    def setUp(self):
+        self.verifier = fake_verifier(self)
+        self.dir = temp_dir(self)
+        self.project = Project.objects.create(name="Karura", latitude=-1.24, longitude=36.83)
+        self.scenes = [
+            write_scene(self.dir / f'karura_2024-0{month}-01.tif', size=32, seed=month) for month in (1, 2, 3)
+        ]
+
+    def run_command(self, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('verify_history', *args, stdout=out, stderr=err)
+        return out.getvalue() + err.getvalue()
+
+    def test_only_new_scenes_are_verified(self):
+        output = self.run_command('--project', str(self.project.pk), *self.scenes[:2])
+        self.assertIn("2 verified, 0 already in the history", output)
+        output = self.run_command('--project', str(self.project.pk), *self.scenes)
+        self.assertIn("1 verified, 2 already in the history", output)
+        self.assertEqual(
+            sorted(VerificationRecord.objects.values_list('acquired_on', flat=True)),
+            [datetime.date(2024, month, 1) for month in (1, 2, 3)],
+        )
+
+        # --full re-verifies and replaces rather than duplicating
+        output = self.run_command('--project', str(self.project.pk), '--full', *self.scenes)
+        self.assertIn("3 verified", output)
+        self.assertEqual(VerificationRecord.objects.count(), 3)
+        monthly = self.client.get(reverse('project-history', args=[self.project.pk])).json()['monthly']
+        self.assertEqual([m['period'] for m in monthly], ['2024-01', '2024-02', '2024-03'])
+
+    def test_manifest_dates_override_the_scene(self):
+        manifest = self.dir / 'scenes.csv'
+        manifest.write_text(
+            "project_id,source,acquired_on\n"
+            f"{self.project.pk},{self.scenes[0]},2020-06-30\n"
+            f"{self.project.pk},{self.dir / 'missing.tif'},\n"
+        )
+        output = self.run_command('--manifest', str(manifest))
+        self.assertIn("1 verified, 0 already in the history, 1 failed", output)
+        self.assertEqual(VerificationRecord.objects.get().acquired_on, datetime.date(2020, 6, 30))
+
+    def test_invalid_input(self):
+        with self.assertRaisesMessage(CommandError, "Unknown project ids: 999"):
+            self.run_command('--project', '999', self.scenes[0])
+        with self.assertRaisesMessage(CommandError, "need --project"):
+            self.run_command(self.scenes[0])
+        manifest = self.dir / 'bad.csv'
+        manifest.write_text(f"project_id,source,acquired_on\n{self.project.pk},{self.scenes[0]},June\n")
+        with self.assertRaisesMessage(CommandError, "line 2"):
+            self.run_command('--manifest', str(manifest))
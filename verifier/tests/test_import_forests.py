@@ -0,0 +1,124 @@
+import io
+import json
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from verifier.geometry import iter_geojson_features, polygon_centroid
+from verifier.models import Project
+from verifier.summary import rebuild_summary
+
+from .test_spatial import square
+from .test_summary import buckets
+
+from .utils import KARURA, temp_dir
+
+
+def feature(name, geometry, category='Gazetted'):
+    return {"type": "Feature", "properties": {"FOREST": name, "GAZETTED": category}, "geometry": geometry}
+
+
+def write_collection(path, features):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"type": "FeatureCollection", "name": "forests", "features": features}, f, indent=1)
+    return str(path)
+
+
+class GeoJSONStreamingTests(SimpleTestCase):
+    def test_features_stream_across_chunk_boundaries(self):
+        features = [feature(f"Forest {i}", square(36 + i, -1, 0.1 * (i + 1))) for i in range(20)]
+        features.append(feature('Quote "and" ] brace }', KARURA))
+        path = write_collection(temp_dir(self) / 'f.geojson', features)
+        for chunk_size in (7, 64, 1 << 20):
+            with open(path, encoding='utf-8') as f:
+                self.assertEqual(list(iter_geojson_features(f, chunk_size=chunk_size)), features)
+
+    def test_invalid_documents(self):
+        with self.assertRaises(ValueError):
+            list(iter_geojson_features(io.StringIO('{"type": "FeatureCollection"}')))
+        with self.assertRaises(ValueError):
+            list(iter_geojson_features(io.StringIO('{"features": [{"type": "Feature"}'), chunk_size=4))
+
+    def test_centroids_are_area_weighted_and_skip_holes(self):
+        x, y = polygon_centroid(square(36.0, -1.0, 0.3))
+        self.assertAlmostEqual(x, 36.15)
+        self.assertAlmostEqual(y, -0.85)
+        # 0.09 of area centred on 36.15 less a 0.01 hole centred on 36.2
+        x, y = polygon_centroid(square(36.0, -1.0, 0.3, hole=(36.15, -0.85, 0.1)))
+        self.assertAlmostEqual(x, (0.09 * 36.15 - 0.01 * 36.2) / 0.08)
+        self.assertAlmostEqual(y, (0.09 * -0.85 - 0.01 * -0.8) / 0.08)
+        multi = {"type": "MultiPolygon", "coordinates": [
+            square(0, 0, 1)["coordinates"], square(10, 0, 3)["coordinates"],
+        ]}
+        self.assertAlmostEqual(polygon_centroid(multi)[0], (0.5 * 1 + 11.5 * 9) / 10)
+
+
+class ImportForestsTests(TestCase):
+    def setUp(self):
+        self.dir = temp_dir(self)
+
+    def run_import(self, path, *args):
+        out = io.StringIO()
+        call_command('import_forests', path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_is_an_idempotent_upsert(self):
+        existing = Project.objects.create(name="Karura", latitude=0, longitude=0, cached_flux=0.05)
+        path = write_collection(self.dir / 'f.geojson', [
+            feature("KARURA", KARURA),
+            feature("NGONG ROAD", square(36.7, -1.32, 0.05), 'Community'),
+            feature("No geometry", None),
+            feature("A point", {"type": "Point", "coordinates": [36.8, -1.2]}),
+        ])
+        output = self.run_import(path, '--no-demo-results')
+        self.assertIn("4 features, 1 created, 1 updated, 2 skipped", output)
+
+        existing.refresh_from_db()
+        self.assertEqual((existing.name, existing.category, existing.cached_flux), ("Karura", 'Gazetted', 0.05))
+        self.assertAlmostEqual(existing.longitude, 36.83)
+        self.assertAlmostEqual(existing.latitude, -1.24)
+        self.assertEqual(existing.bbox_min_lon, 36.825)
+        ngong = Project.objects.get(name="Ngong Road")
+        self.assertIsNone(ngong.cached_flux)
+        self.assertEqual(ngong.category, 'Community')
+
+        before = list(Project.objects.order_by('id').values_list('id', 'name', 'geojson_boundary', 'latitude'))
+        self.assertIn("0 created, 2 updated", self.run_import(path, '--no-demo-results'))
+        after = list(Project.objects.order_by('id').values_list('id', 'name', 'geojson_boundary', 'latitude'))
+        self.assertEqual(before, after)
+
+    def test_writes_are_batched(self):
+        def query_count(count, batch_size):
+            Project.objects.all().delete()
+            path = write_collection(self.dir / f'{count}.geojson', [
+                feature(f"Forest {i}", square(36 + i * 0.01, -1, 0.005)) for i in range(count)
+            ])
+            with CaptureQueriesContext(connection) as queries:
+                self.run_import(path, '--batch-size', str(batch_size))
+            self.assertEqual(Project.objects.count(), count)
+            return len(queries)
+
+        # A handful of statements per batch, not several per feature
+        self.assertLess(query_count(200, 1000), 20)
+        self.assertLess(query_count(200, 50), 4 * 20)
+
+    def test_summary_matches_a_rebuild(self):
+        Project.objects.create(name="Karura", latitude=0, longitude=0, category='Community', cached_flux=0.05)
+        path = write_collection(self.dir / 'f.geojson', [
+            feature("KARURA", KARURA), feature("Kakamega", square(34.8, 0.2, 0.1)),
+        ] + [feature(f"Forest {i}", square(35 + i * 0.01, 0, 0.005)) for i in range(5)])
+        self.run_import(path, '--batch-size', '3')
+        incremental = buckets()
+        self.assertEqual(incremental[('total', '')][0], 7)
+        rebuild_summary()
+        self.assertEqual(incremental, buckets())
+
+    def test_unreadable_files_are_command_errors(self):
+        with self.assertRaisesMessage(CommandError, "Cannot open"):
+            self.run_import(str(self.dir / 'missing.geojson'))
+        (self.dir / 'bad.geojson').write_text('{"features": [{"type": ')
+        with self.assertRaisesMessage(CommandError, "Invalid GeoJSON"):
+            self.run_import(str(self.dir / 'bad.geojson'))
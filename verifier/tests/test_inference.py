@@ -0,0 +1,123 @@
+import io
+from unittest import mock
+
+import numpy as np
+import torch
+import torch.nn as nn
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+from torchvision import models
+
+from verifier import inference
+from verifier.inference import build_extractor, load_calibration, resnet_trunk
+from verifier.raster import MODEL_SHAPE
+
+from .utils import temp_dir, write_scene
+
+
+def random_trunk(seed=0):
+    """
+    A ResNet18 trunk with random weights and non-trivial BatchNorm
+    statistics: the shape of the real extractor without downloading it.
+    """
+    with torch.random.fork_rng():
+        torch.manual_seed(seed)
+        resnet = models.resnet18(weights=None)
+        for module in resnet.modules():
+            if isinstance(module, nn.BatchNorm2d):
+                module.running_mean.uniform_(-0.1, 0.1)
+                module.running_var.uniform_(0.5, 1.5)
+    return nn.Sequential(*list(resnet.children())[:-1]).eval()
+
+
+def model_inputs(count, seed=0):
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:MODEL_SHAPE[0], 0:MODEL_SHAPE[1]] / MODEL_SHAPE[0]
+    base = np.sin(4 * x) * np.cos(3 * y)
+    return np.stack([
+        base[None] * rng.uniform(0.5, 1.5, (3, 1, 1)) + rng.normal(0, 0.1, (3,) + MODEL_SHAPE) for _ in range(count)
+    ]).astype(np.float32)
+
+
+def features(extractor, inputs):
+    with torch.inference_mode():
+        return extractor(torch.from_numpy(inputs)).reshape(len(inputs), -1).numpy()
+
+
+class ExtractorBackendTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.trunk = random_trunk()
+        cls.inputs = model_inputs(8, seed=1)
+        cls.reference = features(cls.trunk, cls.inputs)
+
+    def test_eager_is_the_module_itself(self):
+        self.assertIs(build_extractor(self.trunk, 'eager'), self.trunk)
+        with self.assertRaises(ValueError):
+            build_extractor(self.trunk, 'fp16')
+        with self.assertRaises(ValueError):
+            build_extractor(self.trunk, 'int8')
+
+    def test_torchscript_matches_fp32(self):
+        frozen = build_extractor(self.trunk, 'torchscript')
+        self.assertIsInstance(frozen, torch.jit.ScriptModule)
+        np.testing.assert_allclose(features(frozen, self.inputs), self.reference, rtol=1e-3, atol=1e-4)
+        # Untouched: the eager module still holds its BatchNorm layers
+        self.assertTrue(any(isinstance(m, nn.BatchNorm2d) for m in self.trunk.modules()))
+
+    def test_int8_stays_close_to_fp32(self):
+        try:
+            inference.quantized_engine()
+        except RuntimeError:
+            self.skipTest("No quantized CPU engine in this torch build")
+        quantized = build_extractor(self.trunk, 'int8', calibration=model_inputs(16, seed=2))
+        result = features(quantized, self.inputs)
+        error = np.linalg.norm(result - self.reference) / np.linalg.norm(self.reference)
+        self.assertLess(error, 0.1)
+        # Scenes keep their order: each input is nearest its own fp32 features
+        distances = np.linalg.norm(result[:, None] - self.reference[None], axis=2)
+        self.assertEqual(list(distances.argmin(axis=1)), list(range(len(self.inputs))))
+
+    def test_trunks_are_identical_across_processes(self):
+        weights = temp_dir(self) / 'r18.pth'
+        torch.save(models.resnet18(weights=None).state_dict(), weights)
+        a, b, c = resnet_trunk(0, weights), resnet_trunk(0, weights), resnet_trunk(1, weights)
+        self.assertTrue(torch.equal(a[0].weight, b[0].weight))
+        self.assertFalse(torch.equal(a[0].weight, c[0].weight))
+
+    def test_calibration_files_are_checked(self):
+        path = temp_dir(self) / 'cal.npy'
+        np.save(path, model_inputs(2).astype(np.float64))
+        self.assertEqual(load_calibration(path).dtype, np.float32)
+        np.save(path, np.zeros((2, 3, 64, 64)))
+        with self.assertRaises(ValueError):
+            load_calibration(path)
+
+
+class CalibrateExtractorTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = temp_dir(self)
+        self.scenes = [str(write_scene(self.dir / f'{i}.tif', size=128, seed=i)) for i in range(3)]
+        self.enterContext(mock.patch(
+            'verifier.management.commands.calibrate_extractor.resnet_trunk', side_effect=lambda *a: random_trunk(),
+        ))
+
+    def calibrate(self, *args):
+        out = io.StringIO()
+        call_command('calibrate_extractor', *self.scenes, '--output', str(self.dir / 'cal.npy'), *args, stdout=out)
+        return out.getvalue()
+
+    def test_calibration_is_saved_and_checked(self):
+        output = self.calibrate('--backend', 'torchscript')
+        self.assertEqual(load_calibration(self.dir / 'cal.npy').shape, (3, 3) + MODEL_SHAPE)
+        self.assertIn("torchscript is within tolerance", output)
+        self.assertEqual(output.count("carbon_flux fp32="), 3)
+
+        output = self.calibrate('--check-only', '--backend', 'torchscript', '--eval-paths', self.scenes[0])
+        self.assertEqual(output.count("carbon_flux fp32="), 1)
+
+    def test_regressions_beyond_the_bound_fail(self):
+        with self.assertRaisesMessage(CommandError, "exceeds"):
+            self.calibrate('--backend', 'torchscript', '--max-flux-diff', '-1')
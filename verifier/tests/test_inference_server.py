@@ -0,0 +1,197 @@
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from verifier.inference_server import InferenceServer
+from verifier.ipc import (
+    HEADER, MAGIC, OP_EMBED, PROTOCOL_VERSION, InferenceClient, InferenceServerError, ProtocolError,
+    decode_array, encode_array, recv_frame, send_frame,
+)
+
+from .utils import FakeEngine, fake_verifier, temp_dir, write_scene
+
+
+class PidEngine(FakeEngine):
+    """FakeEngine whose scores are the answering worker's pid."""
+
+    def score(self, features):
+        features = np.asarray(features)
+        if features.ndim != 2:
+            raise ValueError(f"Expected (n, dim) features, got {features.shape}")
+        return np.full(len(features), float(os.getpid()))
+
+
+class WireFormatTests(SimpleTestCase):
+    def test_arrays_round_trip(self):
+        for array in (np.arange(24, dtype=np.float32).reshape(2, 3, 4), np.array([0.5, 1.5]), np.zeros((0, 512))):
+            decoded = decode_array(bytearray(encode_array(array)))
+            self.assertEqual(decoded.dtype, array.dtype)
+            self.assertTrue(np.array_equal(decoded, array))
+        # Other dtypes travel as float32; received arrays are writable in place
+        decoded = decode_array(bytearray(encode_array(np.array([[1, 2]], dtype=np.int64))))
+        self.assertEqual(decoded.dtype, np.float32)
+        decoded[0, 0] = 5
+
+    def test_malformed_payloads(self):
+        payload = encode_array(np.zeros((2, 2), dtype=np.float32))
+        with self.assertRaises(ProtocolError):
+            decode_array(payload[:-1])
+        with self.assertRaises(ProtocolError):
+            decode_array(b'\x09\x01' + payload[2:])
+
+    def test_frames(self):
+        a, b = socket.socketpair()
+        with a, b:
+            send_frame(a, OP_EMBED, b'xyz')
+            self.assertEqual(recv_frame(b), (OP_EMBED, bytearray(b'xyz')))
+
+            send_frame(a, OP_EMBED, b'x' * 10)
+            with self.assertRaisesMessage(ProtocolError, "exceeds"):
+                recv_frame(b, max_payload=5)
+            b.recv(10)
+
+            a.sendall(HEADER.pack(b'HTTP', PROTOCOL_VERSION, 0, 0))
+            with self.assertRaises(ProtocolError):
+                recv_frame(b)
+
+            a.sendall(HEADER.pack(MAGIC, PROTOCOL_VERSION, OP_EMBED, 10) + b'short')
+            a.shutdown(socket.SHUT_WR)
+            with self.assertRaisesMessage(ProtocolError, "mid-frame"):
+                recv_frame(b)
+            self.assertIsNone(recv_frame(b))
+
+
+class InferenceServerTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.dir = Path(tempfile.mkdtemp(prefix='vuna-test-'))
+        cls.addClassCleanup(shutil.rmtree, cls.dir, ignore_errors=True)
+        cls.socket_path = str(cls.dir / 'inference.sock')
+        server = InferenceServer(cls.socket_path, PidEngine, workers=2, threads=1, timeout=5)
+        cls.process = multiprocessing.get_context('fork').Process(target=server.serve_forever, daemon=True)
+        cls.process.start()
+        cls.addClassCleanup(cls.stop_server)
+        cls.inference = InferenceClient(cls.socket_path, timeout=10)
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                cls.inference.info
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    @classmethod
+    def stop_server(cls):
+        if cls.process.is_alive():
+            os.kill(cls.process.pid, signal.SIGTERM)
+        cls.process.join(10)
+
+    def test_requests_are_answered_by_the_workers(self):
+        info = self.inference.info
+        self.assertEqual((info['model_version'], info['workers']), ('test', 2))
+        self.assertEqual(info['backend'], 'eager')
+
+        # Different input shapes go in separate requests and come back in order
+        inputs = [np.full((3, 128, 128), i, dtype=np.float32) for i in range(3)] + [np.ones((3, 64, 64), np.float32)]
+        features = self.inference.embed(inputs)
+        self.assertTrue(np.array_equal(features, FakeEngine().embed(inputs)))
+
+        scores = self.inference.score(features)
+        self.assertEqual(scores.dtype, np.float64)
+        self.assertNotEqual(scores[0], os.getpid())
+
+    def test_errors_are_reported_and_the_worker_carries_on(self):
+        with self.assertRaisesMessage(InferenceServerError, "ValueError: Expected (n, dim)"):
+            self.inference.score(np.zeros(4))
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.socket_path)
+            sock.sendall(b'GET / HTTP/1.1\r\n\r\n')
+            # Dropped without a reply (reset, since the rest went unread)
+            try:
+                reply = sock.recv(1)
+            except ConnectionResetError:
+                reply = b''
+            self.assertEqual(reply, b'')
+        self.assertEqual(len(self.inference.score(np.zeros((2, 512)))), 2)
+
+    def test_concurrent_clients(self):
+        def call(i):
+            batch = [np.full((3, 128, 128), i, dtype=np.float32)]
+            return self.inference.embed(batch)[0, 0]
+
+        with ThreadPoolExecutor(8) as pool:
+            self.assertEqual(list(pool.map(call, range(32))), list(range(32)))
+
+    def test_dead_workers_are_replaced(self):
+        pid = int(self.inference.score(np.zeros((1, 512)))[0])
+        os.kill(pid, signal.SIGKILL)
+        deadline = time.monotonic() + 30
+        # Connections it accepted while dying are lost; wait until it's reaped
+        while time.monotonic() < deadline:
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                break
+            time.sleep(0.01)
+        pids = set()
+        while len(pids) < 2 and time.monotonic() < deadline:
+            pids.add(int(self.inference.score(np.zeros((1, 512)))[0]))
+        self.assertNotIn(pid, pids)
+        self.assertEqual(len(pids), 2)
+
+    def test_verifier_uses_the_server(self):
+        path = write_scene(temp_dir(self) / 'scene.tif', size=64)
+        local = fake_verifier(self, VUNA_BATCHING_ENABLED=False)
+        expected = local.verify(path)
+
+        cache_dir = temp_dir(self)
+        self.enterContext(override_settings(
+            VUNA_INFERENCE_SOCKET=self.socket_path, VUNA_CACHE_DIR=cache_dir,
+            VUNA_EMBEDDING_DIR=cache_dir / 'embeddings', VUNA_SINGLEFLIGHT_DIR=cache_dir / 'inflight',
+        ))
+        local.__class__._instance = None
+        remote = local.__class__()
+        self.assertIsInstance(remote.engine, InferenceClient)
+        result = remote.verify(path)
+        self.assertEqual(result['status'], 'success')
+        # The "flux" is the worker pid: it came from the server
+        self.assertNotEqual(result['carbon_flux'], expected['carbon_flux'])
+        self.assertEqual(remote.stats()['engine']['remote'], True)
+
+    def test_web_processes_never_import_torch(self):
+        scene = write_scene(self.dir / 'web.tif', size=64)
+        (self.dir / 'web_settings.py').write_text(
+            "from vuna_backend.settings import *\n"
+            f"DATABASES = {{'default': {{'ENGINE': 'django.db.backends.sqlite3', 'NAME': {str(self.dir / 'db')!r}}}}}\n"
+            f"VUNA_CACHE_DIR = {str(self.dir / 'web-cache')!r}\n"
+            "VUNA_EMBEDDING_DIR = VUNA_SINGLEFLIGHT_DIR = None\n"
+            f"VUNA_INFERENCE_SOCKET = {self.socket_path!r}\n"
+        )
+        code = (
+            "import json, sys, django; django.setup()\n"
+            "from verifier.services import VunaVerifier\n"
+            f"result = VunaVerifier().verify({scene!r})\n"
+            "print(json.dumps([result['status'], sorted(m for m in ('torch', 'torchvision', 'xgboost') if m in sys.modules)]))"
+        )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='web_settings',
+                   PYTHONPATH=os.pathsep.join([str(self.dir), str(settings.BASE_DIR)]))
+        completed = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                   cwd=settings.BASE_DIR, env=env, timeout=120)
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        self.assertEqual(json.loads(completed.stdout.strip().splitlines()[-1]), ['success', []])
@@ -0,0 +1,108 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from verifier import jobs
+from verifier.models import Project, VerificationJob, VerificationRecord
+
+from .utils import fake_verifier, temp_dir, write_scene
+
+
+class ThreadJobQueue(jobs.JobQueue):
+    """Runs jobs on threads of this process, against the test database."""
+
+    def _make_executor(self):
+        return ThreadPoolExecutor(max_workers=self.max_workers)
+
+
+@override_settings(VUNA_COG_ON_UPLOAD=False)
+class JobQueueTests(TransactionTestCase):
+    def setUp(self):
+        self.verifier = fake_verifier(self)
+        self.media = temp_dir(self)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media))
+        self.project = Project.objects.create(name="Karura", latitude=-1.25, longitude=36.83)
+        self.use_queue(ThreadJobQueue(max_workers=2, max_pending=4))
+
+    def use_queue(self, queue):
+        self.queue = queue
+        self.enterContext(mock.patch.object(jobs, '_queue', queue))
+        self.addCleanup(queue._executor.shutdown, wait=True)
+
+    def wait_for_queue(self):
+        # Polling the depth rather than the table keeps this thread off the
+        # database while jobs write to it
+        deadline = time.monotonic() + 10
+        while self.queue.depth and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.queue.depth, 0)
+
+    def post_scene(self, **data):
+        path = write_scene(temp_dir(self) / 'scene.tif', size=64)
+        with open(path, 'rb') as f:
+            upload = SimpleUploadedFile('karura_2025-02-03.tif', f.read())
+        return self.client.post(reverse('verify-credit'), {'image_file': upload, 'mode': 'async', **data})
+
+    def test_job_lifecycle(self):
+        response = self.post_scene(project_id=self.project.pk)
+        self.assertEqual(response.status_code, 202)
+        body = response.json()
+        self.assertEqual((body['status'], body['project_id']), ('queued', self.project.pk))
+
+        self.wait_for_queue()
+        job = self.client.get(body['status_url']).json()
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertIsNotNone(job['started_at'])
+        self.assertIsNotNone(job['finished_at'])
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.cached_flux, job['result']['carbon_flux'])
+        self.assertTrue(self.project.tiff_file.name.startswith('projects/tiffs/karura'))
+        record = VerificationRecord.objects.get(project=self.project)
+        self.assertEqual(record.acquired_on.isoformat(), '2025-02-03')
+
+    def test_failed_verification_fails_the_job(self):
+        job = self.queue.submit(str(self.media / 'missing.tif'), project=self.project)
+        self.wait_for_queue()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (VerificationJob.STATUS_FAILED, "File not found"))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_unrecordable_result_still_fails_the_job(self):
+        with mock.patch.object(jobs.JobQueue, '_record', side_effect=RuntimeError("disk full")):
+            job = self.queue.submit(str(self.media / 'missing.tif'))
+            self.wait_for_queue()
+        job.refresh_from_db()
+        self.assertEqual(job.status, VerificationJob.STATUS_FAILED)
+        self.assertEqual(job.error, "Could not record the result: disk full")
+
+    def test_full_queue_answers_503(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        self.use_queue(ThreadJobQueue(max_workers=1, max_pending=1))
+        with mock.patch.object(jobs, 'run_job', side_effect=lambda *args: release.wait(10) and {"status": "error"}):
+            self.assertEqual(self.post_scene(project_id=self.project.pk).status_code, 202)
+            response = self.post_scene(project_id=self.project.pk)
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], '5')
+            release.set()
+            self.wait_for_queue()
+        self.assertEqual(self.queue.stats()['pending'], 0)
+
+    def test_stale_jobs_are_failed(self):
+        stale = VerificationJob.objects.create(source='a.tif', status=VerificationJob.STATUS_RUNNING)
+        VerificationJob.objects.filter(pk=stale.pk).update(created_at=timezone.now() - timedelta(hours=2))
+        recent = VerificationJob.objects.create(source='b.tif')
+
+        self.assertEqual(jobs.fail_stale_jobs(max_age=3600), 1)
+        stale.refresh_from_db()
+        recent.refresh_from_db()
+        self.assertEqual(stale.status, VerificationJob.STATUS_FAILED)
+        self.assertIn("Abandoned", stale.error)
+        self.assertEqual(recent.status, VerificationJob.STATUS_QUEUED)
@@ -0,0 +1,84 @@
+import json
+
+import rasterio
+from django.test import SimpleTestCase
+from rasterio.windows import Window
+
+from verifier.masking import MaskCache, ProjectBoundary, get_mask_cache
+from verifier.models import Project
+from verifier.tiling import model_grid_transform
+
+from .utils import KARURA, fake_verifier, scene_array, temp_dir, write_scene
+
+FAR_AWAY = {"type": "Polygon", "coordinates": [[[30.0, 1.0], [30.1, 1.0], [30.1, 0.9], [30.0, 1.0]]]}
+
+
+class ProjectBoundaryTests(SimpleTestCase):
+    def setUp(self):
+        self.path = write_scene(temp_dir(self) / 'scene.tif', size=300)
+
+    def test_window_is_the_polygons_bounding_box(self):
+        with rasterio.open(self.path) as src:
+            self.assertEqual(ProjectBoundary(KARURA).window(src), Window(50, 50, 100, 100))
+            self.assertIsNone(ProjectBoundary(FAR_AWAY).window(src))
+
+    def test_mask_marks_the_inside_and_is_rasterized_once(self):
+        boundary = ProjectBoundary(KARURA, key=1)
+        with rasterio.open(self.path) as src:
+            window = Window(0, 0, 300, 300)
+            transform = model_grid_transform(src, window, (150, 150))
+        mask = boundary.mask(src.crs, transform, (150, 150))
+        self.assertTrue(mask[50, 50])
+        self.assertFalse(mask[10, 10])
+        # 100 x 100 scene pixels at half resolution, plus the touched edge
+        self.assertAlmostEqual(mask.sum(), 50 * 50, delta=2 * 52)
+
+        hits = get_mask_cache().stats()['hits']
+        self.assertTrue((boundary.mask(src.crs, transform, (150, 150)) == mask).all())
+        self.assertEqual(get_mask_cache().stats()['hits'], hits + 1)
+
+    def test_projects_without_a_usable_boundary_have_none(self):
+        self.assertIsNone(ProjectBoundary.from_project(None))
+        self.assertIsNone(ProjectBoundary.from_project(Project(geojson_boundary='not json')))
+        boundary = ProjectBoundary.from_project(Project(pk=3, geojson_boundary=json.dumps(KARURA)))
+        self.assertEqual(boundary.key, 3)
+        self.assertEqual(boundary.digest, ProjectBoundary(KARURA).digest)
+
+    def test_boundaries_are_reprojected_to_the_scene(self):
+        projected = ProjectBoundary(KARURA).geometry_in('EPSG:32737')
+        x, y = projected['coordinates'][0][0]
+        self.assertAlmostEqual(x, 258_000, delta=2_000)
+        self.assertAlmostEqual(y, 9_863_000, delta=2_000)
+
+    def test_mask_cache_evicts_the_least_recently_used(self):
+        cache = MaskCache(max_entries=1)
+        grid = rasterio.Affine(0.001, 0, 36.8, 0, -0.001, -1.2)
+        cache.set('a', ProjectBoundary(KARURA).mask('EPSG:4326', grid, (64, 64)))
+        cache.set('b', cache.get('a'))
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b').shape, (64, 64))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+
+class MaskedVerificationTests(SimpleTestCase):
+    def setUp(self):
+        self.verifier = fake_verifier(self)
+        self.dir = temp_dir(self)
+
+    def test_only_pixels_inside_the_boundary_count(self):
+        data = scene_array(300)
+        inside = write_scene(self.dir / 'a.tif', data=data)
+        changed = data.copy()
+        changed[:, 200:, :] += 0.5  # well outside the polygon
+        outside = write_scene(self.dir / 'b.tif', data=changed)
+        boundary = ProjectBoundary(KARURA)
+
+        self.assertNotEqual(self.verifier.verify(inside)['carbon_flux'], self.verifier.verify(outside)['carbon_flux'])
+        self.assertEqual(
+            self.verifier.verify(inside, boundary=boundary)['carbon_flux'],
+            self.verifier.verify(outside, boundary=boundary)['carbon_flux'],
+        )
+
+    def test_boundary_outside_the_scene_is_an_error(self):
+        result = self.verifier.verify(write_scene(self.dir / 'a.tif', size=64), boundary=ProjectBoundary(FAR_AWAY))
+        self.assertEqual(result, {"status": "error", "message": "Project boundary does not overlap the image"})
@@ -0,0 +1,127 @@
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from verifier import fetch
+from verifier.metrics import REGISTRY, STAGE_ERRORS, STAGE_SECONDS, Registry, stage
+
+from .utils import fake_verifier, temp_dir, write_scene
+
+
+def samples(text=None):
+    """Prometheus text -> {"name{labels}": value} for the sample lines."""
+    text = REGISTRY.render() if text is None else text
+    lines = [line.rsplit(' ', 1) for line in text.splitlines() if line and not line.startswith('#')]
+    return {name: float(value) for name, value in lines}
+
+
+class RegistryTests(SimpleTestCase):
+    def test_exposition_format(self):
+        registry = Registry()
+        requests = registry.counter('test_requests_total', "Requests.", ['path'])
+        latency = registry.histogram('test_seconds', "Latency.", buckets=(0.1, 1.0))
+        requests.inc(path='/a "quoted"\npath')
+        requests.inc(2, path='/b')
+        for value in (0.05, 0.5, 0.5, 3.0):
+            latency.observe(value)
+
+        text = registry.render()
+        self.assertIn('# TYPE test_requests_total counter', text)
+        self.assertIn('test_requests_total{path="/a \\"quoted\\"\\npath"} 1', text)
+        self.assertEqual(samples(text), {
+            'test_requests_total{path="/a \\"quoted\\"\\npath"}': 1,
+            'test_requests_total{path="/b"}': 2,
+            'test_seconds_bucket{le="0.1"}': 1,
+            'test_seconds_bucket{le="1"}': 3,
+            'test_seconds_bucket{le="+Inf"}': 4,
+            'test_seconds_sum': 4.05,
+            'test_seconds_count': 4,
+        })
+
+    def test_a_failing_collector_does_not_break_the_scrape(self):
+        registry = Registry()
+        registry.collector(lambda: 1 / 0)
+        registry.collector(lambda: {"test_gauge": ("A gauge.", 3)})
+        with self.assertLogs('verifier.metrics', 'WARNING'):
+            self.assertEqual(samples(registry.render()), {"test_gauge": 3})
+
+
+class StageTests(SimpleTestCase):
+    def count(self, name):
+        return samples().get(f'vuna_stage_seconds_count{{stage="{name}"}}', 0)
+
+    def test_stages_are_timed_and_errors_counted(self):
+        before = self.count('test_stage')
+        with stage('test_stage'):
+            pass
+        with self.assertRaises(KeyError):
+            with stage('test_stage'):
+                raise KeyError('x')
+        self.assertEqual(self.count('test_stage'), before + 2)
+        self.assertEqual(samples()['vuna_stage_errors_total{stage="test_stage",error="KeyError"}'], 1)
+
+    @override_settings(VUNA_METRICS_ENABLED=False)
+    def test_disabled_metrics_record_nothing(self):
+        rendered = STAGE_SECONDS.render() + STAGE_ERRORS.render()
+        with self.assertRaises(KeyError):
+            with stage('disabled_stage'):
+                raise KeyError('x')
+        self.assertEqual(STAGE_SECONDS.render() + STAGE_ERRORS.render(), rendered)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+
+class MetricsEndpointTests(SimpleTestCase):
+    databases = {'default'}
+
+    def setUp(self):
+        self.verifier = fake_verifier(self)
+        self.scene = write_scene(temp_dir(self) / 'scene.tif', size=64)
+
+    def verify(self):
+        with open(self.scene, 'rb') as f:
+            upload = SimpleUploadedFile('scene.tif', f.read())
+        return self.client.post(reverse('verify-credit'), {'image_file': upload})
+
+    def test_verifications_show_up_in_the_scrape(self):
+        before = samples()
+        self.assertEqual(self.verify().status_code, 200)
+        self.assertEqual(self.verify().status_code, 200)
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        after = samples(response.content.decode())
+
+        def delta(name):
+            return after.get(name, 0) - before.get(name, 0)
+
+        self.assertEqual(delta('vuna_verifications_total{status="success",source="pipeline"}'), 1)
+        self.assertEqual(delta('vuna_verifications_total{status="success",source="cache"}'), 1)
+        self.assertEqual(delta('vuna_request_seconds_count{view="verify",status="200"}'), 2)
+        for name in ('hash', 'read', 'cnn', 'xgboost'):
+            self.assertGreaterEqual(delta(f'vuna_stage_seconds_count{{stage="{name}"}}'), 1, name)
+        self.assertGreater(delta('vuna_bytes_read_total{kind="hashed"}'), 0)
+        # The verifier's component stats are exposed as gauges
+        self.assertEqual(after['vuna_prediction_cache_memory_hits'], 1)
+
+    def test_components_are_collected_separately(self):
+        self.assertEqual(self.verify().status_code, 200)
+        # A fetcher whose download directory is gone, say
+        broken = mock.Mock(**{'stats.side_effect': FileNotFoundError("downloads")})
+        with mock.patch.object(fetch, '_fetcher', broken), \
+                mock.patch.object(self.verifier, 'stats', side_effect=AssertionError("not per scrape")), \
+                self.assertLogs('verifier.metrics', 'WARNING') as logs:
+            scraped = samples()
+        self.assertEqual(broken.stats.call_count, 1)
+        self.assertIn("vuna_fetch", logs.output[0])
+        self.assertFalse(any(name.startswith('vuna_fetch_') for name in scraped))
+        for name in ('vuna_prediction_cache_misses', 'vuna_inflight_leaders', 'vuna_batching_requests'):
+            self.assertIn(name, scraped)
+
+    @override_settings(VUNA_METRICS_TIMING_HEADERS=True)
+    def test_server_timing_header(self):
+        timing = self.verify()['Server-Timing']
+        self.assertRegex(timing, r'(^|, )read;dur=[\d.]+')
+        self.assertRegex(timing, r'total;dur=[\d.]+$')
+        self.assertNotIn('Server-Timing', self.client.get(reverse('project-list')))
@@ -0,0 +1,167 @@
+import csv
+import io
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from verifier import pricing
+from verifier.economics import DEFAULT_PRICING, PricingModel, flux_result
+from verifier.models import Project
+from verifier.pricing import get_pricing
+
+from .utils import KARURA, fake_verifier, temp_dir, write_scene
+
+PRICING_MODELS = {
+    'usd20-v1': {'usd_per_tonne': 20.0},
+    'usd35-v2': {'usd_per_tonne': 35.0, 'net_fraction': 0.4},
+}
+
+
+def configured(**settings):
+    """
+    override_settings for VUNA_PRICING_MODELS and friends, with the
+    configured models read afresh.
+    """
+    return mock.patch.multiple(pricing, _models=None), override_settings(
+        VUNA_PRICING_MODELS=PRICING_MODELS, **settings,
+    )
+
+
+class PricingModelTests(SimpleTestCase):
+    def test_economics_are_linear_in_the_flux(self):
+        tonnes, usd = DEFAULT_PRICING.economics(0.05)
+        self.assertAlmostEqual(tonnes, 0.05 * 18 * 0.5 * 365 * 10000 / 1e6 * 44 / 12)
+        self.assertAlmostEqual(usd, 20 * tonnes)
+        scenario = DEFAULT_PRICING.with_price(40)
+        self.assertEqual(scenario.version, 'usd20-v1@40')
+        self.assertEqual(scenario.economics(0.05), (tonnes, 2 * usd))
+        self.assertEqual(DEFAULT_PRICING.to_dict()['usd_per_tonne'], 20.0)
+
+    def test_reprice(self):
+        cached = flux_result(0.05)
+        self.assertIs(DEFAULT_PRICING.reprice(cached), cached)
+        error = {'status': 'error', 'message': 'Unreadable'}
+        self.assertIs(DEFAULT_PRICING.with_price(40).reprice(error), error)
+
+        repriced = DEFAULT_PRICING.with_price(40).reprice(cached)
+        self.assertEqual(repriced['pricing'], 'usd20-v1@40')
+        self.assertEqual(repriced['carbon_flux'], cached['carbon_flux'])
+        self.assertEqual(repriced['estimated_revenue_usd'], flux_result(0.05, DEFAULT_PRICING.with_price(40))['estimated_revenue_usd'])
+        self.assertEqual(cached['pricing'], 'usd20-v1')
+
+        # Tiled totals scale with the scored area
+        tiled = dict(cached, area_ha=12.5, total_annual_tonnes_co2=0, total_revenue_usd=0)
+        repriced = PricingModel('other', 10).reprice(tiled)
+        tonnes, usd = PricingModel('other', 10).economics(0.05)
+        self.assertEqual(repriced['total_annual_tonnes_co2'], round(tonnes * 12.5, 2))
+        self.assertEqual(repriced['total_revenue_usd'], round(usd * 12.5, 2))
+
+
+class GetPricingTests(SimpleTestCase):
+    def setUp(self):
+        for context in configured(VUNA_PRICING_MODEL='usd35-v2'):
+            self.enterContext(context)
+
+    def test_versions_and_price_scenarios(self):
+        self.assertEqual(get_pricing().version, 'usd35-v2')
+        self.assertEqual(get_pricing().net_fraction, 0.4)
+        self.assertEqual(get_pricing('usd20-v1').usd_per_tonne, 20.0)
+        self.assertEqual(get_pricing(carbon_price='12.5').version, 'usd35-v2@12.5')
+        self.assertEqual(get_pricing(carbon_price=0).usd_per_flux, 0)
+
+    def test_invalid_requests(self):
+        with self.assertRaisesMessage(ValueError, "Unknown pricing model 'usd1'; known: usd20-v1, usd35-v2"):
+            get_pricing('usd1')
+        for price in ('-1', 'nan', 'inf'):
+            with self.assertRaisesMessage(ValueError, "non-negative"):
+                get_pricing(carbon_price=price)
+        with self.assertRaises(ValueError):
+            get_pricing(carbon_price='twenty')
+
+
+class QueryTimePricingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for context in configured():
+            self.enterContext(context)
+        self.projects = []
+        for i, flux in enumerate([0.05, 0.0123, None]):
+            project = Project(name=f"Forest {i}", latitude=-1.24, longitude=36.83, cached_flux=flux)
+            if i == 0:
+                project.set_boundary(KARURA)
+            project.save()
+            self.projects.append(project)
+
+    def test_priced_annotations(self):
+        scenario = get_pricing('usd35-v2', 50)
+        rows = Project.objects.priced(scenario).order_by('pk')
+        for row, flux in zip(rows, [0.05, 0.0123]):
+            tonnes, usd = scenario.economics(flux)
+            self.assertEqual((row.priced_co2, row.priced_revenue), (round(tonnes, 2), round(usd, 2)))
+        self.assertEqual((rows[2].priced_co2, rows[2].priced_revenue), (None, None))
+
+    def test_the_project_list_prices_on_request(self):
+        url = reverse('project-list')
+        default = {row['id']: row for row in self.client.get(url).json()}
+        scenario = {row['id']: row for row in self.client.get(url, {'carbon_price': 40}).json()}
+        first = self.projects[0].pk
+        self.assertEqual(default[first]['cached_co2'], round(DEFAULT_PRICING.economics(0.05)[0], 2))
+        self.assertEqual(scenario[first]['cached_co2'], default[first]['cached_co2'])
+        self.assertEqual(scenario[first]['cached_revenue'], round(DEFAULT_PRICING.with_price(40).economics(0.05)[1], 2))
+        self.assertIsNone(scenario[self.projects[2].pk]['cached_revenue'])
+
+        self.assertEqual(self.client.get(url, {'pricing': 'usd1'}).status_code, 400)
+        response = self.client.get(url, {'carbon_price': '-5'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('pricing', response.json())
+
+    def test_economics_totals(self):
+        url = reverse('project-economics')
+        data = self.client.get(url, {'pricing': 'usd35-v2'}).json()
+        tonnes, usd = get_pricing('usd35-v2').economics(0.05 + 0.0123)
+        self.assertEqual((data['projects'], data['verified_projects']), (3, 2))
+        self.assertEqual(data['annual_tonnes_co2'], round(tonnes, 2))
+        self.assertEqual(data['estimated_revenue_usd'], round(usd, 2))
+        self.assertEqual(data['pricing']['version'], 'usd35-v2')
+
+        # Filtered like the project list; a different price, a different answer
+        data = self.client.get(url, {'has_boundary': 'true', 'carbon_price': 0}).json()
+        self.assertEqual((data['projects'], data['verified_projects'], data['estimated_revenue_usd']), (1, 1, 0))
+        self.assertEqual(self.client.get(url, {'carbon_price': 'x'}).status_code, 400)
+
+    def test_the_export_command(self):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('export_projects', '--pricing', 'usd35-v2', '--chunk-size', '2', stdout=out, stderr=err)
+        header, *rows = csv.reader(io.StringIO(out.getvalue()))
+        self.assertEqual(header[-3:], ['annual_tonnes_co2', 'estimated_revenue_usd', 'pricing'])
+        tonnes, usd = get_pricing('usd35-v2').economics(0.0123)
+        self.assertEqual(rows[1][-3:], [str(round(tonnes, 2)), str(round(usd, 2)), 'usd35-v2'])
+        self.assertEqual(rows[2][-3:], ['', '', 'usd35-v2'])
+        self.assertIn("Exported 3 projects", err.getvalue())
+
+        with self.assertRaisesMessage(CommandError, "--chunk-size must be a positive integer"):
+            call_command('export_projects', '--chunk-size', '0', stdout=out, stderr=err)
+
+
+class CachedResultRepricingTests(SimpleTestCase):
+    def test_cached_results_come_back_at_the_current_price(self):
+        for context in configured(VUNA_PRICING_MODEL='usd20-v1'):
+            self.enterContext(context)
+        verifier = fake_verifier(self)
+        path = write_scene(temp_dir(self) / 'scene.tif', size=64)
+        before = verifier.verify(path)
+        self.assertEqual(before['pricing'], 'usd20-v1')
+
+        # The price changes (a restart with another VUNA_PRICING_MODEL):
+        # the cached result is repriced, the models don't run again
+        with override_settings(VUNA_PRICING_MODEL='usd35-v2'):
+            type(verifier)._instance = None
+            restarted = type(verifier)()
+            after = restarted.verify(path)
+        self.assertEqual(verifier.engine.batches, [1])
+        expected = flux_result(before['carbon_flux'], get_pricing('usd35-v2'))
+        self.assertEqual({key: after[key] for key in expected}, expected)
@@ -0,0 +1,84 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from verifier.freshness import projects_changed
+from verifier.models import Project
+
+from .utils import KARURA
+
+
+class ProjectListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('project-list')
+        self.projects = []
+        for i in range(7):
+            project = Project(name=f"Forest {i}", latitude=-1.0 - i * 0.1, longitude=36.0 + i * 0.1)
+            if i % 2 == 0:
+                project.set_boundary(KARURA)
+            project.save()
+            self.projects.append(project)
+
+    def test_without_pagination_the_full_list_is_returned(self):
+        response = self.client.get(self.url)
+        self.assertEqual([row['id'] for row in response.json()], [p.pk for p in self.projects])
+
+    def test_cursor_pages_cover_every_project_once(self):
+        seen = []
+        url = f"{self.url}?page_size=3&omit=geojson_boundary"
+        pages = 0
+        while url:
+            page = self.client.get(url).json()
+            seen += [row['id'] for row in page['results']]
+            self.assertNotIn('geojson_boundary', page['results'][0])
+            url = page['next']
+            pages += 1
+            if pages == 1:
+                # Rows added mid-walk don't shift the pages already served
+                Project.objects.create(name="Late", latitude=-1.5, longitude=36.5)
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, sorted(seen))
+        self.assertEqual(seen, list(Project.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_filters_and_field_selection(self):
+        rows = self.client.get(f"{self.url}?bbox=36.15,-1.45,36.45,-1.15&fields=id,name").json()
+        self.assertEqual([row['id'] for row in rows], [p.pk for p in self.projects[2:5]])
+        self.assertEqual(set(rows[0]), {'id', 'name'})
+
+        rows = self.client.get(f"{self.url}?has_boundary=false").json()
+        self.assertEqual([row['id'] for row in rows], [p.pk for p in self.projects[1::2]])
+        self.assertEqual(self.client.get(f"{self.url}?bbox=1,2,3").status_code, 400)
+
+    def test_unchanged_list_is_a_304_without_queries(self):
+        first = self.client.get(self.url)
+        etag = first['ETag']
+        self.assertTrue(first.has_header('Last-Modified'))
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Other query strings are other representations
+        self.assertNotEqual(self.client.get(f"{self.url}?fields=id")['ETag'], etag)
+
+    def test_writes_move_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.projects[0].name = "Renamed"
+        self.projects[0].save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        self.projects[1].delete()
+        self.assertNotEqual(self.client.get(self.url)['ETag'], etag)
+        etag = self.client.get(self.url)['ETag']
+
+        # Bulk writes bypass the signals and say so themselves
+        Project.objects.filter(pk=self.projects[2].pk).update(cached_flux=0.05, updated_at=timezone.now())
+        projects_changed()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_responses_are_gzipped(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
@@ -0,0 +1,72 @@
+from io import StringIO
+
+import numpy as np
+import rasterio
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from rasterio.windows import Window
+
+from verifier.raster import (
+    MODEL_BANDS, MODEL_SHAPE, NODATA_VALUE, compare_read_paths, read_model_bands,
+)
+
+from .utils import fake_verifier, scene_array, temp_dir, write_scene
+
+
+def with_holes(size=512):
+    data = scene_array(size)
+    data[5:8, :, 200:206] = NODATA_VALUE
+    data[5:8, 300:340, 300:340] = NODATA_VALUE
+    return data
+
+
+class DecimatedReadTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = temp_dir(self)
+
+    def test_matches_the_full_resolution_path(self):
+        report = compare_read_paths(write_scene(self.dir / 'clean.tif', size=512))
+        self.assertEqual(report['decimated'].shape, (3,) + MODEL_SHAPE)
+        self.assertLess(max(report['max_abs_diff']), 1e-4)
+
+    def test_nodata_stays_out_of_its_neighbours(self):
+        data = with_holes()
+        valid = [data[band - 1][data[band - 1] != NODATA_VALUE] for band in MODEL_BANDS]
+        # Output pixels whose bilinear footprint misses every hole
+        scale = data.shape[1] // MODEL_SHAPE[0]
+        holes = (data[6] == NODATA_VALUE).reshape(MODEL_SHAPE[0], scale, MODEL_SHAPE[1], scale).any(axis=(1, 3))
+        near = np.zeros_like(holes)
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                near |= np.roll(holes, (dy, dx), axis=(0, 1))
+
+        for nodata in (NODATA_VALUE, None):
+            with self.subTest(nodata=nodata):
+                path = write_scene(self.dir / f'holes-{nodata}.tif', data=data, nodata=nodata)
+                with rasterio.open(path) as src:
+                    img = read_model_bands(src)
+                for band, values in zip(img, valid):
+                    kept = band[band != NODATA_VALUE]
+                    self.assertGreaterEqual(kept.min(), values.min())
+                    self.assertLessEqual(kept.max(), values.max())
+                    self.assertTrue((band == NODATA_VALUE).any())
+                report = compare_read_paths(path)
+                diff = np.abs(report['decimated'] - report['reference'])
+                self.assertLess(diff[:, ~near].max(), 1e-4)
+
+    def test_window_reads_the_same_pixels_as_a_cropped_file(self):
+        data = scene_array(512)
+        path = write_scene(self.dir / 'scene.tif', data=data)
+        crop = write_scene(self.dir / 'crop.tif', data=np.ascontiguousarray(data[:, 128:384, 64:320]))
+        with rasterio.open(path) as src:
+            windowed = read_model_bands(src, window=Window(64, 128, 256, 256))
+        with rasterio.open(crop) as src:
+            cropped = read_model_bands(src)
+        # Only the edges may differ: there the window's kernel sees the pixels around it
+        np.testing.assert_allclose(windowed[:, 1:-1, 1:-1], cropped[:, 1:-1, 1:-1], atol=1e-3)
+
+    def test_parity_command_compares_the_flux(self):
+        fake_verifier(self)
+        out = StringIO()
+        call_command('check_raster_parity', write_scene(self.dir / 'scene.tif', size=512), stdout=out)
+        self.assertIn("within tolerance", out.getvalue())
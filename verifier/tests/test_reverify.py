@@ -0,0 +1,148 @@
+import io
+import json
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from verifier import worker
+from verifier.management.commands import reverify
+from verifier.models import Project, VerificationRecord
+from verifier.summary import rebuild_summary
+
+from .test_summary import buckets
+from .utils import KARURA, fake_verifier, temp_dir, write_scene
+
+
+def thread_pool(max_workers, mp_context=None, initializer=None):
+    # The command's spawned processes would load the real models; threads
+    # share this test's fake verifier instead
+    return ThreadPoolExecutor(max_workers)
+
+
+class ReverifyTests(TestCase):
+    def setUp(self):
+        self.verifier = fake_verifier(self)
+        self.media = temp_dir(self)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media))
+        self.enterContext(mock.patch.object(reverify, 'ProcessPoolExecutor', thread_pool))
+        (self.media / 'projects').mkdir()
+        self.projects = []
+        for i in range(4):
+            name = f'projects/forest{i}_2025-0{i + 1}-01.tif'
+            if i == 0:
+                (self.media / name).write_bytes(b'not a tiff')
+            else:
+                write_scene(self.media / name, size=64, seed=i)
+            self.projects.append(Project.objects.create(
+                name=f"Forest {i}", latitude=-1.24, longitude=36.83, tiff_file=name,
+                geojson_boundary=json.dumps(KARURA) if i == 1 else None,
+            ))
+        self.checkpoint = temp_dir(self) / 'run.checkpoint.jsonl'
+
+    def run_command(self, *args):
+        err = io.StringIO()
+        call_command(
+            'reverify', '--checkpoint', str(self.checkpoint), '--fetch-rate', '0', *args,
+            stdout=io.StringIO(), stderr=err,
+        )
+        return err.getvalue()
+
+    def interrupted_run(self):
+        # The third scene's result "arrives" as a Ctrl-C, late enough that
+        # the first two have been written by then
+        broken = self.projects[2].tiff_file.path
+
+        def scene(project_id, boundary, source, tiled=False):
+            if source == broken:
+                time.sleep(0.5)
+                raise KeyboardInterrupt
+            return worker.reverify_scene(project_id, boundary, source, tiled)
+
+        with mock.patch.object(reverify, 'reverify_scene', scene):
+            with self.assertRaisesMessage(CommandError, "Interrupted after 2 scenes; run again to resume"):
+                self.run_command('--workers', '1', '--batch-size', '1')
+
+    def test_a_run_refreshes_projects_and_history(self):
+        output = self.run_command('--workers', '2')
+        self.assertIn(f"4 scenes with {self.verifier.model_version}, 0 already done", output)
+        self.assertIn(f"{self.projects[0].tiff_file.path}: ", output)
+
+        for project in self.projects:
+            project.refresh_from_db()
+        self.assertIsNone(self.projects[0].cached_flux)
+        unmasked = [self.verifier.verify(p.tiff_file.path)['carbon_flux'] for p in self.projects[1:]]
+        self.assertEqual([p.cached_flux for p in self.projects[2:]], unmasked[1:])
+        # Forest 1 was masked to its boundary
+        self.assertIsNotNone(self.projects[1].cached_flux)
+        self.assertNotEqual(self.projects[1].cached_flux, unmasked[0])
+        records = VerificationRecord.objects.order_by('acquired_on')
+        self.assertEqual([r.project_id for r in records], [p.pk for p in self.projects[1:]])
+        self.assertEqual(records[0].acquired_on.isoformat(), '2025-02-01')
+
+        # The run is complete: its checkpoint is retired
+        self.assertFalse(self.checkpoint.exists())
+        header, *entries = [json.loads(line) for line in open(f"{self.checkpoint}.done")]
+        self.assertEqual(header['model_version'], self.verifier.model_version)
+        self.assertEqual(sorted(e['status'] for e in entries), ['error', 'success', 'success', 'success'])
+
+        summary = buckets()
+        rebuild_summary()
+        self.assertEqual(summary, buckets())
+
+    def test_an_interrupted_run_resumes(self):
+        self.interrupted_run()
+        entries = [json.loads(line) for line in open(self.checkpoint)][1:]
+        self.assertEqual(
+            [(e['project_id'], e['status']) for e in entries],
+            [(self.projects[0].pk, 'error'), (self.projects[1].pk, 'success')],
+        )
+        self.assertEqual(VerificationRecord.objects.count(), 1)
+        saved = self.checkpoint.with_suffix('.saved')
+        shutil.copy(self.checkpoint, saved)
+
+        # Done and failed scenes are skipped...
+        with mock.patch.object(reverify, 'reverify_scene', wraps=worker.reverify_scene) as scene:
+            output = self.run_command()
+        self.assertIn("2 already done", output)
+        self.assertEqual(
+            sorted(call.args[0] for call in scene.call_args_list if call.args[0] != self.projects[0].pk),
+            [p.pk for p in self.projects[2:]],
+        )
+        self.assertEqual(VerificationRecord.objects.count(), 3)
+        self.assertFalse(self.checkpoint.exists())
+
+        # ...unless failures are to be retried
+        shutil.copy(saved, self.checkpoint)
+        output = self.run_command('--retry-failed')
+        self.assertIn("1 already done", output)
+        self.assertIn("3 to verify", output)
+
+    def test_a_checkpoint_only_resumes_the_same_run(self):
+        self.interrupted_run()
+        with self.assertRaisesMessage(CommandError, "from a run with other options"):
+            self.run_command('--tiled')
+        with self.assertRaisesMessage(CommandError, "from a run with other options"):
+            self.run_command('--ids', str(self.projects[1].pk))
+
+        output = self.run_command('--restart', '--ids', str(self.projects[1].pk))
+        self.assertIn(f"1 scenes with {self.verifier.model_version}, 0 already done", output)
+        header = json.loads(open(f"{self.checkpoint}.done").readline())
+        self.assertEqual(header['filters']['ids'], [self.projects[1].pk])
+
+        self.checkpoint.write_text("{not json\n")
+        with self.assertRaisesMessage(CommandError, "Unreadable checkpoint"):
+            self.run_command()
+
+    def test_default_checkpoints_are_per_model_and_filters(self):
+        out = io.StringIO()
+        call_command('reverify', '--no-stored', stdout=out, stderr=out)
+        self.assertIn(f"0 scenes with {self.verifier.model_version}", out.getvalue())
+        call_command('reverify', '--unverified', stdout=out, stderr=out)
+        paths = [line.split(' per ')[1].split(',')[0] for line in out.getvalue().splitlines() if ' per ' in line]
+        self.assertEqual(len(set(paths)), 2)
+        self.assertTrue(all('reverify-' in path for path in paths))
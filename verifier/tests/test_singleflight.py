@@ -0,0 +1,131 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import fcntl
+from django.test import SimpleTestCase
+
+from verifier.singleflight import SingleFlight
+
+from .utils import FakeEngine, fake_verifier, temp_dir, write_scene
+
+
+def _run_in_process(lock_dir, log_path):
+    flight = SingleFlight(lock_dir=lock_dir, poll_interval=0.01)
+
+    def work():
+        with open(log_path, 'a') as log:
+            log.write(f"start {time.monotonic()}\n")
+        time.sleep(0.3)
+        with open(log_path, 'a') as log:
+            log.write(f"end {time.monotonic()}\n")
+
+    flight.do('scene', work)
+
+
+class SlowEngine(FakeEngine):
+    def embed(self, inputs):
+        time.sleep(0.3)
+        return super().embed(inputs)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+        started = threading.Event()
+
+        def work():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return {'flux': 0.05}
+
+        with ThreadPoolExecutor(8) as pool:
+            leader = pool.submit(flight.do, 'k', work)
+            started.wait()
+            followers = [pool.submit(flight.do, 'k', work) for _ in range(7)]
+            results = [leader.result()] + [f.result() for f in followers]
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results[0], ({'flux': 0.05}, False))
+        self.assertTrue(all(r == ({'flux': 0.05}, True) for r in results[1:]))
+        stats = flight.stats()
+        self.assertEqual((stats['leaders'], stats['coalesced'], stats['in_flight']), (1, 7, 0))
+
+        # Finished calls aren't remembered: that's the caches' job
+        flight.do('k', work)
+        self.assertEqual(len(calls), 2)
+
+    def test_exceptions_reach_every_waiter(self):
+        flight = SingleFlight()
+        started = threading.Event()
+
+        def fail():
+            started.set()
+            time.sleep(0.1)
+            raise ValueError("unreadable")
+
+        with ThreadPoolExecutor(3) as pool:
+            leader = pool.submit(flight.do, 'k', fail)
+            started.wait()
+            follower = pool.submit(flight.do, 'k', fail)
+            for future in (leader, follower):
+                with self.assertRaisesMessage(ValueError, "unreadable"):
+                    future.result()
+        self.assertEqual(flight.stats()['in_flight'], 0)
+
+    def test_different_keys_run_in_parallel(self):
+        flight = SingleFlight()
+        barrier = threading.Barrier(2, timeout=5)
+        with ThreadPoolExecutor(2) as pool:
+            results = list(pool.map(lambda key: flight.do(key, barrier.wait), ['a', 'b']))
+        self.assertEqual(sorted(shared for _, shared in results), [False, False])
+
+    def test_processes_take_turns_on_a_key(self):
+        lock_dir, log = temp_dir(self), temp_dir(self) / 'log'
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=_run_in_process, args=(str(lock_dir), str(log))) for _ in range(2)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(10)
+            self.assertEqual(process.exitcode, 0)
+        events = [line.split() for line in log.read_text().splitlines()]
+        self.assertEqual([kind for kind, _ in events], ['start', 'end', 'start', 'end'])
+
+    def test_a_stuck_peer_is_waited_for_only_so_long(self):
+        lock_dir = temp_dir(self)
+        flight = SingleFlight(lock_dir=lock_dir, slots=16, timeout=0.2, poll_interval=0.01)
+        slot = int(hashlib.sha256(b'k').hexdigest()[:8], 16) % 16
+        # Another process (here: another open file) holds the key's slot
+        fd = os.open(lock_dir / f"{slot:04x}.lock", os.O_RDWR | os.O_CREAT)
+        self.addCleanup(os.close, fd)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+        started = time.monotonic()
+        self.assertEqual(flight.do('k', lambda: 1), (1, False))
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        stats = flight.stats()
+        self.assertEqual((stats['process_waits'], stats['process_timeouts']), (1, 1))
+
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        flight.do('k', lambda: 1)
+        self.assertEqual(flight.stats()['process_waits'], 1)
+
+
+class CoalescedVerificationTests(SimpleTestCase):
+    def test_identical_concurrent_verifications_run_the_model_once(self):
+        verifier = fake_verifier(self, engine=SlowEngine(), VUNA_BATCHING_ENABLED=False)
+        path = write_scene(temp_dir(self) / 'scene.tif', size=64)
+        with ThreadPoolExecutor(4) as pool:
+            results = list(pool.map(lambda _: verifier.verify(path), range(4)))
+        self.assertEqual(verifier.engine.batches, [1])
+        self.assertTrue(all(result == results[0] for result in results))
+        self.assertEqual(results[0]['status'], 'success')
+        stats = verifier.inflight.stats()
+        self.assertEqual(stats['leaders'] + stats['coalesced'] + verifier.cache.stats()['memory_hits'], 4)
+        self.assertGreater(stats['coalesced'], 0)
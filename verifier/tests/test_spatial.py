@@ -0,0 +1,160 @@
+import random
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from verifier import spatial
+from verifier.freshness import projects_changed
+from verifier.geometry import PreparedPolygon
+from verifier.models import Project
+from verifier.spatial import GridIndex, ProjectSpatialIndex
+
+from .utils import KARURA
+
+
+def square(x, y, size, hole=None):
+    rings = [[[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]]
+    if hole:
+        hx, hy, hsize = hole
+        rings.append([[hx, hy], [hx, hy + hsize], [hx + hsize, hy + hsize], [hx + hsize, hy], [hx, hy]])
+    return {"type": "Polygon", "coordinates": rings}
+
+
+NAIROBI = square(36.6, -1.45, 0.4)
+DONUT = square(36.0, -1.0, 0.3, hole=(36.1, -0.9, 0.1))
+
+
+class PreparedPolygonTests(SimpleTestCase):
+    def test_containment_honours_holes(self):
+        donut = PreparedPolygon(DONUT)
+        self.assertTrue(donut.contains(36.05, -0.95))
+        self.assertFalse(donut.contains(36.15, -0.85))
+        self.assertFalse(donut.contains(35.9, -0.95))
+
+        multi = PreparedPolygon({"type": "MultiPolygon", "coordinates": [
+            NAIROBI["coordinates"], DONUT["coordinates"],
+        ]})
+        self.assertTrue(multi.contains(36.83, -1.24))
+        self.assertTrue(multi.contains(36.05, -0.95))
+        self.assertFalse(multi.contains(36.3, -1.2))
+
+    def test_box_intersection(self):
+        donut = PreparedPolygon(DONUT)
+        self.assertTrue(donut.intersects_box((35.9, -0.95, 36.05, -0.9)))  # a vertex inside
+        self.assertTrue(donut.intersects_box((36.05, -1.1, 36.1, -0.8)))  # edges crossing, no vertex inside
+        self.assertTrue(donut.intersects_box((36.01, -0.99, 36.02, -0.98)))  # box wholly inside
+        self.assertFalse(donut.intersects_box((36.12, -0.88, 36.18, -0.82)))  # box inside the hole
+        self.assertFalse(donut.intersects_box((37.0, 0.0, 38.0, 1.0)))
+
+
+class GridIndexTests(SimpleTestCase):
+    def test_locate_returns_the_innermost_first(self):
+        grid = GridIndex(cell_degrees=0.1)
+        grid.insert('nairobi', PreparedPolygon(NAIROBI))
+        grid.insert('karura', PreparedPolygon(KARURA))
+        grid.insert('donut', PreparedPolygon(DONUT))
+        self.assertEqual(grid.locate(36.83, -1.24), ['karura', 'nairobi'])
+        self.assertEqual(grid.locate(36.7, -1.4), ['nairobi'])
+        self.assertEqual(grid.locate(36.15, -0.85), [])
+        self.assertEqual(grid.intersecting((36.0, -1.3, 36.83, -0.9)), ['donut', 'karura', 'nairobi'])
+
+        grid.remove('karura')
+        self.assertEqual(grid.locate(36.83, -1.24), ['nairobi'])
+        # Re-inserting a key replaces it
+        grid.insert('nairobi', PreparedPolygon(DONUT))
+        self.assertEqual(grid.locate(36.83, -1.24), [])
+        self.assertEqual(len(grid), 2)
+
+    def test_huge_boxes_skip_the_grid(self):
+        grid = GridIndex(cell_degrees=0.01)
+        grid.insert('world', PreparedPolygon(square(-179, -80, 358)))
+        self.assertEqual(grid.cell_count(), 0)
+        self.assertEqual(grid.locate(36.83, -1.24), ['world'])
+        self.assertEqual(grid.intersecting((0, 0, 1, 1)), ['world'])
+        grid.remove('world')
+        self.assertEqual(grid.locate(36.83, -1.24), [])
+
+    def test_lookups_are_sub_millisecond_over_thousands_of_polygons(self):
+        rng = random.Random(0)
+        grid = GridIndex(cell_degrees=0.1)
+        polygons = {}
+        for i in range(5000):
+            polygons[i] = square(rng.uniform(33.0, 42.0), rng.uniform(-4.5, 4.5), rng.uniform(0.01, 0.2))
+            grid.insert(i, PreparedPolygon(polygons[i]))
+        points = [(rng.uniform(33.0, 42.0), rng.uniform(-4.5, 4.5)) for _ in range(500)]
+
+        start = time.perf_counter()
+        found = [grid.locate(x, y) for x, y in points]
+        per_lookup = (time.perf_counter() - start) / len(points)
+        self.assertLess(per_lookup, 1e-3)
+
+        # Same answers as testing every polygon
+        prepared = {i: PreparedPolygon(p) for i, p in polygons.items()}
+        for (x, y), keys in zip(points[:50], found):
+            self.assertEqual(sorted(keys), [i for i, p in prepared.items() if p.contains(x, y)])
+
+
+class ProjectSpatialIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.index = ProjectSpatialIndex(cell_degrees=0.1)
+        self.enterContext(mock.patch.object(spatial, '_spatial_index', self.index))
+        self.karura = Project(name="Karura", latitude=-1.24, longitude=36.83)
+        self.karura.set_boundary(KARURA)
+        self.karura.save()
+        self.nairobi = Project(name="Nairobi", latitude=-1.25, longitude=36.8)
+        self.nairobi.set_boundary(NAIROBI)
+        self.nairobi.save()
+        Project.objects.create(name="Point only", latitude=-1.24, longitude=36.83)
+
+    def test_saved_boundaries_get_precomputed_bboxes(self):
+        self.karura.refresh_from_db()
+        self.assertEqual(
+            [getattr(self.karura, f) for f in Project.BBOX_FIELDS], [36.825, -1.245, 36.835, -1.235],
+        )
+        self.karura.geojson_boundary = ''
+        self.karura.save()
+        self.karura.refresh_from_db()
+        self.assertIsNone(self.karura.bbox_min_lon)
+
+    def test_locate_view(self):
+        url = reverse('project-locate')
+        data = self.client.get(url, {'lat': -1.24, 'lon': 36.83}).json()
+        self.assertEqual([p['name'] for p in data['projects']], ["Karura", "Nairobi"])
+        self.assertNotIn('geojson_boundary', data['projects'][0])
+        self.assertEqual(self.client.get(url, {'lat': 'north', 'lon': 36.83}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'lat': 5, 'lon': 5}).json()['projects'], [])
+
+    def test_intersects_filter(self):
+        url = reverse('project-list')
+        rows = self.client.get(url, {'intersects': '36.84,-1.3,36.9,-1.2', 'fields': 'name'}).json()
+        self.assertEqual(rows, [{'name': "Nairobi"}])
+        self.assertEqual(self.client.get(url, {'intersects': '1,2'}).status_code, 400)
+
+    def test_saves_and_deletes_update_the_index(self):
+        self.assertEqual(self.index.locate(36.83, -1.24), [self.karura.pk, self.nairobi.pk])
+        self.karura.set_boundary(DONUT)
+        self.karura.save()
+        self.assertEqual(self.index.locate(36.83, -1.24), [self.nairobi.pk])
+        self.nairobi.delete()
+        self.assertEqual(self.index.locate(36.83, -1.24), [])
+        self.assertEqual(self.index.locate(36.05, -0.95), [self.karura.pk])
+
+    def test_writes_from_elsewhere_are_picked_up_on_the_next_lookup(self):
+        self.assertEqual(self.index.locate(36.05, -0.95), [])
+        # As another process would: no signals reach this index
+        with mock.patch.object(self.index, 'update'), mock.patch.object(self.index, 'remove'):
+            moved = Project(pk=self.karura.pk, name="Karura", latitude=-1.24, longitude=36.83)
+            moved.set_boundary(DONUT)
+            Project.objects.filter(pk=self.karura.pk).update(
+                geojson_boundary=moved.geojson_boundary, updated_at=timezone.now(),
+            )
+            Project.objects.filter(pk=self.nairobi.pk).delete()
+        projects_changed()
+        self.assertEqual(self.index.locate(36.05, -0.95), [self.karura.pk])
+        self.assertEqual(self.index.locate(36.83, -1.24), [])
+        self.assertEqual(self.index.stats()['entries'], 1)
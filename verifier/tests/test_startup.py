@@ -0,0 +1,85 @@
+import io
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from verifier.apps import preload_models
+from verifier.management.commands import check_import_time
+
+from .utils import fake_verifier
+
+
+class ImportTimeTests(SimpleTestCase):
+    def check(self, *args):
+        out = io.StringIO()
+        call_command('check_import_time', '--repeat', '1', *args, stdout=out)
+        return out.getvalue()
+
+    def test_entry_points_stay_off_the_verification_stack(self):
+        # A generous budget: this is about what gets imported, not this machine's speed
+        output = self.check('--budget', '30')
+        for name in check_import_time.ENTRY_POINTS:
+            self.assertRegex(output, rf'{name}\s+p50=')
+        self.assertNotIn(' imports ', output)
+
+    def test_budget_and_heavy_imports_fail(self):
+        entry_points = {"numpy": "import numpy"}
+        with mock.patch.object(check_import_time, 'ENTRY_POINTS', entry_points), \
+                mock.patch.object(check_import_time, 'HEAVY_MODULES', ('numpy',)):
+            with self.assertRaisesMessage(CommandError, "numpy imports numpy"):
+                self.check('--budget', '30')
+            with self.assertRaisesMessage(CommandError, "budget 0.0s"):
+                self.check('--budget', '0')
+        with mock.patch.object(check_import_time, 'ENTRY_POINTS', {"broken": "import not_a_module"}):
+            with self.assertRaisesMessage(CommandError, "failed"):
+                self.check()
+
+
+class PreloadTests(SimpleTestCase):
+    def test_preload_is_opt_in(self):
+        with mock.patch('verifier.services.VunaVerifier') as verifier:
+            preload_models()
+        verifier.assert_not_called()
+
+    @override_settings(VUNA_PRELOAD_MODELS=True)
+    def test_preload_loads_and_warms_up(self):
+        verifier = fake_verifier(self)
+        with self.assertLogs('verifier.apps', 'INFO') as logs:
+            preload_models()
+        self.assertEqual(verifier.engine.batches, [1])
+        self.assertIn("Preloaded test", logs.output[0])
+
+    @override_settings(VUNA_PRELOAD_MODELS=True)
+    def test_a_failed_preload_does_not_stop_the_process(self):
+        with mock.patch('verifier.services.VunaVerifier', side_effect=FileNotFoundError("no weights")):
+            with self.assertLogs('verifier.apps', 'ERROR'):
+                preload_models()
+
+
+class ModelsUnavailableTests(TestCase):
+    def setUp(self):
+        self.enterContext(mock.patch(
+            'verifier.services.VunaVerifier', side_effect=FileNotFoundError("Model file not found"),
+        ))
+
+    def test_verify_is_a_503(self):
+        response = self.client.post(reverse('verify-credit'), {
+            'image_file': SimpleUploadedFile('scene.tif', b'II*\x00'),
+        })
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertIn("Model file not found", response.json()['error'])
+
+    def test_bulk_verify_is_a_503_before_streaming(self):
+        response = self.client.post(reverse('verify-bulk'), {
+            'image_urls': ['http://example.com/a.tif'],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.streaming)
+
+    def test_everything_else_keeps_working(self):
+        self.assertEqual(self.client.get(reverse('project-list')).status_code, 200)
@@ -0,0 +1,122 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from verifier.economics import DEFAULT_PRICING
+from verifier.models import Project, SummaryBucket
+from verifier.summary import rebuild_summary, tracking
+
+
+def buckets():
+    return {
+        (b.dimension, b.key): (b.projects, b.verified, round(b.flux_sum, 6))
+        for b in SummaryBucket.objects.all() if b.projects
+    }
+
+
+def result(flux):
+    return {'carbon_flux': flux, 'annual_tonnes_co2': flux * 100, 'estimated_revenue_usd': flux * 1000}
+
+
+class SummaryConsistencyTests(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(name="Karura", latitude=-1.25, longitude=36.83, category='Gazetted')
+        Project.objects.create(name="Ngong", latitude=-1.4, longitude=36.65, category='Community')
+
+    def assertMatchesRebuild(self):
+        incremental = buckets()
+        rebuild_summary()
+        self.assertEqual(incremental, buckets())
+
+    def test_saves_deletes_and_partial_saves(self):
+        self.project.record_verification(result(0.05))
+        self.assertEqual(buckets()[('flux_band', 'good')], (1, 1, 0.05))
+        deferred = Project.objects.only('name').get(pk=self.project.pk)
+        deferred.name = "Karura Forest"
+        deferred.save()
+        self.project.category = 'Community'
+        self.project.save(update_fields=['category'])
+        Project.objects.get(name="Ngong").delete()
+        self.assertMatchesRebuild()
+
+    def test_two_stale_instances_move_the_row_once(self):
+        first = Project.objects.get(pk=self.project.pk)
+        second = Project.objects.get(pk=self.project.pk)
+        first.record_verification(result(0.05))
+        second.record_verification(result(0.05))
+        self.assertEqual(buckets()[('flux_band', 'good')], (1, 1, 0.05))
+        second.record_verification(result(0.08))
+        first.record_verification(result(0.01))
+        self.assertEqual(buckets()[('total', '')], (2, 1, 0.01))
+        self.assertMatchesRebuild()
+
+    def test_stale_delete_is_counted_once(self):
+        first = Project.objects.get(pk=self.project.pk)
+        second = Project.objects.get(pk=self.project.pk)
+        first.delete()
+        second.delete()
+        self.assertEqual(buckets()[('total', '')], (1, 0, 0.0))
+        self.assertMatchesRebuild()
+
+    def test_tracking_bulk_writes_from_stale_instances(self):
+        stale = list(Project.objects.all())
+        self.project.record_verification(result(0.05))
+        for project in stale:
+            project.apply_verification(result(0.03))
+        new = Project(name="Kakamega", latitude=0.3, longitude=34.85, cached_flux=0.09)
+        with tracking(stale + [new], Project.VERIFICATION_FIELDS):
+            Project.objects.bulk_update(stale, Project.VERIFICATION_FIELDS)
+            Project.objects.bulk_create([new])
+        self.assertEqual(buckets()[('flux_band', 'moderate')], (2, 2, 0.06))
+        self.assertMatchesRebuild()
+
+
+class PortfolioSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('portfolio-summary')
+        for i, (flux, category) in enumerate([
+            (0.09, 'Gazetted'), (0.05, 'Gazetted'), (0.03, 'Community'), (0.01, ''), (None, 'Community'),
+        ]):
+            project = Project.objects.create(name=f"Forest {i}", latitude=-1.2, longitude=36.8, category=category)
+            if flux is not None:
+                project.record_verification(result(flux))
+
+    def test_totals_agree_with_the_economics_endpoint(self):
+        for params in ({}, {'carbon_price': 40}):
+            summary = self.client.get(self.url, params).json()
+            economics = self.client.get(reverse('project-economics'), params).json()
+            for key in ('projects', 'verified_projects', 'annual_tonnes_co2', 'estimated_revenue_usd', 'pricing'):
+                self.assertEqual(summary[key], economics[key], key)
+        self.assertEqual(summary['pricing']['version'], f"{DEFAULT_PRICING.version}@40")
+        self.assertEqual(summary['mean_flux'], 0.045)
+
+    def test_distributions(self):
+        summary = self.client.get(self.url).json()
+        bands = {row['band']: (row['projects'], row['min_flux']) for row in summary['by_flux_band']}
+        self.assertEqual(bands, {
+            'high': (1, 0.07), 'good': (1, 0.04), 'moderate': (1, 0.02), 'low': (1, None), 'unverified': (1, None),
+        })
+        categories = {row['category']: (row['projects'], row['verified_projects']) for row in summary['by_category']}
+        self.assertEqual(categories, {None: (1, 1), 'Community': (2, 1), 'Gazetted': (2, 2)})
+        gazetted = next(row for row in summary['by_category'] if row['category'] == 'Gazetted')
+        self.assertEqual(gazetted['estimated_revenue_usd'], round(DEFAULT_PRICING.economics(0.14)[1], 2))
+        self.assertEqual(sum(row['projects'] for row in summary['by_flux_band']), summary['projects'])
+
+    def test_the_summary_follows_writes(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        Project.objects.get(name="Forest 4").record_verification(result(0.08))
+        Project.objects.get(name="Forest 0").delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        summary = response.json()
+        self.assertEqual((summary['projects'], summary['verified_projects']), (4, 4))
+        rebuild_summary()
+        rebuilt = self.client.get(self.url).json()
+        del summary['updated_at'], rebuilt['updated_at']
+        self.assertEqual(rebuilt, summary)
+
+    def test_invalid_pricing(self):
+        self.assertEqual(self.client.get(self.url, {'pricing': 'usd1'}).status_code, 400)
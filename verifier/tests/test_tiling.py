@@ -0,0 +1,88 @@
+import threading
+
+import numpy as np
+import rasterio
+from django.test import SimpleTestCase
+from rasterio.windows import Window
+
+from verifier.masking import ProjectBoundary
+from verifier.raster import preprocess_bands, read_model_bands
+from verifier.tiling import cell_area_ha, score_tiles, tile_windows
+
+from .utils import KARURA, fake_verifier, temp_dir, write_scene
+
+
+def tile_means(imgs):
+    return [float(img.mean()) for img in imgs]
+
+
+class TileWindowTests(SimpleTestCase):
+    def test_windows_cover_the_region_with_clipped_edges(self):
+        windows = list(tile_windows(Window(10, 20, 600, 300), 256, 256))
+        self.assertEqual([(r, c) for r, c, _ in windows], [(r, c) for r in range(2) for c in range(3)])
+        self.assertEqual(windows[0][2], Window(10, 20, 256, 256))
+        self.assertEqual(windows[-1][2], Window(522, 276, 88, 44))
+        self.assertEqual(sum(w.width * w.height for _, _, w in windows), 600 * 300)
+
+
+class ScoreTilesTests(SimpleTestCase):
+    def setUp(self):
+        self.path = write_scene(temp_dir(self) / 'scene.tif', size=600)
+
+    def test_each_cell_is_its_own_window_scored(self):
+        grid = score_tiles(self.path, tile_means, tile_size=256)
+        self.assertEqual(grid.flux.shape, (3, 3))
+        with rasterio.open(self.path) as src:
+            for r, c, window in tile_windows(Window(0, 0, 600, 600), 256, 256):
+                expected = tile_means([preprocess_bands(read_model_bands(src, window=window))])[0]
+                self.assertAlmostEqual(grid.flux[r, c], expected, places=6)
+            self.assertAlmostEqual(grid.area_ha.sum(), cell_area_ha(src, 0, 0, 600, 600), places=3)
+        self.assertEqual(grid.to_dict()['transform'][0], 256 * 0.0001)
+
+    def test_readers_and_batch_size_do_not_change_the_grid(self):
+        one = score_tiles(self.path, tile_means, tile_size=128, readers=1, batch_size=1)
+        many = score_tiles(self.path, tile_means, tile_size=128, readers=3, batch_size=5, queue_size=2)
+        np.testing.assert_array_equal(one.flux, many.flux)
+
+    def test_overlapping_tiles(self):
+        grid = score_tiles(self.path, tile_means, tile_size=256, stride=128)
+        self.assertEqual(grid.flux.shape, (5, 5))
+        self.assertTrue(grid.scored.all())
+        with rasterio.open(self.path) as src:
+            self.assertAlmostEqual(grid.area_ha.sum(), cell_area_ha(src, 0, 0, 600, 600), places=3)
+
+    def test_boundary_limits_the_tiles(self):
+        grid = score_tiles(self.path, tile_means, tile_size=64, boundary=ProjectBoundary(KARURA))
+        # The polygon spans pixels 50-150 both ways
+        self.assertEqual(grid.flux.shape, (2, 2))
+        self.assertTrue(grid.scored.all())
+        # ~100 x 100 pixels of ~123 m2
+        self.assertAlmostEqual(grid.area_ha.sum(), 123, delta=15)
+        self.assertAlmostEqual(grid.transform.c, 36.825, places=6)
+
+    def test_inference_errors_stop_the_readers(self):
+        def broken(imgs):
+            raise RuntimeError("model failed")
+
+        before = threading.active_count()
+        with self.assertRaisesMessage(RuntimeError, "model failed"):
+            score_tiles(self.path, broken, tile_size=64, batch_size=2, queue_size=1, readers=3)
+        self.assertEqual(threading.active_count(), before)
+
+
+class TiledVerificationTests(SimpleTestCase):
+    def test_tiled_result_carries_the_grid_and_totals(self):
+        verifier = fake_verifier(self, VUNA_TILE_SIZE=256, VUNA_TILE_STRIDE=256)
+        path = write_scene(temp_dir(self) / 'scene.tif', size=600)
+        result = verifier.verify(path, tiled=True)
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual((result['tiles'], result['grid']['height'], result['grid']['width']), (9, 3, 3))
+        # Area-weighted: the edge cells are 88 pixels across
+        flux = np.array(result['grid']['flux'])
+        pixels = np.outer([256, 256, 88], [256, 256, 88])
+        self.assertAlmostEqual(result['carbon_flux'], (flux * pixels).sum() / pixels.sum(), delta=0.0002)
+        self.assertAlmostEqual(result['total_annual_tonnes_co2'], result['annual_tonnes_co2'] * result['area_ha'],
+                               delta=0.01 * result['total_annual_tonnes_co2'] + 1)
+        # Whole-scene and tiled results are cached apart
+        self.assertNotIn('grid', verifier.verify(path))
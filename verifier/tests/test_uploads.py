@@ -0,0 +1,80 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from verifier.models import Project
+from verifier.uploads import _get_writer
+
+SCENE = b'II*\x00' + bytes(range(256)) * 64
+
+
+class FakeVerifier:
+    """Records what verify_scene was given and answers with `status`."""
+
+    model_version = 'fake'
+
+    def __init__(self, status='success'):
+        self.status = status
+        self.inputs = []
+
+    def verify_scene(self, verify_input, name=None, **options):
+        if hasattr(verify_input, 'read'):
+            verify_input.seek(0)
+            self.inputs.append(('file', verify_input.read()))
+        else:
+            with open(verify_input, 'rb') as f:
+                self.inputs.append(('path', f.read()))
+        if self.status != 'success':
+            return {"status": "error", "message": "Unreadable"}, None
+        return {"status": "success", "carbon_flux": 0.05, "annual_tonnes_co2": 5.0,
+                "estimated_revenue_usd": 50.0}, None
+
+
+@override_settings(VUNA_COG_ON_UPLOAD=False)
+class VerifyUploadTests(TransactionTestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media))
+        self.project = Project.objects.create(name="Karura", latitude=-1.25, longitude=36.83)
+
+    def post(self, verifier):
+        with mock.patch('verifier.services.VunaVerifier', return_value=verifier):
+            response = self.client.post(reverse('verify-credit'), {
+                'project_id': self.project.pk,
+                'image_file': SimpleUploadedFile('karura_2025-02-03.tif', SCENE),
+            })
+        # The writer runs one task at a time: once this one ran, the upload's has too
+        _get_writer().submit(lambda: None).result()
+        self.project.refresh_from_db()
+        return response
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=1024)
+    def test_large_upload_is_verified_and_stored_from_its_temporary_file(self):
+        verifier = FakeVerifier()
+        response = self.post(verifier)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(verifier.inputs, [('path', SCENE)])
+        self.assertTrue(self.project.tiff_file.name.startswith('projects/tiffs/karura'))
+        with self.project.tiff_file.open('rb') as f:
+            self.assertEqual(f.read(), SCENE)
+        self.assertEqual(self.project.cached_flux, 0.05)
+
+    def test_small_upload_is_verified_from_memory(self):
+        verifier = FakeVerifier()
+        response = self.post(verifier)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(verifier.inputs, [('file', SCENE)])
+        with self.project.tiff_file.open('rb') as f:
+            self.assertEqual(f.read(), SCENE)
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=1024)
+    def test_failed_verification_stores_nothing(self):
+        response = self.post(FakeVerifier(status='error'))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.project.tiff_file)
+        self.assertIsNone(self.project.cached_flux)
@@ -0,0 +1,213 @@
+import json
+import struct
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from verifier import boundary_tiles
+from verifier.models import Project
+from verifier.vector_tiles import (
+    EXTENT, encode_tile, lonlat_to_world, project_geometry, simplify_ring, tile_polygons, world_to_lonlat,
+)
+
+from .utils import KARURA
+
+
+def _varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return result, pos
+
+
+def _fields(data):
+    """(field number, wire type, value) of a protobuf message."""
+    pos = 0
+    while pos < len(data):
+        key, pos = _varint(data, pos)
+        number, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = _varint(data, pos)
+        elif wire_type == 1:
+            value, pos = data[pos:pos + 8], pos + 8
+        elif wire_type == 2:
+            length, pos = _varint(data, pos)
+            value, pos = data[pos:pos + length], pos + length
+        else:
+            raise ValueError(f"Unexpected wire type {wire_type}")
+        yield number, wire_type, value
+
+
+def _packed(data):
+    values, pos = [], 0
+    while pos < len(data):
+        value, pos = _varint(data, pos)
+        values.append(value)
+    return values
+
+
+def _unzigzag(n):
+    return (n >> 1) ^ -(n & 1)
+
+
+def decode_tile(data):
+    """
+    MVT bytes -> {layer name: {"version", "extent", "features": [{"id",
+    "type", "properties", "rings"}]}}, enough of the spec for these tests.
+    """
+    layers = {}
+    for number, _, layer_bytes in _fields(data):
+        assert number == 3
+        layer = {"features": []}
+        keys, values, raw_features = [], [], []
+        for field, _, value in _fields(layer_bytes):
+            if field == 1:
+                name = value.decode()
+            elif field == 2:
+                raw_features.append(value)
+            elif field == 3:
+                keys.append(value.decode())
+            elif field == 4:
+                (kind, _, v), = _fields(value)
+                values.append({1: lambda: v.decode(), 3: lambda: struct.unpack('<d', v)[0],
+                               6: lambda: _unzigzag(v), 7: lambda: bool(v)}[kind]())
+            elif field == 5:
+                layer["extent"] = value
+            elif field == 15:
+                layer["version"] = value
+        for raw in raw_features:
+            feature = {"properties": {}}
+            for field, _, value in _fields(raw):
+                if field == 1:
+                    feature["id"] = value
+                elif field == 2:
+                    tags = _packed(value)
+                    feature["properties"] = {keys[k]: values[v] for k, v in zip(tags[::2], tags[1::2])}
+                elif field == 3:
+                    feature["type"] = value
+                elif field == 4:
+                    feature["rings"] = _decode_geometry(_packed(value))
+            layer["features"].append(feature)
+        layers[name] = layer
+    return layers
+
+
+def _decode_geometry(commands):
+    rings, ring, x, y, i = [], None, 0, 0, 0
+    while i < len(commands):
+        command, count = commands[i] & 7, commands[i] >> 3
+        i += 1
+        if command == 7:
+            rings.append(ring)
+            continue
+        for _ in range(count):
+            x += _unzigzag(commands[i])
+            y += _unzigzag(commands[i + 1])
+            i += 2
+            if command == 1:
+                ring = []
+            ring.append((x, y))
+    return rings
+
+
+def _area(ring):
+    return sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]))
+
+
+def karura_tile(z):
+    x, y = lonlat_to_world(36.83, -1.24)
+    return z, int(x * (1 << z)), int(y * (1 << z))
+
+
+class EncodingTests(SimpleTestCase):
+    def test_round_trip(self):
+        square = [[(100, 100), (1000, 100), (1000, 1000), (100, 1000)], [(200, 200), (200, 300), (300, 300), (300, 200)]]
+        data = encode_tile({"boundaries": [
+            {"id": 7, "polygons": [square], "properties": {
+                "name": "Karura", "cached_flux": 0.0512, "tiles": 3, "gazetted": True, "cached_co2": None,
+            }},
+            {"id": 8, "polygons": [], "properties": {"name": "Empty"}},
+        ]})
+        layer = decode_tile(data)["boundaries"]
+        self.assertEqual((layer["version"], layer["extent"]), (2, EXTENT))
+        feature, = layer["features"]
+        self.assertEqual((feature["id"], feature["type"]), (7, 3))
+        self.assertEqual(feature["properties"], {"name": "Karura", "cached_flux": 0.0512, "tiles": 3, "gazetted": True})
+        self.assertEqual(feature["rings"], square)
+
+    def test_rings_are_clipped_and_wound_per_the_spec(self):
+        polygons = project_geometry(KARURA)
+        z, x, y = karura_tile(14)
+        (exterior, *holes), = tile_polygons(polygons, z, x, y)
+        self.assertFalse(holes)
+        self.assertGreater(_area(exterior), 0)
+        self.assertTrue(all(-64 <= px <= EXTENT + 64 and -64 <= py <= EXTENT + 64 for px, py in exterior))
+        # The polygon's own winding doesn't matter
+        reverse = {"type": "Polygon", "coordinates": [KARURA["coordinates"][0][::-1]]}
+        self.assertGreater(_area(tile_polygons(project_geometry(reverse), z, x, y)[0][0]), 0)
+
+    def test_simplification_keeps_the_shape(self):
+        wobbly = [(i / 100, 0.00001 * (i % 2)) for i in range(101)] + [(1, 1), (0, 1), (0, 0)]
+        simplified = simplify_ring(wobbly, 0.001)
+        self.assertEqual(simplified, [(0.0, 0.0), (1.0, 0.0), (1, 1), (0, 1), (0, 0)])
+        self.assertEqual(simplify_ring(wobbly, 0), wobbly)
+
+    def test_projection_round_trip(self):
+        lon, lat = world_to_lonlat(*lonlat_to_world(36.83, -1.24))
+        self.assertAlmostEqual(lon, 36.83, places=9)
+        self.assertAlmostEqual(lat, -1.24, places=9)
+
+
+class BoundaryTileViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.source = boundary_tiles.BoundaryTileSource(max_tiles=16)
+        self.enterContext(mock.patch.object(boundary_tiles, '_tile_source', self.source))
+        self.project = Project(name="Karura", latitude=-1.24, longitude=36.83, cached_flux=0.05)
+        self.project.set_boundary(KARURA)
+        self.project.save()
+        Project.objects.create(name="No boundary", latitude=-1.24, longitude=36.83)
+
+    def get_tile(self, z, x, y):
+        return self.client.get(reverse('boundary-tile', args=[z, x, y]))
+
+    def test_tiles_carry_the_boundaries_in_view(self):
+        response = self.get_tile(*karura_tile(12))
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        feature, = decode_tile(response.content)["boundaries"]["features"]
+        self.assertEqual(feature["id"], self.project.pk)
+        self.assertEqual(feature["properties"]["name"], "Karura")
+        self.assertEqual(feature["properties"]["cached_flux"], 0.05)
+        self.assertIn("cached_co2", feature["properties"])
+
+        self.assertEqual(self.get_tile(12, 0, 0).content, b'')
+        self.assertEqual(self.get_tile(3, 8, 0).status_code, 404)
+
+    def test_tiles_are_cached_until_a_project_changes(self):
+        tile = karura_tile(10)
+        self.get_tile(*tile)
+        self.get_tile(*tile)
+        self.assertEqual((self.source.hits, self.source.misses), (1, 1))
+
+        self.project.name = "Karura Forest"
+        self.project.save()
+        feature, = decode_tile(self.get_tile(*tile).content)["boundaries"]["features"]
+        self.assertEqual(feature["properties"]["name"], "Karura Forest")
+        self.assertEqual(self.source.stats()["tiles"], 1)
+
+    def test_low_zooms_are_simplified(self):
+        detailed = dict(KARURA, coordinates=[[
+            [36.825 + 0.01 * i / 200, -1.235 + 0.00005 * (i % 2)] for i in range(201)
+        ] + KARURA["coordinates"][0][2:]])
+        self.project.geojson_boundary = json.dumps(detailed)
+        self.project.save()
+        low, = decode_tile(self.get_tile(*karura_tile(8)).content)["boundaries"]["features"]
+        high, = decode_tile(self.get_tile(*karura_tile(14)).content)["boundaries"]["features"]
+        self.assertLess(len(low["rings"][0]), 10)
+        self.assertGreater(len(high["rings"][0]), len(low["rings"][0]))
@@ -0,0 +1,108 @@
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import rasterio
+from django.test import override_settings
+from rasterio.transform import from_origin
+
+from verifier.embeddings import EMBEDDING_DIM
+from verifier.raster import NODATA_VALUE
+
+# Karura Forest, Nairobi: scenes are written around here
+ORIGIN = (36.82, -1.23)
+
+KARURA = {
+    "type": "Polygon",
+    "coordinates": [[[36.825, -1.235], [36.835, -1.235], [36.835, -1.245], [36.825, -1.245], [36.825, -1.235]]],
+}
+
+
+def temp_dir(test):
+    """
+    A temporary directory removed when `test` finishes.
+    """
+    path = Path(tempfile.mkdtemp(prefix='vuna-test-'))
+    test.addCleanup(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+
+def scene_array(size=256, seed=0):
+    """
+    A (13, size, size) float32 Sentinel-2 like stack: reflectance-ish bands
+    with some spatial structure, band 6 on its raw digital number scale.
+    """
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size] / size
+    bands = rng.uniform(0.0, 0.2, (13, size, size)) + 0.6 * np.sin(3 * x + seed) * np.cos(2 * y)
+    bands[5] = 1500 + 1000 * bands[5]
+    return bands.astype(np.float32)
+
+
+def write_scene(path, size=256, seed=0, nodata=NODATA_VALUE, date=None, data=None, pixel=0.0001, **profile):
+    """
+    Writes a synthetic 13-band GeoTIFF (EPSG:4326, top-left at ORIGIN) and
+    returns its path. `date` goes into the ACQUISITION_DATE tag.
+    """
+    data = scene_array(size, seed) if data is None else data
+    profile = dict(
+        driver='GTiff', width=data.shape[2], height=data.shape[1], count=data.shape[0], dtype='float32',
+        nodata=nodata, crs='EPSG:4326', transform=from_origin(ORIGIN[0], ORIGIN[1], pixel, pixel), **profile,
+    )
+    with rasterio.open(path, 'w', **profile) as dst:
+        dst.write(data)
+        if date:
+            dst.update_tags(ACQUISITION_DATE=date.isoformat())
+    return str(path)
+
+
+class FakeEngine:
+    """
+    Stands in for inference.InferenceEngine without torch or XGBoost: the
+    "features" are the per-band means of each input and the flux a linear
+    function of them, so different scenes get different, repeatable fluxes.
+    Records the batch sizes it was called with.
+    """
+
+    info = {"model_version": "test", "extractor": "r0", "extractor_tag": "", "backend": "eager", "dim": EMBEDDING_DIM}
+
+    def __init__(self):
+        self.batches = []
+
+    def embed(self, inputs):
+        self.batches.append(len(inputs))
+        features = np.zeros((len(inputs), EMBEDDING_DIM), dtype=np.float32)
+        for row, img in zip(features, inputs):
+            row[:3] = np.asarray(img, dtype=np.float32).reshape(3, -1).mean(axis=1)
+        return features
+
+    def score(self, features):
+        features = np.asarray(features, dtype=np.float64)
+        return 0.03 + 0.02 * features[:, 0] + 0.01 * features[:, 2]
+
+
+def fake_verifier(test, engine=None, **settings):
+    """
+    A fresh VunaVerifier on a FakeEngine (or `engine`) with its caches in a
+    temporary directory, for the duration of `test`. `settings` are
+    overridden as well.
+    """
+    from verifier import fetch
+    from verifier.services import VunaVerifier
+
+    cache_dir = temp_dir(test)
+    test.enterContext(override_settings(
+        VUNA_CACHE_DIR=cache_dir,
+        VUNA_EMBEDDING_DIR=cache_dir / 'embeddings',
+        VUNA_SINGLEFLIGHT_DIR=cache_dir / 'inflight',
+        VUNA_INFERENCE_SOCKET=None,
+        **settings,
+    ))
+    test.enterContext(mock.patch('verifier.inference.InferenceEngine', return_value=engine or FakeEngine()))
+    # The fetcher's downloads live in the cache directory too
+    test.enterContext(mock.patch.object(fetch, '_fetcher', None))
+    VunaVerifier._instance = None
+    test.addCleanup(setattr, VunaVerifier, '_instance', None)
+    return VunaVerifier()
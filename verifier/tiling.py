@@ -0,0 +1,197 @@
+import math
+import queue
+import threading
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+from .raster import MODEL_BANDS, MODEL_SHAPE, preprocess_bands, read_model_bands
+
+# Rough metres per degree, good enough for per-tile hectares near the equator
+METRES_PER_DEGREE_LAT = 110_540.0
+METRES_PER_DEGREE_LON = 111_320.0
+
+_DONE = object()
+
+
+class TileGrid:
+    """
+    Result of a tiled scene scoring: a georeferenced flux grid plus the
+    area each cell covers. Cell (r, c) starts at scene pixel
+    (r * stride, c * stride) and covers up to `stride` x `stride` pixels.
+    """
+
+    def __init__(self, flux, area_ha, transform, crs, tile_size, stride):
+        self.flux = flux
+        self.area_ha = area_ha
+        self.transform = transform
+        self.crs = crs
+        self.tile_size = tile_size
+        self.stride = stride
+
+    @property
+    def scored(self):
+        return ~np.isnan(self.flux)
+
+    def mean_flux(self):
+        """
+        Area-weighted mean flux over the scored cells.
+        """
+        scored = self.scored
+        area = self.area_ha[scored].sum()
+        if not area:
+            return None
+        return float((self.flux[scored] * self.area_ha[scored]).sum() / area)
+
+    def to_dict(self, decimals=4):
+        flux = [
+            [None if np.isnan(v) else round(float(v), decimals) for v in row]
+            for row in self.flux
+        ]
+        return {
+            "flux": flux,
+            "height": int(self.flux.shape[0]),
+            "width": int(self.flux.shape[1]),
+            "transform": list(self.transform)[:6],
+            "crs": self.crs.to_string() if self.crs else None,
+            "tile_size": self.tile_size,
+            "stride": self.stride,
+        }
+
+
+def tile_windows(region, tile_size, stride):
+    """
+    Yields (row, col, Window) covering `region`; edge windows are clipped.
+    """
+    row_end = region.row_off + region.height
+    col_end = region.col_off + region.width
+    for r, row_off in enumerate(range(region.row_off, row_end, stride)):
+        for c, col_off in enumerate(range(region.col_off, col_end, stride)):
+            yield r, c, Window(
+                col_off, row_off,
+                min(tile_size, col_end - col_off),
+                min(tile_size, row_end - row_off),
+            )
+
+
+def model_grid_transform(src, window, out_shape=MODEL_SHAPE):
+    """
+    Affine transform of `window` once it has been read at `out_shape`.
+    """
+    return src.window_transform(window) * rasterio.Affine.scale(
+        window.width / out_shape[1], window.height / out_shape[0]
+    )
+
+
+def cell_area_ha(src, row_off, col_off, rows, cols):
+    """
+    Ground area in hectares of a block of scene pixels.
+    """
+    t = src.transform
+    pixel_area = abs(t.a * t.e - t.b * t.d)
+    if src.crs is not None and src.crs.is_geographic:
+        _, lat = t * (col_off + cols / 2.0, row_off + rows / 2.0)
+        pixel_area *= METRES_PER_DEGREE_LON * math.cos(math.radians(lat)) * METRES_PER_DEGREE_LAT
+    return pixel_area * rows * cols / 10_000.0
+
+
+def score_tiles(path, infer_batch, tile_size=512, stride=None, batch_size=32,
+                queue_size=64, readers=2, resampling='bilinear', boundary=None, bands=MODEL_BANDS):
+    """
+    Steps a window across the scene and scores every tile.
+
+    Reader threads each hold their own dataset handle and push preprocessed
+    128x128 tiles into a bounded queue; the calling thread drains it in
+    batches of `batch_size` through `infer_batch` (list of arrays -> list of
+    flux). Peak memory is bounded by queue_size + batch_size tiles,
+    independent of the scene size.
+
+    With a ProjectBoundary only its bounding window is read, tiles entirely
+    outside the polygon are skipped, pixels outside it are zeroed before
+    feature extraction, and each cell's area is scaled by its coverage.
+    `bands` are the file's bands holding Sentinel-2 bands 7, 8, 6.
+    """
+    stride = stride or tile_size
+    with rasterio.open(path) as src:
+        crs = src.crs
+        region = boundary.window(src) if boundary else Window(0, 0, src.width, src.height)
+        if region is None:
+            raise ValueError("Project boundary does not overlap the image")
+        region = Window(int(region.col_off), int(region.row_off), int(region.width), int(region.height))
+        transform = src.window_transform(region)
+        n_rows = math.ceil(region.height / stride)
+        n_cols = math.ceil(region.width / stride)
+        area = np.zeros((n_rows, n_cols), dtype=np.float64)
+        for r in range(n_rows):
+            for c in range(n_cols):
+                area[r, c] = cell_area_ha(
+                    src, region.row_off + r * stride, region.col_off + c * stride,
+                    min(stride, region.height - r * stride), min(stride, region.width - c * stride),
+                )
+
+    flux = np.full((n_rows, n_cols), np.nan, dtype=np.float64)
+    coverage = np.zeros((n_rows, n_cols), dtype=np.float64)
+    windows = list(tile_windows(region, tile_size, stride))
+    tiles = queue.Queue(maxsize=max(1, queue_size))
+    stop = threading.Event()
+    readers = max(1, min(readers, len(windows)))
+
+    def produce(shard):
+        try:
+            with rasterio.open(path) as src:
+                for r, c, window in shard:
+                    if stop.is_set():
+                        return
+                    mask = None
+                    if boundary:
+                        mask = boundary.mask(crs, model_grid_transform(src, window), MODEL_SHAPE)
+                        if not mask.any():
+                            continue
+                    img = preprocess_bands(read_model_bands(src, window=window, bands=bands, resampling=resampling))
+                    if mask is not None:
+                        img[:, ~mask] = 0.0
+                    tiles.put((r, c, img, 1.0 if mask is None else float(mask.mean())))
+        except Exception as e:
+            tiles.put(e)
+        finally:
+            tiles.put(_DONE)
+
+    threads = [
+        threading.Thread(target=produce, args=(windows[i::readers],), daemon=True)
+        for i in range(readers)
+    ]
+    for t in threads:
+        t.start()
+
+    def flush(batch):
+        for (r, c, _, cover), value in zip(batch, infer_batch([img for _, _, img, _ in batch])):
+            flux[r, c] = value
+            coverage[r, c] = cover
+
+    try:
+        batch = []
+        finished = 0
+        while finished < readers:
+            item = tiles.get()
+            if item is _DONE:
+                finished += 1
+                continue
+            if isinstance(item, Exception):
+                raise item
+            batch.append(item)
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    finally:
+        stop.set()
+        # Unblock readers stuck on a full queue so they can exit
+        while any(t.is_alive() for t in threads):
+            try:
+                tiles.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    return TileGrid(flux, area * coverage, transform * rasterio.Affine.scale(stride), crs, tile_size, stride)
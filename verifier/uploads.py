@@ -0,0 +1,131 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.db import IntegrityError, connections
+from django.utils import timezone
+
+from .cache import content_hash
+from .freshness import projects_changed
+from .models import Project, StoredRaster, VerificationRecord
+
+logger = logging.getLogger(__name__)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='vuna-upload')
+    return _writer
+
+
+def persist_upload(project_id, upload):
+    """
+    Stores an UploadedFile as the project's tiff_file in the background,
+    so the write isn't on the verification request's critical path.
+    Uploads spilled to a temporary file are streamed from it (reopened here,
+    as Django deletes the file when the request ends); smaller ones are
+    copied out of memory. Returns a Future resolving to the stored name.
+    """
+    if hasattr(upload, 'temporary_file_path'):
+        content = File(open(upload.temporary_file_path(), 'rb'))
+    else:
+        upload.seek(0)
+        content = ContentFile(upload.read())
+    return _get_writer().submit(_write_upload, project_id, upload.name, content)
+
+
+def _write_upload(project_id, filename, content):
+    try:
+        field = Project._meta.get_field('tiff_file')
+        name = field.generate_filename(None, filename)
+        name = field.storage.save(name, content, max_length=field.max_length)
+        # update() rather than save() so we never clobber fields the request
+        # thread wrote meanwhile (e.g. the cached_* results)
+        Project.objects.filter(pk=project_id).update(tiff_file=name, updated_at=timezone.now())
+        projects_changed()
+        if getattr(settings, 'VUNA_COG_ON_UPLOAD', False):
+            # Queued behind any other writes, never on this upload's path
+            _get_writer().submit(_ingest_quietly, name)
+        return name
+    except Exception:
+        logger.exception("Failed to store upload %s for project %s", filename, project_id)
+        raise
+    finally:
+        content.close()
+        connections.close_all()
+
+
+def _ingest_quietly(name):
+    try:
+        # Only check the flux when this process already has the models loaded
+        from .services import VunaVerifier
+        verifier = VunaVerifier._instance
+        ingest_stored_raster(name, score=verifier.score_path if verifier else None)
+    except Exception:
+        logger.exception("Failed to convert stored raster %s", name)
+    finally:
+        connections.close_all()
+
+
+def ingest_stored_raster(name, score=None, force=False, companion=None):
+    """
+    Rewrites the stored raster `name` (a tiff_file name) as a COG with
+    cog.ingest, using the VUNA_COG_* settings, and records it as a
+    StoredRaster. A `score(path, bands) -> flux` callable adds the flux
+    check. Files already ingested as they are now are skipped unless
+    `force`. Returns the StoredRaster, or None if skipped; raises
+    cog.ConversionError (the file is then left as it was).
+    """
+    # Lazily, like the verifier: rasterio has no business in listing workers
+    from . import cog
+
+    path = Project._meta.get_field('tiff_file').storage.path(name)
+    source_key = content_hash(path)
+    stored = StoredRaster.objects.filter(name=name).first()
+    if stored and stored.content_key == source_key and not force:
+        return None
+    if companion is None:
+        companion = getattr(settings, 'VUNA_COG_MODEL_BANDS', True)
+
+    report = cog.ingest(
+        path,
+        block_size=getattr(settings, 'VUNA_COG_BLOCK_SIZE', 512),
+        compress=getattr(settings, 'VUNA_COG_COMPRESS', 'DEFLATE'),
+        overview_resampling=getattr(settings, 'VUNA_COG_OVERVIEW_RESAMPLING', 'average'),
+        companion=companion,
+        parity_tolerance=getattr(settings, 'VUNA_COG_PARITY_TOLERANCE', 0.005),
+        resampling=getattr(settings, 'VUNA_READ_RESAMPLING', 'bilinear'),
+        score=score,
+        flux_tolerance=getattr(settings, 'VUNA_COG_FLUX_TOLERANCE', 0.005),
+    )
+    content_key = content_hash(path)
+    stored, _ = StoredRaster.objects.update_or_create(name=name, defaults={
+        # A re-ingested file keeps the hash it was first uploaded with
+        "source_key": stored.source_key if stored else source_key,
+        "content_key": content_key,
+        "has_companion": companion,
+        "original_bytes": stored.original_bytes if stored else report["original_bytes"],
+        "stored_bytes": report["stored_bytes"],
+        "companion_bytes": report["companion_bytes"],
+        "band_stats": report["band_stats"],
+        "parity": {"cog": report["parity"], "companion": report["companion_parity"]},
+    })
+
+    # The history identifies scenes by content hash: keep it pointing at
+    # the file as stored now. (The prediction caches are keyed the same
+    # way, so the next verification of the file computes afresh.)
+    try:
+        VerificationRecord.objects.filter(
+            project__in=Project.objects.filter(tiff_file=name), raster_key=source_key,
+        ).update(raster_key=content_key)
+    except IntegrityError:
+        logger.warning("History of %s already has scenes under %s; left under %s", name, content_key, source_key)
+    return stored
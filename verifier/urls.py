@@ -1,8 +1,20 @@
 from django.urls import path
-from .views import VerifyCreditView, ProjectListView, map_view
+from .views import (
+    VerifyCreditView, BulkVerifyView, VerificationJobView, VerifierStatsView, ProjectListView,
+    LocateProjectsView, ProjectEconomicsView, ProjectHistoryView, PortfolioSummaryView,
+    boundary_tile_view, map_view,
+)
 
 urlpatterns = [
     path('projects/', ProjectListView.as_view(), name='project-list'),
+    path('projects/locate/', LocateProjectsView.as_view(), name='project-locate'),
+    path('projects/economics/', ProjectEconomicsView.as_view(), name='project-economics'),
+    path('projects/<int:pk>/history/', ProjectHistoryView.as_view(), name='project-history'),
+    path('summary/', PortfolioSummaryView.as_view(), name='portfolio-summary'),
     path('verify/', VerifyCreditView.as_view(), name='verify-credit'),
+    path('verify/bulk/', BulkVerifyView.as_view(), name='verify-bulk'),
+    path('verify/stats/', VerifierStatsView.as_view(), name='verify-stats'),
+    path('verify/<uuid:job_id>/', VerificationJobView.as_view(), name='verify-job'),
+    path('tiles/<int:z>/<int:x>/<int:y>.pbf', boundary_tile_view, name='boundary-tile'),
     path('map/', map_view, name='interactive-map'),
 ]
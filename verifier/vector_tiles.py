@@ -0,0 +1,329 @@
+import math
+import struct
+
+# Deliberately free of Django imports: pure geometry + Mapbox Vector Tile
+# (v2) encoding, so it has no dependency beyond the standard library.
+
+EXTENT = 4096
+# Clip a little outside the tile so strokes don't show seams at tile edges
+BUFFER = 64
+# Douglas-Peucker tolerance in tile units (4096 per tile, i.e. about a
+# quarter of a screen pixel on a 256px tile)
+SIMPLIFY_TOLERANCE = 4.0
+MAX_LATITUDE = 85.0511287798
+
+_MOVE_TO, _LINE_TO, _CLOSE_PATH = 1, 2, 7
+_POLYGON = 3
+
+
+# Projection
+
+def lonlat_to_world(lon, lat):
+    """
+    Web Mercator, normalised to [0, 1] x [0, 1] with y pointing down.
+    """
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    sin_lat = math.sin(math.radians(lat))
+    x = (lon + 180.0) / 360.0
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, y
+
+
+def world_to_lonlat(x, y):
+    lon = x * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return lon, lat
+
+
+def project_geometry(geometry):
+    """
+    GeoJSON Polygon / MultiPolygon (lon/lat) -> list of polygons, each a list
+    of rings of world (x, y) tuples. Anything else yields an empty list.
+    """
+    if not geometry:
+        return []
+    if geometry.get('type') == 'Polygon':
+        polygons = [geometry['coordinates']]
+    elif geometry.get('type') == 'MultiPolygon':
+        polygons = geometry['coordinates']
+    else:
+        return []
+    return [
+        [[lonlat_to_world(p[0], p[1]) for p in ring] for ring in polygon]
+        for polygon in polygons
+    ]
+
+
+def polygons_bbox(polygons):
+    """
+    (min_x, min_y, max_x, max_y) over every ring, or None.
+    """
+    xs = [x for polygon in polygons for ring in polygon for x, _ in ring]
+    ys = [y for polygon in polygons for ring in polygon for _, y in ring]
+    if not xs:
+        return None
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def tile_bounds(z, x, y, buffer=0):
+    """
+    World bounds of tile z/x/y, optionally grown by `buffer` tile units.
+    """
+    size = 1.0 / (1 << z)
+    pad = size * buffer / EXTENT
+    return x * size - pad, y * size - pad, (x + 1) * size + pad, (y + 1) * size + pad
+
+
+def zoom_tolerance(z):
+    """
+    SIMPLIFY_TOLERANCE tile units at zoom z, in world units.
+    """
+    return SIMPLIFY_TOLERANCE / (EXTENT * (1 << z))
+
+
+# Simplification
+
+def simplify_ring(ring, tolerance):
+    """
+    Douglas-Peucker on a closed ring. Rings that collapse below a triangle
+    come back as an empty list.
+    """
+    if len(ring) <= 4 or tolerance <= 0:
+        return list(ring)
+    keep = [False] * len(ring)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(ring) - 1)]
+    tol2 = tolerance * tolerance
+    while stack:
+        first, last = stack.pop()
+        ax, ay = ring[first]
+        bx, by = ring[last]
+        dx, dy = bx - ax, by - ay
+        norm = dx * dx + dy * dy
+        worst, index = -1.0, None
+        for i in range(first + 1, last):
+            px, py = ring[i]
+            if norm:
+                t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / norm))
+                ex, ey = ax + t * dx - px, ay + t * dy - py
+            else:
+                ex, ey = ax - px, ay - py
+            d2 = ex * ex + ey * ey
+            if d2 > worst:
+                worst, index = d2, i
+        if index is not None and worst > tol2:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    simplified = [p for p, k in zip(ring, keep) if k]
+    return simplified if len(simplified) >= 4 else []
+
+
+def simplify_polygons(polygons, tolerance):
+    result = []
+    for polygon in polygons:
+        rings = [simplify_ring(ring, tolerance) for ring in polygon]
+        # Drop collapsed holes; a collapsed exterior drops the polygon
+        if rings and rings[0]:
+            result.append([ring for ring in rings if ring])
+    return result
+
+
+# Clipping
+
+def clip_ring(ring, min_x, min_y, max_x, max_y):
+    """
+    Sutherland-Hodgman clip of a ring against an axis-aligned box.
+    """
+    def clip(points, inside, intersect):
+        out = []
+        if not points:
+            return out
+        prev = points[-1]
+        prev_in = inside(prev)
+        for point in points:
+            point_in = inside(point)
+            if point_in:
+                if not prev_in:
+                    out.append(intersect(prev, point))
+                out.append(point)
+            elif prev_in:
+                out.append(intersect(prev, point))
+            prev, prev_in = point, point_in
+        return out
+
+    def at_x(x):
+        def intersect(a, b):
+            t = (x - a[0]) / (b[0] - a[0])
+            return x, a[1] + t * (b[1] - a[1])
+        return intersect
+
+    def at_y(y):
+        def intersect(a, b):
+            t = (y - a[1]) / (b[1] - a[1])
+            return a[0] + t * (b[0] - a[0]), y
+        return intersect
+
+    points = list(ring[:-1]) if len(ring) > 1 and ring[0] == ring[-1] else list(ring)
+    points = clip(points, lambda p: p[0] >= min_x, at_x(min_x))
+    points = clip(points, lambda p: p[0] <= max_x, at_x(max_x))
+    points = clip(points, lambda p: p[1] >= min_y, at_y(min_y))
+    points = clip(points, lambda p: p[1] <= max_y, at_y(max_y))
+    return points
+
+
+# Encoding
+
+def tile_polygons(polygons, z, x, y):
+    """
+    World polygons -> integer tile-space rings for tile z/x/y: clipped to
+    the buffered tile, quantized, de-duplicated and wound per the MVT spec
+    (exterior rings positive area, holes negative, in y-down tile space).
+    """
+    scale = EXTENT * (1 << z)
+    ox, oy = x * EXTENT, y * EXTENT
+    lo, hi = -BUFFER, EXTENT + BUFFER
+    result = []
+    for polygon in polygons:
+        rings = []
+        for i, ring in enumerate(polygon):
+            local = [(px * scale - ox, py * scale - oy) for px, py in ring]
+            clipped = clip_ring(local, lo, lo, hi, hi)
+            quantized = []
+            for px, py in clipped:
+                point = (int(round(px)), int(round(py)))
+                if not quantized or quantized[-1] != point:
+                    quantized.append(point)
+            if len(quantized) > 1 and quantized[0] == quantized[-1]:
+                quantized.pop()
+            area = _signed_area(quantized)
+            if len(quantized) < 3 or not area:
+                if i == 0:
+                    break
+                continue
+            exterior = i == 0
+            if (area > 0) != exterior:
+                quantized.reverse()
+            rings.append(quantized)
+        if rings:
+            result.append(rings)
+    return result
+
+
+def encode_tile(layers):
+    """
+    layers: {name: [{"id": int, "polygons": tile-space polygons,
+    "properties": {key: str/int/float/bool}}, ...]} -> MVT bytes.
+    """
+    out = bytearray()
+    for name, features in layers.items():
+        layer = _encode_layer(name, features)
+        if layer:
+            out += _field(3, 2) + _varint(len(layer)) + layer
+    return bytes(out)
+
+
+def _encode_layer(name, features):
+    keys, values = {}, {}
+    body = bytearray()
+    for feature in features:
+        geometry = _encode_polygons(feature['polygons'])
+        if not geometry:
+            continue
+        tags = []
+        for key, value in feature.get('properties', {}).items():
+            if value is None:
+                continue
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault((type(value).__name__, value), len(values)))
+        msg = bytearray()
+        if feature.get('id') is not None:
+            msg += _field(1, 0) + _varint(int(feature['id']))
+        if tags:
+            msg += _packed(2, tags)
+        msg += _field(3, 0) + _varint(_POLYGON)
+        msg += _packed(4, geometry)
+        body += _field(2, 2) + _varint(len(msg)) + msg
+    if not body:
+        return b''
+
+    layer = bytearray()
+    layer += _field(15, 0) + _varint(2)
+    layer += _string(1, name)
+    layer += body
+    for key in keys:
+        layer += _string(3, key)
+    for (_, value) in values:
+        encoded = _encode_value(value)
+        layer += _field(4, 2) + _varint(len(encoded)) + encoded
+    layer += _field(5, 0) + _varint(EXTENT)
+    return bytes(layer)
+
+
+def _encode_polygons(polygons):
+    commands = []
+    cx = cy = 0
+    for polygon in polygons:
+        for ring in polygon:
+            x0, y0 = ring[0]
+            commands += [_command(_MOVE_TO, 1), _zigzag(x0 - cx), _zigzag(y0 - cy)]
+            cx, cy = x0, y0
+            commands.append(_command(_LINE_TO, len(ring) - 1))
+            for px, py in ring[1:]:
+                commands += [_zigzag(px - cx), _zigzag(py - cy)]
+                cx, cy = px, py
+            commands.append(_command(_CLOSE_PATH, 1))
+    return commands
+
+
+def _encode_value(value):
+    if isinstance(value, bool):
+        return _field(7, 0) + _varint(int(value))
+    if isinstance(value, int):
+        return _field(6, 0) + _varint(_zigzag(value))
+    if isinstance(value, float):
+        return _field(3, 1) + struct.pack('<d', value)
+    return _string(1, str(value))
+
+
+def _signed_area(ring):
+    area = 0
+    for i in range(len(ring)):
+        x1, y1 = ring[i]
+        x2, y2 = ring[(i + 1) % len(ring)]
+        area += x1 * y2 - x2 * y1
+    return area
+
+
+def _command(command, count):
+    return (count << 3) | command
+
+
+def _zigzag(n):
+    return (n << 1) ^ (n >> 63)
+
+
+def _varint(n):
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _field(number, wire_type):
+    return _varint((number << 3) | wire_type)
+
+
+def _string(number, text):
+    data = text.encode('utf-8')
+    return _field(number, 2) + _varint(len(data)) + data
+
+
+def _packed(number, ints):
+    data = b''.join(_varint(i) for i in ints)
+    return _field(number, 2) + _varint(len(data)) + data
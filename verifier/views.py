@@ -1,20 +1,234 @@
+import datetime
+import logging
+
 from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Project
-from .serializers import ProjectSerializer, VerificationInputSerializer
-from .services import VunaVerifier
+from .models import Project, VerificationJob, VerificationRecord
+from .serializers import (
+    BulkVerificationInputSerializer, ProjectSerializer, VerificationInputSerializer,
+    VerificationJobSerializer,
+)
+from .jobs import QueueFull, get_job_queue
+from .uploads import persist_upload
+from .freshness import projects_etag, projects_last_modified
+from .history import history_series
+from .pricing import get_pricing
+from .summary import portfolio_summary
+from .pagination import ProjectCursorPagination
+from .boundary_tiles import get_tile_source
+from .spatial import get_spatial_index
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, instrumented, metrics_enabled, stage
+from rest_framework.exceptions import ValidationError
 from django.core.files.base import ContentFile
+from django.db.models import Count, Q, Sum
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition
 
 from django.shortcuts import render
 
+logger = logging.getLogger(__name__)
+
+# Deepest zoom the map tiles are served for
+MAX_TILE_ZOOM = 22
+
+@method_decorator(gzip_page, name='dispatch')
+@method_decorator(
+    condition(etag_func=projects_etag, last_modified_func=projects_last_modified),
+    name='dispatch',
+)
 class ProjectListView(ListAPIView):
     """
     Returns a list of all projects for the interactive map.
+
+    Optional query parameters:
+    * bbox=min_lon,min_lat,max_lon,max_lat -- only projects whose pin is inside
+    * intersects=min_lon,min_lat,max_lon,max_lat -- only projects whose
+      boundary intersects the box (spatial index + exact test)
+    * has_boundary=true|false -- only projects with / without a boundary
+    * pricing=<version>, carbon_price=<USD per tonne> -- price cached_co2 and
+      cached_revenue (derived from cached_flux in the query) under another
+      pricing model or carbon price
+    * fields=id,name,... or omit=geojson_boundary,... -- shape each row
+    * cursor / page_size -- cursor pagination; without either the full list is
+      returned as a plain array, as before
+
+    Responses are gzipped and carry ETag / Last-Modified, so an unchanged
+    list is answered with a 304 without querying the database.
     """
-    queryset = Project.objects.all()
     serializer_class = ProjectSerializer
+    pagination_class = ProjectCursorPagination
+
+    def get_queryset(self):
+        params = self.request.query_params
+        queryset = filter_projects(Project.objects.priced(_pricing(params)), params)
+        # Boundaries are most of each row; don't even load them if unwanted
+        fields, omit = self._field_selection()
+        if 'geojson_boundary' in omit or (fields is not None and 'geojson_boundary' not in fields):
+            queryset = queryset.defer('geojson_boundary')
+        return queryset
+
+    def paginate_queryset(self, queryset):
+        params = self.request.query_params
+        if 'cursor' not in params and 'page_size' not in params:
+            return None
+        return super().paginate_queryset(queryset)
+
+    def get_serializer(self, *args, **kwargs):
+        fields, omit = self._field_selection()
+        return super().get_serializer(*args, fields=fields, omit=omit, **kwargs)
+
+    def _field_selection(self):
+        params = self.request.query_params
+        fields = [f for f in params.get('fields', '').split(',') if f] or None
+        omit = [f for f in params.get('omit', '').split(',') if f]
+        return fields, omit
+
+def filter_projects(queryset, params):
+    """
+    Applies the bbox, intersects and has_boundary filters shared by the
+    project list and the economics scenario.
+    """
+    bbox = _parse_box(params, 'bbox')
+    if bbox:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        queryset = queryset.filter(
+            longitude__gte=min_lon, longitude__lte=max_lon,
+            latitude__gte=min_lat, latitude__lte=max_lat,
+        )
+    intersects = _parse_box(params, 'intersects')
+    if intersects:
+        queryset = queryset.filter(pk__in=get_spatial_index().intersecting(intersects))
+    has_boundary = params.get('has_boundary')
+    if has_boundary in ('true', 'false'):
+        without = Q(geojson_boundary__isnull=True) | Q(geojson_boundary='')
+        queryset = queryset.exclude(without) if has_boundary == 'true' else queryset.filter(without)
+    return queryset
+
+
+def _pricing(params):
+    try:
+        return get_pricing(params.get('pricing'), params.get('carbon_price'))
+    except ValueError as e:
+        raise ValidationError({"pricing": str(e)})
+
+
+def _parse_box(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in value.split(','))
+    except ValueError:
+        raise ValidationError({name: "Expected min_lon,min_lat,max_lon,max_lat"})
+    return min_lon, min_lat, max_lon, max_lat
+
+
+class LocateProjectsView(APIView):
+    """
+    Which projects' boundaries contain a point: ?lat=&lon=.
+    Innermost (smallest) boundary first.
+    """
+    def get(self, request, *args, **kwargs):
+        try:
+            lat = float(request.query_params['lat'])
+            lon = float(request.query_params['lon'])
+        except (KeyError, ValueError):
+            return Response({"error": "Provide numeric lat and lon"}, status=status.HTTP_400_BAD_REQUEST)
+
+        pks = get_spatial_index().locate(lon, lat)
+        projects = Project.objects.priced(_pricing(request.query_params)).defer('geojson_boundary').in_bulk(pks)
+        data = ProjectSerializer([projects[pk] for pk in pks if pk in projects], many=True, omit=['geojson_boundary']).data
+        return Response({"latitude": lat, "longitude": lon, "projects": data}, status=status.HTTP_200_OK)
+
+
+@method_decorator(
+    condition(etag_func=projects_etag, last_modified_func=projects_last_modified),
+    name='dispatch',
+)
+class ProjectEconomicsView(APIView):
+    """
+    Portfolio totals under a pricing scenario: ?carbon_price=<USD per
+    tonne> and/or ?pricing=<version>, over all projects or those matching
+    the project list's bbox, intersects and has_boundary filters.
+
+    Tonnes and revenue are linear in the flux, so one aggregate query over
+    the stored flux answers any price without re-running the model.
+    """
+    def get(self, request, *args, **kwargs):
+        pricing = _pricing(request.query_params)
+        totals = filter_projects(Project.objects.all(), request.query_params).aggregate(
+            projects=Count('id'), verified=Count('cached_flux'), flux=Sum('cached_flux'),
+        )
+        tonnes_per_year, value_usd = pricing.economics(totals['flux'] or 0.0)
+        return Response({
+            "pricing": pricing.to_dict(),
+            "projects": totals['projects'],
+            "verified_projects": totals['verified'],
+            "annual_tonnes_co2": round(tonnes_per_year, 2),
+            "estimated_revenue_usd": round(value_usd, 2),
+        }, status=status.HTTP_200_OK)
+
+
+@method_decorator(
+    condition(etag_func=projects_etag, last_modified_func=projects_last_modified),
+    name='dispatch',
+)
+class PortfolioSummaryView(APIView):
+    """
+    Portfolio totals and their distribution by flux band (the map legend's)
+    and forest category, read from the materialized summary table: a
+    handful of rows however many projects there are. CO2 and revenue are
+    priced at read time (?pricing= / ?carbon_price= as elsewhere).
+    """
+    def get(self, request, *args, **kwargs):
+        return Response(portfolio_summary(_pricing(request.query_params)), status=status.HTTP_200_OK)
+
+
+class ProjectHistoryView(APIView):
+    """
+    A project's verification history as monthly and yearly series (scene
+    count, date range and mean results per period), aggregated from the
+    stored history without reading any raster.
+
+    Optional query parameters: start / end (YYYY-MM-DD, inclusive);
+    pricing / carbon_price as for the project list.
+    """
+    def get(self, request, pk, *args, **kwargs):
+        if not Project.objects.filter(pk=pk).exists():
+            return Response({"error": "Project not found"}, status=status.HTTP_404_NOT_FOUND)
+        start = _parse_date(request.query_params, 'start')
+        end = _parse_date(request.query_params, 'end')
+        series = history_series(pk, start=start, end=end, pricing=_pricing(request.query_params))
+        return Response(series, status=status.HTTP_200_OK)
+
+
+def _parse_date(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError({name: "Expected YYYY-MM-DD"})
+
+
+@gzip_page
+@condition(etag_func=projects_etag, last_modified_func=projects_last_modified)
+def boundary_tile_view(request, z, x, y):
+    """
+    Project boundaries as a Mapbox Vector Tile (layer "boundaries"),
+    clipped to the tile and simplified for its zoom level.
+    """
+    if z > MAX_TILE_ZOOM or x >= 1 << z or y >= 1 << z:
+        raise Http404("Tile out of range")
+    response = HttpResponse(get_tile_source().tile(z, x, y), content_type='application/vnd.mapbox-vector-tile')
+    response['Cache-Control'] = 'no-cache'
+    return response
 
 def map_view(request):
     """
@@ -23,6 +237,28 @@ def map_view(request):
     return render(request, 'verifier/map.html')
 
 
+def metrics_view(request):
+    """
+    Pipeline metrics in the Prometheus text exposition format.
+    """
+    if not metrics_enabled():
+        raise Http404("Metrics are disabled")
+    return HttpResponse(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+def _models_unavailable(error):
+    # The models couldn't be loaded (e.g. weights missing and no network):
+    # a clean 503 rather than a 500 traceback
+    logger.error("Could not load the verification models: %s", error)
+    response = Response(
+        {"error": f"The verification models are unavailable: {error}"},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+    response['Retry-After'] = '30'
+    return response
+
+
+@method_decorator(instrumented('verify'), name='dispatch')
 class VerifyCreditView(APIView):
     """
     Accepts an image (File or URL), runs the VunaVerifier model,
@@ -30,36 +266,25 @@ class VerifyCreditView(APIView):
     Optionally saves the result to a Project if project info is provided.
     """
     def post(self, request, *args, **kwargs):
+        # The verification stack (rasterio, the models) is imported on first
+        # use, so workers that only serve listings and maps never load it
+        from .masking import ProjectBoundary
+        from .services import VunaVerifier
+
         serializer = VerificationInputSerializer(data=request.data)
         if serializer.is_valid():
             data = serializer.validated_data
             
             # 1. Determine Input
-            input_source = data.get('image_file') or data.get('image_url')
-            
-            # 2. Run Verification
-            verifier = VunaVerifier()
-            # If it's an uploaded file object, we might need to save it temporarily
-            # But VunaVerifier expects a path or URL.
-            # If it's a file upload (InMemoryUploadedFile), we should save it first.
-            
-            target_path = input_source
-            temp_path = None
-            
-            if data.get('image_file'):
-                # Save uploaded file to temp or use directly if implementing differently
-                # For simplicty, let's assume valid file path handling in VunaVerifier
-                # But VunaVerifier.verify() takes a path string.
-                # We need to save the uploaded file to disk to get a path.
-                # OR we modify VunaVerifier to accept file objects (rasterio.open works with file-like objects too!)
-                # Given current VunaVerifier design:
-                pass 
-                # Let's simple handle saving to Project model first if needed, 
-                # or write to temp.
-            
-            # Actually, let's refine the workflow:
-            # If we are creating a Project, we save the file to the model.
-            # Then run verify on the model's file path.
+            upload = data.get('image_file')
+            is_async = data.get('mode') == 'async'
+
+            # 2. Uploads are verified where Django put them (in memory, or
+            # the temporary file larger ones spill to) and, if verification
+            # succeeds, the project's stored copy is written in the background
+            # afterwards. Async jobs run in another process, so there the file
+            # is stored up front.
+            store_upload_first = bool(upload) and is_async
             
             project = None
             
@@ -68,9 +293,10 @@ class VerifyCreditView(APIView):
                 try:
                     project = Project.objects.get(id=data['project_id'])
                     # If new file provided, update it
-                    if data.get('image_file'):
-                        project.tiff_file = data['image_file']
-                        project.save()
+                    if store_upload_first:
+                        project.tiff_file = upload
+                        with stage('db_write'):
+                            project.save()
                 except Project.DoesNotExist:
                     return Response({"error": "Project not found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -81,35 +307,70 @@ class VerifyCreditView(APIView):
                     latitude=data['latitude'],
                     longitude=data['longitude']
                 )
-                if data.get('image_file'):
-                    project.tiff_file = data['image_file']
-                project.save() # This saves file to disk
+                if store_upload_first:
+                    project.tiff_file = upload
+                with stage('db_write'):
+                    project.save() # Only writes the file to disk in async mode
             
-            # Prepare Path for Verifier
+            # Prepare Input for Verifier
+            if upload and not store_upload_first:
+                # Verified from the upload itself, with or without a project
+                if hasattr(upload, 'temporary_file_path'):
+                    verify_input = upload.temporary_file_path()
+                else:
+                    verify_input = upload
             # If we have a stored project with a file:
-            if project and project.tiff_file:
+            elif project and project.tiff_file:
                 verify_input = project.tiff_file.path
             # If we just have a URL (no project save yet, or saving URL?)
             elif data.get('image_url'):
                 verify_input = data['image_url']
             else:
-                # If we have a file upload but NO project to save to yet (just testing?)
-                # We need to save it temp.
-                # For `services.py`, let's just use the project workflow for now as it's cleaner.
-                # If no project, we return error "Please provide project details to save results".
-                # Or we handle temp file.
+                # Only an async upload with nowhere to store it gets here
                 return Response({"error": "Please provide project details (name, lat, lon) to save and verify."}, status=status.HTTP_400_BAD_REQUEST)
 
-            # 3. Call Service
-            result = verifier.verify(verify_input)
-            
+            # 3a. Async mode: hand off to the worker pool and return straight away
+            if is_async:
+                try:
+                    job = get_job_queue().submit(verify_input, project=project, tiled=data.get('tiled', False))
+                except QueueFull as e:
+                    response = Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+                    response['Retry-After'] = '5'
+                    return response
+                return Response({
+                    "job_id": str(job.id),
+                    "status": job.status,
+                    "project_id": project.id if project else None,
+                    "status_url": request.build_absolute_uri(reverse('verify-job', args=[job.id])),
+                }, status=status.HTTP_202_ACCEPTED)
+
+            # 3b. Call Service; whole-scene results also go into the
+            # project's history, so note which scene was verified
+            try:
+                verifier = VunaVerifier()
+            except Exception as e:
+                return _models_unavailable(e)
+            options = {"tiled": data.get('tiled', False), "boundary": ProjectBoundary.from_project(project)}
+            scene = None
+            if project and not options["tiled"]:
+                result, scene = verifier.verify_scene(verify_input, name=upload.name if upload else None, **options)
+            else:
+                result = verifier.verify(verify_input, **options)
+
             if result.get('status') == 'success':
                 # Update Project Cache
                 if project:
-                    project.cached_flux = result.get('carbon_flux')
-                    project.cached_co2 = result.get('annual_tonnes_co2')
-                    project.cached_revenue = result.get('estimated_revenue_usd')
-                    project.save()
+                    with stage('db_write'):
+                        project.record_verification(result)
+                        if scene:
+                            VerificationRecord.upsert([VerificationRecord.from_result(
+                                project, result, scene, verifier.model_version,
+                                source=upload.name if upload else verify_input,
+                            )])
+
+                    # Keep the uploaded scene with its project, off the critical path
+                    if upload and not store_upload_first:
+                        persist_upload(project.pk, upload)
                 
                 # Combine result with project ID
                 result['project_id'] = project.id if project else None
@@ -118,3 +379,63 @@ class VerifyCreditView(APIView):
                 return Response(result, status=status.HTTP_400_BAD_REQUEST)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class BulkVerifyView(APIView):
+    """
+    Verifies many projects and/or image URLs in one call.
+    Results stream back as NDJSON, one line per item in completion order,
+    followed by a summary line.
+    """
+    def post(self, request, *args, **kwargs):
+        serializer = BulkVerificationInputSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        from .bulk import resolve_items, stream_bulk_verification
+        from .services import VunaVerifier
+
+        # Load the models before the stream starts, while we can still answer
+        # with an error status
+        try:
+            VunaVerifier()
+        except Exception as e:
+            return _models_unavailable(e)
+
+        data = serializer.validated_data
+        work = resolve_items(data['project_ids'], data['image_urls'], data['items'])
+        response = StreamingHttpResponse(
+            stream_bulk_verification(work, tiled=data['tiled']),
+            content_type='application/x-ndjson',
+        )
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class VerificationJobView(APIView):
+    """
+    Polling endpoint for an async verification job.
+    """
+    def get(self, request, job_id, *args, **kwargs):
+        try:
+            job = VerificationJob.objects.get(id=job_id)
+        except VerificationJob.DoesNotExist:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(VerificationJobSerializer(job).data, status=status.HTTP_200_OK)
+
+
+class VerifierStatsView(APIView):
+    """
+    Exposes the verifier's runtime counters (batch sizes, queue wait and
+    per-request latency percentiles) for tuning the batching limits.
+    """
+    def get(self, request, *args, **kwargs):
+        from .services import VunaVerifier
+
+        # Don't force a model load just to report stats
+        verifier = VunaVerifier._instance
+        stats = dict(loaded=True, **verifier.stats()) if verifier else {"loaded": False}
+        stats["jobs"] = get_job_queue().stats()
+        stats["vector_tiles"] = get_tile_source().stats()
+        stats["spatial_index"] = get_spatial_index().stats()
+        return Response(stats, status=status.HTTP_200_OK)
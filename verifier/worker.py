@@ -0,0 +1,101 @@
+"""
+Entry points for verifier pool processes.
+
+Spawned children unpickle these functions by importing this module, which
+happens before Django is set up, so nothing here may import models or
+settings at module level.
+"""
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def init_worker():
+    """
+    Runs once in each pool process: set up Django and load the models
+    before the first task arrives.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vuna_backend.settings')
+    import django
+    django.setup()
+
+    from .services import VunaVerifier
+    verifier = VunaVerifier()
+    # One task at a time per process, so waiting for batch peers is pure latency
+    verifier.batching_enabled = False
+    verifier.warm_up()
+
+
+def run_job(job_id, source, tiled=False):
+    """
+    Marks an async VerificationJob as running and verifies its source,
+    masked to the job's project boundary if it has one.
+    """
+    from django.utils import timezone
+    from .masking import ProjectBoundary
+    from .models import VerificationJob, VerificationRecord
+    from .services import VunaVerifier
+
+    VerificationJob.objects.filter(pk=job_id).update(
+        status=VerificationJob.STATUS_RUNNING, started_at=timezone.now()
+    )
+    job = VerificationJob.objects.select_related('project').get(pk=job_id)
+    boundary = ProjectBoundary.from_project(job.project)
+    verifier = VunaVerifier()
+    if job.project is None or tiled:
+        return verifier.verify(source, tiled=tiled, boundary=boundary)
+
+    # Whole-scene results also go into the project's history
+    result, scene = verifier.verify_scene(source, boundary=boundary)
+    if result.get('status') == 'success' and scene:
+        VerificationRecord.upsert([
+            VerificationRecord.from_result(job.project, result, scene, verifier.model_version, source=source)
+        ])
+    _ingest_stored(job.project, source, verifier)
+    return result
+
+
+def _ingest_stored(project, source, verifier):
+    # An async upload was stored before its job ran: convert it to a COG now
+    # that it's verified, with the flux check since the models are loaded
+    from django.conf import settings
+    from .uploads import ingest_stored_raster
+
+    if not (getattr(settings, 'VUNA_COG_ON_UPLOAD', False) and project.tiff_file):
+        return
+    if source != project.tiff_file.path:
+        return
+    try:
+        ingest_stored_raster(project.tiff_file.name, score=verifier.score_path)
+    except Exception:
+        logger.exception("Failed to convert stored raster %s", project.tiff_file.name)
+
+
+def model_version():
+    """
+    The version this worker's results are tagged with, so manage.py
+    reverify knows it without loading the models itself.
+    """
+    from .services import VunaVerifier
+    return VunaVerifier().model_version
+
+
+def reverify_scene(project_id, boundary_geojson, source, tiled=False):
+    """
+    Verifies one scene of a project for manage.py reverify, masked to the
+    given boundary. Returns (result, scene, model_version), with result
+    and scene as from VunaVerifier.verify_scene (scene is None for tiled
+    runs); the command writes the results to the database in batches.
+    """
+    from .geometry import parse_boundary
+    from .masking import ProjectBoundary
+    from .services import VunaVerifier
+
+    geometry = parse_boundary(boundary_geojson)
+    boundary = ProjectBoundary(geometry, key=project_id) if geometry else None
+    verifier = VunaVerifier()
+    if tiled:
+        return verifier.verify(source, tiled=True, boundary=boundary), None, verifier.model_version
+    result, scene = verifier.verify_scene(source, boundary=boundary)
+    return result, scene, verifier.model_version
@@ -125,3 +125,162 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 # CORS Config - Allow all for development
 CORS_ALLOW_ALL_ORIGINS = True
+
+
+# VunaVerifier inference
+# Concurrent /api/verify/ requests in one worker are grouped into a single
+# ResNet + XGBoost pass. A batch is flushed when it holds VUNA_BATCH_MAX_SIZE
+# requests or when its oldest request has waited VUNA_BATCH_MAX_WAIT_MS.
+
+VUNA_BATCHING_ENABLED = True
+VUNA_BATCH_MAX_SIZE = 16
+VUNA_BATCH_MAX_WAIT_MS = 10
+
+# Bands are read decimated straight to the 128x128 model input (using the
+# file's overviews where present). Any rasterio Resampling name works.
+VUNA_READ_RESAMPLING = 'bilinear'
+
+# Verification results are cached by raster content hash + model version:
+# a bounded in-memory LRU in front of a persistent on-disk tier.
+VUNA_CACHE_DIR = BASE_DIR / 'cache'
+VUNA_PREDICTION_CACHE_SIZE = 1024
+
+# Whole-scene ResNet embeddings, stored per extractor version as a
+# memory-mapped float32 matrix. A new XGBoost model re-scores every stored
+# scene without the CNN (manage.py rescore_projects). None disables the store.
+VUNA_EMBEDDING_DIR = VUNA_CACHE_DIR / 'embeddings'
+
+# Identical concurrent verifications (same URL, path or upload, same options)
+# run once and share the result. Threads of a worker wait on the running
+# call; worker processes on the same host queue behind each other on
+# VUNA_SINGLEFLIGHT_SLOTS lock files here, then answer from the caches above.
+# None coalesces within each process only.
+VUNA_SINGLEFLIGHT_DIR = VUNA_CACHE_DIR / 'inflight'
+VUNA_SINGLEFLIGHT_SLOTS = 1024
+VUNA_SINGLEFLIGHT_TIMEOUT = 300.0
+
+# Remote TIFFs: shared keep-alive pool, bounded download cache revalidated
+# with ETag/Last-Modified, and GDAL range reads for Cloud-Optimized GeoTIFFs.
+VUNA_FETCH_CONNECT_TIMEOUT = 5.0
+VUNA_FETCH_READ_TIMEOUT = 60.0
+VUNA_FETCH_CHUNK_SIZE = 1024 * 1024
+VUNA_FETCH_POOL_SIZE = 16
+VUNA_FETCH_CACHE_BYTES = 2 * 1024 ** 3
+VUNA_FETCH_FRESH_SECONDS = 300
+VUNA_FETCH_RANGE_READS = True
+
+# Seed for the re-initialised ResNet conv1 layer, so every worker builds
+# identical feature-extractor weights.
+VUNA_EXTRACTOR_SEED = 0
+
+# Local copy of the ImageNet ResNet18 weights, so no process downloads them at
+# startup. Create it once with manage.py fetch_resnet_weights; while it is
+# missing, the weights are downloaded into torchvision's cache (with a warning).
+VUNA_RESNET_WEIGHTS = BASE_DIR / 'resnet18_imagenet.pth'
+
+# Load the models and run a warm-up inference when a web process starts
+# (vuna_backend/wsgi.py and asgi.py, which runserver also uses), instead of
+# on its first /api/verify/ call. Management commands and scripts never
+# preload. Not for servers that import the app before forking workers
+# (gunicorn --preload): the batching thread doesn't survive fork(). Check
+# that listing-only processes stay light with manage.py check_import_time.
+VUNA_PRELOAD_MODELS = False
+
+# How the extractor runs: 'eager' (plain fp32 PyTorch), 'torchscript' (traced,
+# frozen with conv-bn folding) or 'int8' (post-training static quantization
+# calibrated on VUNA_EXTRACTOR_CALIBRATION). Create the calibration file and
+# check carbon_flux against fp32 with manage.py calibrate_extractor.
+VUNA_EXTRACTOR_BACKEND = 'eager'
+VUNA_EXTRACTOR_CALIBRATION = VUNA_CACHE_DIR / 'extractor_calibration.npy'
+
+# Shared inference server (manage.py inference_server): one process loads the
+# models and forks VUNA_INFERENCE_WORKERS workers that share the weights,
+# each with VUNA_INFERENCE_THREADS torch threads (default: CPUs / workers).
+# With VUNA_INFERENCE_SOCKET set, web and job processes send model inputs
+# there instead of loading torch themselves.
+VUNA_INFERENCE_SOCKET = None
+VUNA_INFERENCE_WORKERS = 2
+VUNA_INFERENCE_THREADS = None
+VUNA_INFERENCE_TIMEOUT = 60.0
+
+# Async verification (mode=async on /api/verify/): a pool of spawned worker
+# processes with the models preloaded. Requests beyond VUNA_JOBS_MAX_QUEUE
+# pending jobs per web process get a 503 with Retry-After.
+VUNA_JOBS_WORKERS = 2
+VUNA_JOBS_MAX_QUEUE = 64
+# Jobs still queued or running this many seconds after they were submitted
+# belonged to a process that restarted or crashed; the next job queue to
+# start marks them failed
+VUNA_JOBS_STALE_AFTER = 3600
+
+# Tiled scoring (tiled=true on /api/verify/): the scene is stepped through in
+# VUNA_TILE_SIZE-pixel windows every VUNA_TILE_STRIDE pixels. Reader threads
+# feed a queue of at most VUNA_TILE_QUEUE_SIZE tiles, scored
+# VUNA_TILE_BATCH_SIZE at a time, so memory is independent of scene size.
+VUNA_TILE_SIZE = 512
+VUNA_TILE_STRIDE = 512
+VUNA_TILE_BATCH_SIZE = 32
+VUNA_TILE_QUEUE_SIZE = 64
+VUNA_TILE_READERS = 2
+
+# Projects with a geojson_boundary are scored only inside their polygon.
+# Rasterized masks are cached per (project, raster grid).
+VUNA_MASK_CACHE_SIZE = 4096
+
+# Stored uploads (projects/tiffs/) are rewritten in the background as
+# Cloud-Optimized GeoTIFFs: VUNA_COG_BLOCK_SIZE-pixel tiles, lossless
+# VUNA_COG_COMPRESS and internal overviews, so later reads touch only the
+# windows and overview levels they need. With VUNA_COG_MODEL_BANDS, bands
+# 7, 8, 6 also go into a <name>.model.tif companion the verifier reads
+# instead. A conversion replaces the original only if every pixel matches
+# and the model input differs by at most VUNA_COG_PARITY_TOLERANCE on
+# average (and, where the models are loaded, the flux by at most
+# VUNA_COG_FLUX_TOLERANCE). manage.py convert_stored_rasters converts
+# existing files.
+VUNA_COG_ON_UPLOAD = True
+VUNA_COG_BLOCK_SIZE = 512
+VUNA_COG_COMPRESS = 'DEFLATE'
+VUNA_COG_OVERVIEW_RESAMPLING = 'average'
+VUNA_COG_MODEL_BANDS = True
+VUNA_COG_PARITY_TOLERANCE = 0.005
+VUNA_COG_FLUX_TOLERANCE = 0.005
+
+# Bulk verification (/api/verify/bulk/): items verified concurrently per call
+VUNA_BULK_CONCURRENCY = 8
+VUNA_BULK_MAX_ITEMS = 1000
+# Finished results are written to the projects and their history every this
+# many successes, so a client disconnecting mid-stream loses none of them
+VUNA_BULK_FLUSH_SIZE = 50
+
+# Carbon pricing: how a predicted flux becomes tonnes of CO2 and revenue.
+# Listings, tiles, history and exports derive both from the stored flux at
+# query time, so a new price needs no re-verification. Each entry is a
+# versioned pricing model (usd_per_tonne, gpp_factor, net_fraction);
+# VUNA_PRICING_MODEL is the default, and /api/projects/ also accepts
+# ?pricing=<version> and ?carbon_price=<USD per tonne> for scenarios.
+VUNA_PRICING_MODELS = {
+    'usd20-v1': {'usd_per_tonne': 20.0},
+}
+VUNA_PRICING_MODEL = 'usd20-v1'
+
+# /api/projects/ ETag and Last-Modified come from a version stamp kept in the
+# Django cache and dropped on every project write. With more than one web
+# process, point CACHES at a shared backend; otherwise other processes pick
+# up changes within VUNA_PROJECTS_VERSION_TTL seconds.
+VUNA_PROJECTS_VERSION_TTL = 60
+
+# Boundary vector tiles (/api/tiles/{z}/{x}/{y}.pbf): rendered tiles kept per
+# process; polygons are simplified per zoom up to VUNA_VECTOR_TILE_MAX_ZOOM.
+VUNA_VECTOR_TILE_CACHE_SIZE = 2048
+VUNA_VECTOR_TILE_MAX_ZOOM = 18
+
+# Point-in-forest / box lookups use a per-process grid index over project
+# boundary bounding boxes, with cells this many degrees on a side.
+VUNA_SPATIAL_CELL_DEGREES = 0.1
+
+# Per-stage latency histograms, error counts by stage and component
+# counters, served in Prometheus text format at /metrics. With
+# VUNA_METRICS_TIMING_HEADERS, /api/verify/ responses also carry a
+# Server-Timing header with the stages that ran for the request.
+VUNA_METRICS_ENABLED = True
+VUNA_METRICS_TIMING_HEADERS = False
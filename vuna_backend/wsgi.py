@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vuna_backend.settings')
 
 application = get_wsgi_application()
+
+# Serving processes load the models up front when VUNA_PRELOAD_MODELS is set
+from verifier.apps import preload_models  # noqa: E402
+
+preload_models()